@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do analisador de CSV, sem rede e sem chaves de API
+
+Gera um relatório sintético (src/tools/synthetic_report.py) e mede, cada etapa em
+um processo próprio, o tempo (melhor de N repetições) e o pico de memória (RSS)
+de: carga do CSV, estatísticas, análise completa com o LLM stub, gravação do
+relatório e montagem dos gráficos do Streamlit. Os resultados são comparados com
+benchmarks/baseline.json e o script termina com código 1 se alguma etapa ficou
+mais lenta ou mais pesada que o tolerado.
+
+Uso:
+    python benchmarks/run_benchmarks.py                       # 100 mil linhas
+    python benchmarks/run_benchmarks.py --rows 1000000 --only load_csv,get_vulnerability_statistics
+    python benchmarks/run_benchmarks.py --update-baseline     # grava os números atuais como referência
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DATASET_DIR = ROOT / ".cache" / "benchmarks"
+
+# Tolerâncias antes de acusar regressão: proporcional + absoluta (ruído de medição)
+TIME_TOLERANCE = float(os.getenv("BENCH_TIME_TOLERANCE", "0.25"))
+MIN_TIME_DELTA = 0.05
+RSS_TOLERANCE = float(os.getenv("BENCH_RSS_TOLERANCE", "0.15"))
+MIN_RSS_DELTA_MB = 20.0
+
+
+def _analyzer():
+    from src.tools.csv_analyzer import OpenVASCSVAnalyzer
+
+    # Sem caches: cada repetição lê e resume o relatório de novo
+    return OpenVASCSVAnalyzer(llm_provider="openai", model_name="stub", use_cache=False)
+
+
+# Cada benchmark recebe o caminho do CSV e a pasta de trabalho, prepara o que não
+# deve ser medido e devolve a função medida.
+
+def bench_load_csv(csv_path: str, workdir: Path) -> Callable:
+    analyzer = _analyzer()
+    return lambda: analyzer.load_csv(csv_path)
+
+
+def bench_get_vulnerability_statistics(csv_path: str, workdir: Path) -> Callable:
+    analyzer = _analyzer()
+    df = analyzer.load_csv(csv_path)
+    return lambda: analyzer.get_vulnerability_statistics(df)
+
+
+def bench_analyze_csv_file(csv_path: str, workdir: Path) -> Callable:
+    analyzer = _analyzer()
+    return lambda: analyzer.analyze_csv_file(csv_path)
+
+
+def bench_save_report(csv_path: str, workdir: Path) -> Callable:
+    analyzer = _analyzer()
+    analysis = analyzer.analyze_csv_file(csv_path)
+    return lambda: analyzer.save_report(analysis, str(workdir / "relatorio.txt"))
+
+
+def bench_chart_builders(csv_path: str, workdir: Path) -> Callable:
+    import streamlit_app
+
+    stats = _analyzer().get_file_statistics(csv_path)
+    return lambda: (streamlit_app.create_severity_chart(stats), streamlit_app.create_hosts_chart(stats),
+                    streamlit_app.create_top_vulnerabilities_chart(stats))
+
+
+def bench_cube_charts(csv_path: str, workdir: Path) -> Callable:
+    import streamlit_app
+    from src.tools.analysis_memory_cache import analyze_report_data
+
+    report = analyze_report_data(csv_path, digest="bench")
+    filters = {"severity": ["High"]}
+
+    def run():
+        streamlit_app.cube_charts.clear()
+        streamlit_app.cube_charts(report.digest, "{}", report.cube, {})
+        streamlit_app.cube_charts(report.digest, json.dumps(filters), report.cube, filters)
+
+    return run
+
+
+BENCHMARKS = {
+    "load_csv": bench_load_csv,
+    "get_vulnerability_statistics": bench_get_vulnerability_statistics,
+    "analyze_csv_file": bench_analyze_csv_file,
+    "save_report": bench_save_report,
+    "chart_builders": bench_chart_builders,
+    "cube_charts": bench_cube_charts,
+}
+
+
+def _run_in_child(name: str, csv_path: str, repeat: int, queue):
+    """Executa um benchmark no processo filho e devolve tempo e pico de RSS pela fila"""
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            run = BENCHMARKS[name](csv_path, Path(workdir))
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+        queue.put({"seconds": round(min(timings), 4), "peak_rss_mb": round(peak_mb, 1)})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_benchmark(name: str, csv_path: str, repeat: int) -> Dict:
+    """Executa o benchmark em um processo novo, para que o pico de memória seja só dele"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_in_child, args=(name, csv_path, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(results: Dict, baseline: Dict, time_tolerance: float = TIME_TOLERANCE,
+            rss_tolerance: float = RSS_TOLERANCE) -> Dict[str, list]:
+    """
+    Regressões de cada benchmark em relação à referência
+
+    Returns:
+        Dict {benchmark: [descrição de cada regressão]} (vazio se não houver)
+    """
+    regressions = {}
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None or "error" in result:
+            continue
+        problems = []
+        time_limit = max(reference["seconds"] * (1 + time_tolerance), reference["seconds"] + MIN_TIME_DELTA)
+        if result["seconds"] > time_limit:
+            problems.append(f"tempo {result['seconds']:.3f}s > {time_limit:.3f}s "
+                            f"(referência {reference['seconds']:.3f}s)")
+        rss_limit = max(reference["peak_rss_mb"] * (1 + rss_tolerance), reference["peak_rss_mb"] + MIN_RSS_DELTA_MB)
+        if result["peak_rss_mb"] > rss_limit:
+            problems.append(f"memória {result['peak_rss_mb']:.0f} MB > {rss_limit:.0f} MB "
+                            f"(referência {reference['peak_rss_mb']:.0f} MB)")
+        if problems:
+            regressions[name] = problems
+    return regressions
+
+
+def prepare_dataset(rows: int, seed: int, regenerate: bool = False) -> Path:
+    """Relatório sintético do tamanho pedido, gerado uma vez e reaproveitado entre execuções"""
+    from src.tools.synthetic_report import generate_synthetic_report
+
+    path = DATASET_DIR / f"synthetic_{rows}_{seed}.csv"
+    if regenerate or not path.exists():
+        print(f"⚙️  Gerando relatório sintético com {rows} achados...")
+        generate_synthetic_report(str(path), rows, seed=seed)
+    return path
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do analisador de CSV do OpenVAS")
+    parser.add_argument("--rows", type=int, default=100_000, help="Achados do relatório sintético")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições por benchmark (vale a melhor)")
+    parser.add_argument("--only", help="Benchmarks separados por vírgula: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--update-baseline", action="store_true", help="Grava os resultados como referência")
+    parser.add_argument("--regenerate", action="store_true", help="Gera o relatório sintético de novo")
+    parser.add_argument("--csv", help="Usa este CSV em vez do sintético (sem comparação com a referência)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Benchmarks desconhecidos: {', '.join(unknown)}")
+
+    csv_path = Path(args.csv) if args.csv else prepare_dataset(args.rows, args.seed, args.regenerate)
+
+    # LLM stub local; os processos filhos herdam as variáveis de ambiente
+    from src.tools.llm_stub import StubLLMServer
+
+    responder = "## Resumo Executivo\n" + "Achado relevante com recomendação de correção. " * 60
+    with StubLLMServer(responder=responder) as stub, tempfile.TemporaryDirectory() as cache_dir:
+        os.environ.update({
+            "OPENAI_BASE_URL": stub.url,
+            "OPENAI_API_KEY": "benchmark",
+            "REPORT_CACHE_DIR": cache_dir,
+            "LLM_CACHE_PATH": str(Path(cache_dir) / "llm.sqlite"),
+        })
+        print(f"📊 {csv_path.name} ({csv_path.stat().st_size / 1024 / 1024:.1f} MB), {args.repeat} repetição(ões)\n")
+        results = {}
+        for name in names:
+            results[name] = run_benchmark(name, str(csv_path), args.repeat)
+            result = results[name]
+            if "error" in result:
+                print(f"  ❌ {name:<30} {result['error']}")
+            else:
+                print(f"  {name:<32} {result['seconds']:>8.3f}s {result['peak_rss_mb']:>8.0f} MB")
+
+    failed = [name for name, result in results.items() if "error" in result]
+    if args.csv:
+        return 1 if failed else 0
+
+    baseline_path = Path(args.baseline)
+    baselines = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    key = str(args.rows)
+
+    if args.update_baseline:
+        if failed:
+            print("\n❌ Referência não atualizada: há benchmarks com erro")
+            return 1
+        baselines[key] = {
+            "machine": f"{platform.machine()} / {os.cpu_count()} CPU(s) / Python {platform.python_version()}",
+            "results": {**baselines.get(key, {}).get("results", {}), **results},
+        }
+        baseline_path.write_text(json.dumps(baselines, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\n✅ Referência para {args.rows} achados gravada em {baseline_path}")
+        return 0
+
+    if key not in baselines:
+        print(f"\n⚠️  Sem referência para {args.rows} achados; use --update-baseline para gravar uma")
+        return 1 if failed else 0
+
+    regressions = compare(results, baselines[key]["results"])
+    if regressions:
+        print(f"\n❌ Regressões em relação à referência ({baselines[key]['machine']}):")
+        for name, problems in regressions.items():
+            for problem in problems:
+                print(f"  {name}: {problem}")
+    elif not failed:
+        print("\n✅ Nenhuma regressão em relação à referência")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,75 +1,28 @@
+import logging
 import os
-import operator
-from typing import TypedDict, Annotated, Sequence
+import threading
+import time
 
 from dotenv import load_dotenv
-from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
-from langgraph.graph import StateGraph, END
 
-# Imports dos seus novos módulos de agentes
-from src.agents.supervisor import create_supervisor_chain, router_function
-from src.agents.task_creator import create_task_creator_node
-from src.agents.result_analyzer import create_result_analyzer_node
-from src.agents.csv_analyzer import create_csv_analyzer_node
 from src.art.art import art_main
-from src.state import AgentState
+from src.graph import get_graph
 
 # Carrega variáveis de ambiente do arquivo .env
 load_dotenv()
 
-# --- Inicialização do LLM ---
-# Suporta tanto OpenAI quanto Groq
-llm_provider = os.getenv("LLM_PROVIDER", "openai").lower()
-
-if llm_provider == "groq":
-    llm = ChatGroq(
-        model=os.getenv("GROQ_MODEL_ID", "llama-3.3-70b-versatile"),
-        temperature=0,
-        api_key=os.getenv("GROQ_API_KEY")
-    )
-else:
-    llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL_ID", "gpt-4o-mini"), temperature=0)
+# LOG_LEVEL=INFO mostra o tempo até o primeiro token de cada chamada ao LLM
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("openvas_agent")
 
 # --- Construção do Grafo ---
-workflow = StateGraph(AgentState)
-
-# Nós dos agentes
-task_creator_node = create_task_creator_node()
-result_analyzer_node = create_result_analyzer_node()
-csv_analyzer_node = create_csv_analyzer_node()
-
-workflow.add_node("TaskCreator", task_creator_node)
-workflow.add_node("ResultAnalyzer", result_analyzer_node)
-workflow.add_node("CSVAnalyzer", csv_analyzer_node)
-workflow.add_node("supervisor", lambda state: {"messages": []}) # Nó supervisor vazio
-
-# Edges de volta para o supervisor
-workflow.add_edge("TaskCreator", "supervisor")
-workflow.add_edge("ResultAnalyzer", "supervisor")
-workflow.add_edge("CSVAnalyzer", "supervisor")
-
-# Roteamento condicional do supervisor
-supervisor_chain = create_supervisor_chain(llm)
-workflow.add_conditional_edges(
-    "supervisor",
-    lambda state: router_function(state, supervisor_chain),
-    {
-        "TaskCreator": "TaskCreator",
-        "ResultAnalyzer": "ResultAnalyzer",
-        "CSVAnalyzer": "CSVAnalyzer",
-        "FINISH": END,
-        "supervisor": "supervisor",
-    },
-)
-
-workflow.set_entry_point("supervisor")
-graph = workflow.compile()
+# O grafo é montado sob demanda (ver src/graph.py): o banner aparece sem esperar
+# pelo LangGraph, pelos agentes nem pelo cliente LLM
 
 # --- Loop de Interação Principal ---
 if __name__ == "__main__":
-    # Verifica API key baseado no provider
+    # Verifica API key baseado no provider (suporta tanto OpenAI quanto Groq)
     llm_provider = os.getenv("LLM_PROVIDER", "openai").lower()
     
     if llm_provider == "groq":
@@ -84,22 +37,60 @@ if __name__ == "__main__":
     
     art_main()
     print(f"\n🤖 Using {llm_provider.upper()} as LLM provider")
-    
+
+    # Monta o grafo enquanto o usuário digita a primeira pergunta
+    warm_up = threading.Thread(target=get_graph, daemon=True)
+    warm_up.start()
+
     while True:
         query = input("\nUser: ")
         if query.lower() in ["q", "exit", "quit", "sair"]:
             print("\nExiting...")
             break
 
+        # Depois do aquecimento, estes módulos já estão carregados (imports só no thread dele)
+        warm_up.join()
+        from langchain_core.messages import HumanMessage
+
+        from src.tools.llm_resilience import DEFAULT_DEADLINE, LLMCallError, llm_deadline
+        from src.tools.llm_streaming import iter_graph_text
+
         initial_state = {"messages": [HumanMessage(content=query)]}
 
         try:
             print("Processing...")
-            final_state = graph.invoke(initial_state, {"recursion_limit": 5})
+            start = time.perf_counter()
+            ttft = None
+            streamed = []
+            final_state = None
+            
+            # Imprime o texto dos agentes conforme é gerado; todas as chamadas ao LLM
+            # do turno dividem o mesmo prazo (LLM_DEADLINE_SECONDS)
+            with llm_deadline(DEFAULT_DEADLINE):
+                for kind, payload in iter_graph_text(get_graph(), initial_state, {"recursion_limit": 5}):
+                    if kind == "state":
+                        final_state = payload
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                        print("\nResult: ", end="")
+                    print(payload, end="", flush=True)
+                    streamed.append(payload)
+            
             final_message = final_state['messages'][-1]
-            print(f"\nResult: {final_message.content}")
+            if "".join(streamed).strip() != str(final_message.content).strip():
+                # Resposta sem streaming (ou diferente do que foi transmitido)
+                print(f"\nResult: {final_message.content}")
+            
+            elapsed = time.perf_counter() - start
+            if ttft is not None:
+                logger.info("Primeiro token em %.2fs, resposta completa em %.2fs", ttft, elapsed)
+                print(f"\n\n⏱️ Primeiro token em {ttft:.2f}s | total {elapsed:.2f}s")
             print("\nDo you need anything else?")
 
+        except LLMCallError as e:
+            print(f"\n⚠️ O LLM não respondeu a tempo: {e}")
+            print("Tente novamente em instantes.")
         except Exception as e:
             import traceback
             print(f"\n--- An Unexpected Error Occurred ---")
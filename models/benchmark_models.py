@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark de desempenho dos modelos LLM (latência, TTFT, tokens/s e erros)
+
+Diferente de compare_models.py, que roda cada modelo uma vez para comparar a
+qualidade das respostas, aqui cada modelo recebe N chamadas (em paralelo, até o
+limite de concorrência) com o mesmo prompt, e o tempo de parse do CSV é medido à
+parte. Com --stub, os modelos são simulados por um servidor local com latências
+sorteadas por modelo: roda sem rede e sem chaves de API.
+
+Uso:
+    python models/benchmark_models.py --stub --trials 50 --concurrency 8
+    python models/benchmark_models.py --models groq:llama-3.3-70b-versatile,openai:gpt-4o-mini
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+
+from src.tools.llm_stub import StubLLMServer, latency_distribution
+from src.tools.model_benchmark import (DEFAULT_CONCURRENCY, DEFAULT_TRIALS, format_benchmark_table,
+                                       run_model_benchmark)
+
+load_dotenv()
+
+# Modelos comparados por padrão (os mesmos de compare_models.py)
+DEFAULT_MODELS = {
+    "Llama-3.3-70B": {"provider": "groq", "model": "llama-3.3-70b-versatile"},
+    "Llama-3.1-8B": {"provider": "groq", "model": "llama-3.1-8b-instant"},
+    "Gemma-2-9B": {"provider": "groq", "model": "gemma2-9b-it"},
+    "GPT-4o-mini": {"provider": "openai", "model": "gpt-4o-mini"},
+}
+
+# Perfis do servidor stub: latência até o primeiro token e intervalo entre tokens
+STUB_PROFILES = {
+    "llama-3.3-70b-versatile": {"latency": ("lognormal", {"median": 0.30, "sigma": 0.35}), "token_interval": 0.004},
+    "llama-3.1-8b-instant": {"latency": ("lognormal", {"median": 0.12, "sigma": 0.25}), "token_interval": 0.001},
+    "gemma2-9b-it": {"latency": ("spiky", {"base": 0.15, "spike": 1.0, "probability": 0.05}), "token_interval": 0.002},
+    "gpt-4o-mini": {"latency": ("lognormal", {"median": 0.45, "sigma": 0.5}), "token_interval": 0.006},
+}
+
+STUB_RESPONSE = "## Resumo Executivo\n" + "Vulnerabilidade relevante encontrada, com correção recomendada. " * 40
+
+
+def parse_models(value: str) -> dict:
+    """'provider:modelo,provider:modelo' -> {nome: {"provider", "model"}}"""
+    models = {}
+    for item in value.split(","):
+        provider, _, model = item.strip().partition(":")
+        if not model:
+            raise argparse.ArgumentTypeError(f"Use provider:modelo (recebido: {item})")
+        models[model] = {"provider": provider, "model": model}
+    return models
+
+
+def start_stub(models: dict, seed: int) -> StubLLMServer:
+    """Servidor stub com um perfil de latência por modelo, apontado pelos dois providers"""
+    profiles = {}
+    for i, config in enumerate(models.values()):
+        kind, params = STUB_PROFILES.get(config["model"], {}).get(
+            "latency", ("lognormal", {"median": 0.25, "sigma": 0.4}))
+        profiles[config["model"]] = {
+            "latency": latency_distribution(kind, seed=seed + i, **params),
+            "token_interval": STUB_PROFILES.get(config["model"], {}).get("token_interval", 0.003),
+        }
+    stub = StubLLMServer(responder=STUB_RESPONSE, profiles=profiles).start()
+    os.environ.update({
+        "OPENAI_BASE_URL": stub.url,
+        "OPENAI_API_KEY": "stub",
+        "GROQ_BASE_URL": stub.root_url,
+        "GROQ_API_KEY": "stub",
+    })
+    return stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de desempenho dos modelos LLM")
+    parser.add_argument("--csv", default=str(ROOT / "csv_reports" / "openvas-speed.csv"))
+    parser.add_argument("--models", type=parse_models, help="provider:modelo separados por vírgula")
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS, help="Chamadas por modelo")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Chamadas simultâneas")
+    parser.add_argument("--parse-trials", type=int, default=3, help="Leituras do CSV para medir o parse")
+    parser.add_argument("--stub", action="store_true", help="Simula os modelos com o servidor stub local")
+    parser.add_argument("--seed", type=int, default=0, help="Semente das latências do stub")
+    parser.add_argument("--output", default=str(ROOT / "docs" / "MODEL_BENCHMARK.md"))
+    parser.add_argument("--json", help="Grava também os resultados completos em JSON")
+    args = parser.parse_args()
+
+    models = args.models or DEFAULT_MODELS
+    stub = start_stub(models, args.seed) if args.stub else None
+
+    print(f"🔒 Benchmark de modelos: {len(models)} modelo(s) × {args.trials} chamada(s), "
+          f"concorrência {args.concurrency}{' (stub local)' if stub else ''}")
+    try:
+        result = run_model_benchmark(args.csv, models, args.trials, args.concurrency, args.parse_trials)
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    parse = result["parse_seconds"]
+    table = format_benchmark_table(result)
+    md = f"""# Benchmark de Modelos LLM
+
+**Data:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**Arquivo:** `{Path(args.csv).name}` · **Prompt:** ~{result['prompt_tokens']} tokens
+**Chamadas por modelo:** {args.trials} · **Concorrência:** {args.concurrency}{' · **Provider:** stub local' if stub else ''}
+
+## ⚡ Latência do LLM
+
+{table}
+
+Tokens/s contam só a geração, depois do primeiro token.
+
+## 📄 Parse do CSV (fora da latência do LLM)
+
+p50 {parse['p50']:.3f}s · p95 {parse['p95']:.3f}s ({args.parse_trials} leitura(s))
+
+**Tempo total das chamadas:** {result['wall_time']:.2f}s ({result['throughput']} chamadas/s)
+"""
+    output = Path(args.output)
+    output.parent.mkdir(exist_ok=True)
+    output.write_text(md, encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"\n{table}\n")
+    print(f"📄 Parse do CSV: p50 {parse['p50']:.3f}s")
+    print(f"⏱️  {result['wall_time']:.2f}s no total ({result['throughput']} chamadas/s)")
+    print(f"✅ Relatório salvo em: {output}")
+
+
+if __name__ == "__main__":
+    main()
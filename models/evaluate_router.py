@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Avaliação do roteador local (src/tools/intent_router.py) contra o supervisor LLM
+
+Com as consultas rotuladas de intent_queries.jsonl, mede:
+
+- roteador local, em validação cruzada (o classificador nunca vê a consulta que
+  está classificando): cobertura (decididas sem o LLM), acurácia das rotas
+  locais, perguntas gerais roteadas por engano e latência em µs
+- supervisor LLM (--llm provider:modelo): acurácia, latência e concordância com
+  as rotas locais
+- os dois juntos, como no grafo: rota local quando há confiança, LLM no resto
+
+Consultas com rótulo "LLM" (perguntas gerais) não têm rota certa e ficam fora
+da acurácia; para o roteador local, o acerto é deixá-las com o LLM.
+
+Com --stub, o supervisor é simulado por um servidor local que responde a rota
+do rótulo (um oráculo) com latência sorteada: mede o caminho e a latência sem
+rede, mas a acurácia do LLM nesse modo é 100% por construção.
+
+Uso:
+    python models/evaluate_router.py
+    python models/evaluate_router.py --stub
+    python models/evaluate_router.py --llm openai:gpt-4o-mini --concurrency 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+
+from src.tools.intent_router import ROUTER_THRESHOLD, ROUTES, IntentRouter, load_labeled_queries
+from src.tools.llm_stub import StubLLMServer, latency_distribution
+from src.tools.model_benchmark import percentiles
+
+load_dotenv()
+
+
+def cross_validate(queries: list, folds: int, threshold: float) -> list:
+    """Rota local de cada consulta, com o classificador treinado sem o fold dela"""
+    predictions = [None] * len(queries)
+    for fold in range(folds):
+        train = [query for i, query in enumerate(queries) if i % folds != fold]
+        router = IntentRouter(train, threshold=threshold)
+        for i, query in enumerate(queries):
+            if i % folds != fold:
+                continue
+            start = time.perf_counter()
+            route, confidence, source = router.classify(query["text"])
+            predictions[i] = {"route": route, "confidence": confidence, "source": source,
+                              "seconds": time.perf_counter() - start}
+    return predictions
+
+
+def ask_llm(provider: str, model: str, queries: list, concurrency: int) -> list:
+    """Rota escolhida pelo supervisor LLM para cada consulta, com a latência"""
+    from langchain_core.messages import HumanMessage
+
+    from src.agents.supervisor import create_supervisor_chain
+    from src.tools.llm_registry import get_chat_model
+
+    chain = create_supervisor_chain(get_chat_model(provider, model, temperature=0))
+
+    def route(query):
+        start = time.perf_counter()
+        try:
+            decision = chain.invoke({"messages": [HumanMessage(content=query["text"])]})
+            return {"route": decision.next, "seconds": time.perf_counter() - start}
+        except Exception as e:
+            return {"route": None, "seconds": time.perf_counter() - start, "error": f"{type(e).__name__}: {e}"}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        return list(executor.map(route, queries))
+
+
+def start_stub(queries: list, seed: int) -> StubLLMServer:
+    """Supervisor simulado: responde a rota do rótulo (ou CSVAnalyzer para perguntas gerais)"""
+    labels = {query["text"]: query["label"] for query in queries}
+
+    def responder(messages):
+        label = labels.get(str(messages[-1].get("content", "")), "CSVAnalyzer")
+        return json.dumps({"next": label if label in ROUTES else "CSVAnalyzer"})
+
+    latency = latency_distribution("lognormal", seed=seed, median=0.6, sigma=0.4)
+    stub = StubLLMServer(responder=responder, latency=latency).start()
+    os.environ.update({"OPENAI_BASE_URL": stub.url, "OPENAI_API_KEY": "stub"})
+    return stub
+
+
+def accuracy(pairs: list):
+    """Fração de pares (previsto, esperado) iguais, ou None sem pares"""
+    return round(sum(predicted == expected for predicted, expected in pairs) / len(pairs), 4) if pairs else None
+
+
+def summarize(queries: list, local: list, llm: list = None) -> dict:
+    """Métricas do roteador local e, com as respostas do LLM, do supervisor e do par local + LLM"""
+    routable = [i for i, query in enumerate(queries) if query["label"] in ROUTES]
+    general = [i for i, query in enumerate(queries) if query["label"] not in ROUTES]
+    routed = [i for i in routable if local[i]["route"] is not None]
+    result = {
+        "queries": len(queries),
+        "routable": len(routable),
+        "local": {
+            "coverage": round(len(routed) / len(routable), 4) if routable else None,
+            "by_source": {source: sum(prediction["source"] == source for prediction in local)
+                          for source in ("rule", "model", "llm")},
+            "accuracy": accuracy([(local[i]["route"], queries[i]["label"]) for i in routed]),
+            "general_misrouted": sum(local[i]["route"] is not None for i in general),
+            "general": len(general),
+            "microseconds": percentiles([prediction["seconds"] * 1e6 for prediction in local]),
+        },
+    }
+    if llm is None:
+        return result
+
+    answered = [i for i in routable if llm[i]["route"] is not None]
+    both = [i for i in answered if local[i]["route"] is not None]
+    hybrid = [(local[i]["route"] or llm[i]["route"], queries[i]["label"]) for i in answered]
+    hybrid_seconds = [local[i]["seconds"] + (llm[i]["seconds"] if local[i]["route"] is None else 0.0)
+                      for i in range(len(queries)) if local[i]["route"] is not None or llm[i]["route"] is not None]
+    result["llm"] = {
+        "accuracy": accuracy([(llm[i]["route"], queries[i]["label"]) for i in answered]),
+        "errors": sum(prediction["route"] is None for prediction in llm),
+        "agreement": accuracy([(local[i]["route"], llm[i]["route"]) for i in both]),
+        "milliseconds": percentiles([prediction["seconds"] * 1e3 for prediction in llm
+                                     if prediction["route"] is not None]),
+    }
+    result["hybrid"] = {
+        "accuracy": accuracy(hybrid),
+        "llm_calls": sum(local[i]["route"] is None for i in range(len(queries))),
+        "milliseconds": percentiles([seconds * 1e3 for seconds in hybrid_seconds]),
+    }
+    return result
+
+
+def format_report(result: dict) -> str:
+    def fmt(value, pattern="{:.1%}"):
+        return "-" if value is None else pattern.format(value)
+
+    local = result["local"]
+    sources = local["by_source"]
+    lines = [
+        "| Roteador | Acurácia | Cobertura | Latência p50 / p99 |",
+        "|----------|----------|-----------|--------------------|",
+        f"| Local (regras + classificador) | {fmt(local['accuracy'])} | {fmt(local['coverage'])} "
+        f"| {fmt(local['microseconds']['p50'], '{:.0f}')} / {fmt(local['microseconds']['p99'], '{:.0f}')} µs |",
+    ]
+    if "llm" in result:
+        llm, hybrid = result["llm"], result["hybrid"]
+        lines += [
+            f"| Supervisor LLM | {fmt(llm['accuracy'])} | 100% "
+            f"| {fmt(llm['milliseconds']['p50'], '{:.1f}')} / {fmt(llm['milliseconds']['p99'], '{:.1f}')} ms |",
+            f"| Local + LLM (grafo) | {fmt(hybrid['accuracy'])} | 100% "
+            f"| {fmt(hybrid['milliseconds']['p50'], '{:.1f}')} / {fmt(hybrid['milliseconds']['p99'], '{:.1f}')} ms |",
+        ]
+    lines += [
+        "",
+        f"Decisões locais: {sources['rule']} por regra, {sources['model']} pelo classificador, "
+        f"{sources['llm']} deixadas para o LLM. Perguntas gerais roteadas localmente: "
+        f"{local['general_misrouted']}/{local['general']}.",
+    ]
+    if "llm" in result:
+        lines.append(f"Concordância local × LLM: {fmt(result['llm']['agreement'])} · chamadas ao LLM: "
+                     f"{result['hybrid']['llm_calls']}/{result['queries']} · erros do LLM: {result['llm']['errors']}.")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avalia o roteador local contra o supervisor LLM")
+    parser.add_argument("--folds", type=int, default=5, help="Folds da validação cruzada")
+    parser.add_argument("--threshold", type=float, default=ROUTER_THRESHOLD, help="Confiança mínima do classificador")
+    parser.add_argument("--llm", help="provider:modelo do supervisor comparado (ex.: openai:gpt-4o-mini)")
+    parser.add_argument("--stub", action="store_true", help="Simula o supervisor com o servidor stub local")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chamadas simultâneas ao LLM")
+    parser.add_argument("--seed", type=int, default=0, help="Semente das latências do stub")
+    parser.add_argument("--output", default=str(ROOT / "docs" / "ROUTER_EVALUATION.md"))
+    parser.add_argument("--json", help="Grava também os resultados completos em JSON")
+    args = parser.parse_args()
+
+    queries = load_labeled_queries()
+    print(f"🧭 Roteador local: {len(queries)} consultas rotuladas, validação cruzada em {args.folds} folds")
+    local = cross_validate(queries, args.folds, args.threshold)
+
+    llm, label = None, None
+    if args.stub or args.llm:
+        provider, _, model = ("openai:gpt-4o-mini" if args.stub else args.llm).partition(":")
+        stub = start_stub(queries, args.seed) if args.stub else None
+        label = f"{provider}/{model}{' (stub local)' if stub else ''}"
+        print(f"🤖 Supervisor LLM: {label}")
+        try:
+            llm = ask_llm(provider, model or None, queries, args.concurrency)
+        finally:
+            if stub is not None:
+                stub.stop()
+
+    result = summarize(queries, local, llm)
+    table = format_report(result)
+    md = f"""# Avaliação do Roteador Local
+
+**Data:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**Consultas:** {result['queries']} ({result['routable']} com rota) · **Limiar:** {args.threshold} · **Folds:** {args.folds}
+**Supervisor comparado:** {label or '-'}
+
+{table}
+"""
+    output = Path(args.output)
+    output.parent.mkdir(exist_ok=True)
+    output.write_text(md, encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"\n{table}\n")
+    print(f"✅ Relatório salvo em: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API HTTP (src/api/server.py) com LLM e gvmd simulados
+
+Sobe o servidor stub de chat completions (llm_stub) e o gvmd falso (gvmd_stub)
+neste processo, inicia a API em um processo separado, apontada para eles, e
+envia uma mistura de pedidos (chat, análise de CSV e criação de scan) em três
+fases:
+
+- sequencial: um pedido por vez (a referência de um cliente bloqueante)
+- concorrente: os mesmos tipos de pedido, `--concurrency` de cada vez
+- rajada: `--burst` análises de CSV de uma vez, acima da capacidade da fila
+  (`--csv-workers` + `--csv-queue`, passados à API como API_CSV_WORKERS e
+  API_CSV_QUEUE), para mostrar o 429 com Retry-After em vez de latência sem
+  limite. O teste falha se nenhum pedido da rajada receber 429 ou se algum 429
+  vier sem Retry-After
+
+Cada análise de CSV usa um relatório sintético diferente, para que os caches de
+resumo não transformem a fase concorrente em acertos de cache. Mede, por fase e
+por tipo: vazão, latência (p50/p95/p99), tempo até o primeiro token e status.
+
+Uso:
+    python models/load_test_api.py
+    python models/load_test_api.py --requests 48 --concurrency 24 --llm-latency 0.8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+from src.tools.gvmd_stub import StubGVMDServer
+from src.tools.llm_stub import StubLLMServer, latency_distribution
+from src.tools.model_benchmark import percentiles
+from src.tools.synthetic_report import generate_synthetic_report
+
+KINDS = ("chat", "csv", "scan")
+CHAT_MESSAGES = (
+    "listar csv",
+    'analyze results for task named "Weekly"',
+    "quais relatórios existem?",
+)
+SUMMARY = ("O relatório mostra vulnerabilidades concentradas em serviços expostos. Priorize a atualização do "
+           "OpenSSH e a desativação de protocolos TLS antigos, revise as portas abertas nos hosts críticos e "
+           "agende um novo scan após as correções para confirmar a remediação. ") * 2
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def responder(messages):
+    """Supervisor: rota em JSON; demais chamadas: um resumo em texto"""
+    if "supervisor" in str(messages[0].get("content", "")):
+        return json.dumps({"next": "CSVAnalyzer"})
+    return SUMMARY
+
+
+def build_requests(count: int, csv_files: list, seed: int) -> list:
+    """`count` pedidos (tipo, caminho, corpo), metade chat e o resto entre CSV e scans"""
+    rng = random.Random(seed)
+    kinds = ["chat"] * (count // 2) + ["csv"] * (count // 4)
+    kinds += ["scan"] * (count - len(kinds))
+    rng.shuffle(kinds)
+    requests, csv_index = [], 0
+    for i, kind in enumerate(kinds):
+        if kind == "chat":
+            requests.append((kind, "/chat", {"message": rng.choice(CHAT_MESSAGES)}))
+        elif kind == "csv":
+            requests.append((kind, "/csv/analyze", {"file": csv_files[csv_index % len(csv_files)]}))
+            csv_index += 1
+        else:
+            requests.append((kind, "/scans", {"target": f"10.0.{i // 250}.{i % 250 + 1}", "name": f"Carga {i}"}))
+    return requests
+
+
+async def send(client: httpx.AsyncClient, kind: str, path: str, body: dict) -> dict:
+    """Envia um pedido em streaming e mede a latência total e até o primeiro token"""
+    start = time.perf_counter()
+    record = {"kind": kind, "status": None, "ttft": None, "error": None, "retry_after": None}
+    try:
+        async with client.stream("POST", path, json=body) as response:
+            record["status"] = response.status_code
+            record["retry_after"] = response.headers.get("Retry-After")
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("event") == "token" and record["ttft"] is None:
+                    record["ttft"] = time.perf_counter() - start
+                elif event.get("event") == "error":
+                    record["error"] = event["error"]
+                elif event.get("event") == "done" and not event.get("route"):
+                    record["error"] = "sem rota"
+    except httpx.HTTPError as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+
+async def run_phase(base_url: str, requests: list, concurrency: int) -> dict:
+    """Envia os pedidos com até `concurrency` em andamento; devolve os registros e o tempo total"""
+    limit = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=max(concurrency, 1) + 10)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def limited(request):
+            async with limit:
+                return await send(client, *request)
+
+        start = time.perf_counter()
+        records = await asyncio.gather(*(limited(request) for request in requests))
+        return {"records": records, "seconds": time.perf_counter() - start, "concurrency": concurrency}
+
+
+def summarize(phase: dict) -> dict:
+    records = phase["records"]
+    ok = [record for record in records if record["status"] == 200 and record["error"] is None]
+    by_kind = defaultdict(list)
+    for record in ok:
+        by_kind[record["kind"]].append(record)
+    return {
+        "concurrency": phase["concurrency"],
+        "requests": len(records),
+        "ok": len(ok),
+        "seconds": round(phase["seconds"], 2),
+        "throughput": round(len(ok) / phase["seconds"], 2) if phase["seconds"] else None,
+        "status": dict(Counter(str(record["status"]) for record in records)),
+        "retry_after": sorted({int(record["retry_after"]) for record in records
+                               if record["status"] == 429 and (record["retry_after"] or "").isdigit()}),
+        "errors": sorted({record["error"] for record in records if record["error"]})[:5],
+        "kinds": {kind: {"count": len(items),
+                         "seconds": percentiles([item["seconds"] for item in items]),
+                         "ttft": percentiles([item["ttft"] for item in items if item["ttft"] is not None])}
+                  for kind, items in by_kind.items()},
+    }
+
+
+def start_api(workdir: Path, port: int, env: dict) -> subprocess.Popen:
+    """Inicia a API em outro processo e espera o /health responder"""
+    log = workdir / "api.log"
+    with open(log, "w") as stderr:
+        process = subprocess.Popen([sys.executable, "-m", "src.api.server", "--host", "127.0.0.1", "--port", str(port)],
+                                   cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"A API encerrou ao iniciar:\n{log.read_text()[-2000:]}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("A API não respondeu ao /health em 60s")
+
+
+async def run_load(base_url: str, args, csv_sets: list) -> dict:
+    phases = {}
+    print(f"➡️  Sequencial: {args.requests} pedidos, um por vez")
+    phases["sequencial"] = await run_phase(base_url, build_requests(args.requests, csv_sets[0], args.seed), 1)
+    print(f"➡️  Concorrente: {args.requests} pedidos, {args.concurrency} de cada vez")
+    phases["concorrente"] = await run_phase(base_url, build_requests(args.requests, csv_sets[1], args.seed),
+                                            args.concurrency)
+    print(f"➡️  Rajada: {args.burst} análises de CSV de uma vez")
+    burst = [("csv", "/csv/analyze", {"file": csv_sets[2][i % len(csv_sets[2])]}) for i in range(args.burst)]
+    phases["rajada"] = await run_phase(base_url, burst, args.burst)
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        stats = (await client.get("/stats")).json()
+    return {"phases": {name: summarize(phase) for name, phase in phases.items()}, "server": stats,
+            "burst_records": phases["rajada"]["records"]}
+
+
+def check_burst(records: list) -> Optional[str]:
+    """Problema encontrado na rajada (nenhum 429 ou 429 sem Retry-After), ou None"""
+    rejected = [record for record in records if record["status"] == 429]
+    if not rejected:
+        return f"nenhum 429 na rajada de {len(records)} pedidos: a fila de CSV não encheu"
+    missing = [record for record in rejected if not (record["retry_after"] or "").isdigit()]
+    if missing:
+        return f"{len(missing)} resposta(s) 429 sem Retry-After"
+    return None
+
+
+def format_report(result: dict) -> str:
+    def fmt(value, pattern="{:.2f}s"):
+        return "-" if value is None else pattern.format(value)
+
+    lines = ["| Fase | Concorrência | Pedidos OK | Tempo total | Vazão | Status |",
+             "|------|--------------|------------|-------------|-------|--------|"]
+    for name, phase in result["phases"].items():
+        status = ", ".join(f"{code}: {count}" for code, count in sorted(phase["status"].items()))
+        lines.append(f"| {name} | {phase['concurrency']} | {phase['ok']}/{phase['requests']} | {phase['seconds']:.2f}s "
+                     f"| {fmt(phase['throughput'], '{:.2f} pedidos/s')} | {status} |")
+
+    lines += ["", "| Fase | Tipo | Pedidos | Latência p50 / p95 / p99 | Primeiro token p50 |",
+              "|------|------|---------|--------------------------|--------------------|"]
+    for name, phase in result["phases"].items():
+        for kind in KINDS:
+            if kind not in phase["kinds"]:
+                continue
+            data = phase["kinds"][kind]
+            seconds, ttft = data["seconds"], data["ttft"]
+            lines.append(f"| {name} | {kind} | {data['count']} | {fmt(seconds['p50'])} / {fmt(seconds['p95'])} / "
+                         f"{fmt(seconds['p99'])} | {fmt(ttft['p50'])} |")
+
+    errors = sorted({error for phase in result["phases"].values() for error in phase["errors"]})
+    if errors:
+        lines += ["", "Erros: " + "; ".join(errors)]
+    queues = result["server"]["queues"]
+    lines += ["", "Filas ao final: " + " · ".join(
+        f"{kind}: {queue['accepted']} aceitos, {queue['rejected']} recusados (429)" for kind, queue in queues.items())]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API HTTP com LLM e gvmd simulados")
+    parser.add_argument("--requests", type=int, default=24, help="Pedidos nas fases sequencial e concorrente")
+    parser.add_argument("--concurrency", type=int, default=12, help="Pedidos simultâneos na fase concorrente")
+    parser.add_argument("--burst", type=int, default=40, help="Análises de CSV enviadas de uma vez na rajada")
+    parser.add_argument("--csv-workers", type=int, default=2, help="API_CSV_WORKERS da API testada")
+    parser.add_argument("--csv-queue", type=int, default=4, help="API_CSV_QUEUE da API testada")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Latência mediana do LLM simulado (s)")
+    parser.add_argument("--token-interval", type=float, default=0.005, help="Segundos entre tokens do LLM simulado")
+    parser.add_argument("--gvmd-latency", type=float, default=0.02, help="Latência de cada comando GMP (s)")
+    parser.add_argument("--rows", type=int, default=500, help="Achados por relatório CSV sintético")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=str(ROOT / "docs" / "API_LOAD_TEST.md"))
+    parser.add_argument("--json", help="Grava também os resultados completos em JSON")
+    args = parser.parse_args()
+    if args.burst <= args.csv_workers + args.csv_queue:
+        parser.error(f"--burst precisa passar de --csv-workers + --csv-queue ({args.csv_workers + args.csv_queue}) "
+                     "para a rajada encher a fila")
+
+    latency = latency_distribution("lognormal", seed=args.seed, median=args.llm_latency, sigma=0.3)
+    llm = StubLLMServer(latency=latency, responder=responder, token_interval=args.token_interval).start()
+    gvmd = StubGVMDServer(latency=args.gvmd_latency, tasks=["Weekly"]).start()
+
+    with tempfile.TemporaryDirectory(prefix="api-load-") as tmp:
+        workdir = Path(tmp)
+        reports = workdir / "csv_reports"
+        reports.mkdir()
+        # Relatórios distintos por fase: nenhum resumo vem do cache
+        per_phase = max(args.requests // 4, 1)
+        csv_sets = []
+        for phase, count in enumerate((per_phase, per_phase, min(args.burst, 20))):
+            names = [f"fase{phase}_{i}.csv" for i in range(count)]
+            for i, name in enumerate(names):
+                generate_synthetic_report(str(reports / name), args.rows, seed=args.seed + phase * 1000 + i)
+            csv_sets.append(names)
+
+        env = {**os.environ,
+               "PYTHONPATH": str(ROOT),
+               "LLM_PROVIDER": "openai", "OPENAI_MODEL_ID": "gpt-4o-mini",
+               "OPENAI_API_KEY": "stub", "GROQ_API_KEY": "stub",
+               "OPENAI_BASE_URL": llm.url, "GROQ_BASE_URL": llm.root_url,
+               "GVMD_SOCKET_PATH": gvmd.path, "GVMD_USERNAME": "stub", "GVMD_PASSWORD": "stub",
+               "LLM_CACHE_PATH": str(workdir / "llm.sqlite"), "REPORT_CACHE_DIR": str(workdir / "reports-cache"),
+               "LLM_TELEMETRY_LOG": str(workdir / "telemetry.jsonl"),
+               "FINDINGS_DB_PATH": str(workdir / "findings.sqlite"), "LOG_LEVEL": "WARNING",
+               # Fila de CSV pequena e sem prazo de espera: a rajada recebe 429 só por fila cheia
+               "API_CSV_WORKERS": str(args.csv_workers), "API_CSV_QUEUE": str(args.csv_queue),
+               "API_MAX_WAIT": "300"}
+        port = free_port()
+        print(f"🚀 API em http://127.0.0.1:{port} (LLM simulado em {llm.url}, gvmd em {gvmd.path})")
+        api = start_api(workdir, port, env)
+        try:
+            result = asyncio.run(run_load(f"http://127.0.0.1:{port}", args, csv_sets))
+        finally:
+            api.terminate()
+            api.wait(timeout=30)
+            llm.stop()
+            gvmd.stop()
+
+    burst_records = result.pop("burst_records")
+    result["llm_requests"] = llm.counters["requests"]
+    result["gmp_commands"] = gvmd.counters["commands"]
+    table = format_report(result)
+    md = f"""# Teste de Carga da API
+
+**Data:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**LLM simulado:** latência mediana {args.llm_latency}s, {args.token_interval}s entre tokens · **gvmd simulado:** {args.gvmd_latency}s por comando
+**Pedidos:** {args.requests} por fase (metade chat, um quarto CSV, um quarto scans) · **Rajada:** {args.burst} CSVs (fila de CSV: {args.csv_workers} em execução + {args.csv_queue} à espera) · **CPUs:** {os.cpu_count()}
+**Chamadas ao LLM:** {result['llm_requests']} · **Comandos GMP:** {result['gmp_commands']}
+
+{table}
+"""
+    output = Path(args.output)
+    output.parent.mkdir(exist_ok=True)
+    output.write_text(md, encoding="utf-8")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"\n{table}\n")
+    print(f"✅ Relatório salvo em: {output}")
+    problem = check_burst(burst_records)
+    if problem:
+        print(f"❌ Rajada: {problem}")
+        sys.exit(1)
+    burst = result["phases"]["rajada"]
+    print(f"✅ Rajada: {burst['status'].get('429', 0)} pedido(s) recusados com 429 "
+          f"(Retry-After: {', '.join(map(str, burst['retry_after']))}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Perfil de inicialização da CLI (main.py) e do Streamlit (streamlit_app.py)
+
+Cada medida roda em um processo Python novo (cold start, sem módulos em memória),
+depois de uma execução descartada que grava os .pyc:
+
+- `import <módulo>` com `python -X importtime`: tempo total do import e tempo
+  próprio de cada pacote (soma do "self" dos seus módulos)
+- CLI até o prompt: `python main.py` recebendo "q" na entrada, ou seja, do
+  início do processo até o banner e o primeiro "User:"
+
+Com --root, o perfil roda em outra cópia do projeto (ex.: um `git worktree` de
+um commit anterior), para comparar antes e depois.
+
+Uso:
+    python models/profile_startup.py
+    python models/profile_startup.py --runs 7 --top 15
+    git worktree add /tmp/antes HEAD~1 && python models/profile_startup.py --root /tmp/antes
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TARGETS = ("main", "streamlit_app")
+
+
+def child_env() -> dict:
+    """Ambiente dos processos medidos: chaves fictícias (nenhum LLM é chamado)"""
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "profile")
+    env.setdefault("GROQ_API_KEY", "profile")
+    return env
+
+
+def parse_importtime(stderr: str):
+    """Linhas de `-X importtime` -> [(módulo, self µs, cumulativo µs, nível)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), level))
+    return entries
+
+
+def profile_import(root: Path, module: str) -> dict:
+    """Importa `module` em um processo novo e devolve o tempo total e o tempo próprio por pacote"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=root, env=child_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} falhou:\n{result.stderr[-2000:]}")
+    entries = parse_importtime(result.stderr)
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        by_package[name.split(".")[0]] += self_us
+    total = next(cumulative for name, _, cumulative, level in entries if name == module and level <= 1)
+    return {"seconds": total / 1e6, "modules": len(entries), "packages": dict(by_package)}
+
+
+def time_cli_prompt(root: Path) -> float:
+    """Segundos do início de `python main.py` até ele sair ao receber "q" no prompt"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "main.py"], cwd=root, env=child_env(), input="q\n",
+                   capture_output=True, text=True, timeout=120)
+    return time.perf_counter() - start
+
+
+def profile_startup(root: Path, runs: int) -> dict:
+    """Medianas de `runs` execuções de cada import e da CLI até o prompt"""
+    report = {}
+    time_cli_prompt(root)  # Aquecimento: compila os .pyc de tudo o que a CLI importa
+    for module in TARGETS:
+        profile_import(root, module)
+        samples = [profile_import(root, module) for _ in range(runs)]
+        packages = defaultdict(list)
+        for sample in samples:
+            for package, self_us in sample["packages"].items():
+                packages[package].append(self_us / 1e6)
+        report[module] = {
+            "seconds": statistics.median(sample["seconds"] for sample in samples),
+            "modules": samples[-1]["modules"],
+            "packages": {package: statistics.median(values + [0.0] * (runs - len(values)))
+                         for package, values in packages.items()},
+        }
+    report["cli_prompt_seconds"] = statistics.median(time_cli_prompt(root) for _ in range(runs))
+    return report
+
+
+def format_report(report: dict, top: int) -> str:
+    lines = [
+        "| Medida | Mediana | Módulos importados |",
+        "|--------|---------|--------------------|",
+        f"| CLI: `python main.py` até o prompt | {report['cli_prompt_seconds']:.2f}s | - |",
+    ]
+    for module in TARGETS:
+        lines.append(f"| `import {module}` | {report[module]['seconds']:.2f}s | {report[module]['modules']} |")
+
+    for module in TARGETS:
+        packages = sorted(report[module]["packages"].items(), key=lambda item: item[1], reverse=True)[:top]
+        lines += ["", f"**Pacotes mais caros em `import {module}` (tempo próprio):**", "",
+                  "| Pacote | Tempo |", "|--------|-------|"]
+        lines += [f"| {package} | {seconds * 1000:.0f} ms |" for package, seconds in packages]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de inicialização da CLI e do Streamlit")
+    parser.add_argument("--root", default=str(ROOT), help="Cópia do projeto a medir")
+    parser.add_argument("--runs", type=int, default=5, help="Execuções por medida (vale a mediana)")
+    parser.add_argument("--top", type=int, default=10, help="Pacotes listados por import")
+    parser.add_argument("--output", default=str(ROOT / "docs" / "STARTUP_PROFILE.md"))
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    print(f"⏱️  Perfil de inicialização de {root} ({args.runs} execuções por medida)")
+    report = profile_startup(root, max(1, args.runs))
+    table = format_report(report, args.top)
+
+    md = f"""# Perfil de Inicialização
+
+**Data:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**Projeto:** `{root}` · **Python:** {sys.version.split()[0]} · **Execuções:** {args.runs}
+
+{table}
+"""
+    output = Path(args.output)
+    output.parent.mkdir(exist_ok=True)
+    output.write_text(md, encoding="utf-8")
+
+    print(f"\n{table}\n")
+    print(f"✅ Relatório salvo em: {output}")
+
+
+if __name__ == "__main__":
+    main()
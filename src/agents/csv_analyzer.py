@@ -1,15 +1,56 @@
 """
 Agente de Análise de CSV do OpenVAS
 """
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import AIMessage, ToolMessage
 from langchain_core.tools import tool
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+import asyncio
 import os
+import re
 
-from ..tools.csv_analyzer import OpenVASCSVAnalyzer
+from ..tools.csv_analyzer import get_csv_analyzer
+from ..tools.findings_store import get_findings_store
+from ..tools.folder_pipeline import iter_folder_analysis
+from ..tools.report_cache import get_report_cache
+from ..tools.llm_cache import get_llm_cache
+from ..tools.llm_streaming import emit_text
 from ..state import AgentState
 
 
+def _get_analyzer():
+    """Analisador compartilhado, com o provider e o modelo das variáveis de ambiente"""
+    llm_provider = os.getenv("LLM_PROVIDER", "groq")
+    model_name = os.getenv("GROQ_MODEL_ID") if llm_provider == "groq" else os.getenv("OPENAI_MODEL_ID")
+    return get_csv_analyzer(llm_provider=llm_provider, model_name=model_name)
+
+
+def _analysis_header(file_path: str, stats: Dict) -> str:
+    return f"""
+📊 Análise do Relatório: {Path(file_path).name}
+{'='*60}
+
+📈 ESTATÍSTICAS:
+- Total de Vulnerabilidades: {stats['total_vulnerabilities']}
+- Hosts Afetados: {stats['unique_hosts']}
+- Distribuição por Severidade: {stats.get('by_severity', {})}
+
+🤖 RESUMO EXECUTIVO:
+"""
+
+
+def _save_analysis(analyzer, file_path: str, result: Dict) -> str:
+    """Salva o relatório em csv_analysis_results/ e devolve o rodapé da resposta"""
+    output_folder = Path("csv_analysis_results")
+    output_folder.mkdir(exist_ok=True)
+    output_file = output_folder / f"relatorio_{Path(file_path).stem}.txt"
+    analyzer.save_report(result, str(output_file))
+    return f"""
+
+💾 Relatório completo salvo em: {output_file}
+"""
+
+
 @tool
 def analyze_csv_report(file_path: str = "") -> str:
     """
@@ -22,41 +63,25 @@ def analyze_csv_report(file_path: str = "") -> str:
         Resumo da análise com estatísticas e insights
     """
     try:
-        # Define provider e modelo
-        llm_provider = os.getenv("LLM_PROVIDER", "groq")
-        model_name = os.getenv("GROQ_MODEL_ID") if llm_provider == "groq" else os.getenv("OPENAI_MODEL_ID")
-        
-        analyzer = OpenVASCSVAnalyzer(llm_provider=llm_provider, model_name=model_name)
+        analyzer = _get_analyzer()
         
         if file_path and file_path.strip():
             # Analisa arquivo específico
             if not Path(file_path).exists():
                 return f"❌ Arquivo não encontrado: {file_path}"
             
-            result = analyzer.analyze_csv_file(file_path)
-            
-            # Salva relatório
-            output_folder = Path("csv_analysis_results")
-            output_folder.mkdir(exist_ok=True)
-            output_file = output_folder / f"relatorio_{Path(file_path).stem}.txt"
-            analyzer.save_report(result, str(output_file))
-            
-            stats = result['statistics']
-            summary = f"""
-📊 Análise do Relatório: {Path(file_path).name}
-{'='*60}
-
-📈 ESTATÍSTICAS:
-- Total de Vulnerabilidades: {stats['total_vulnerabilities']}
-- Hosts Afetados: {stats['unique_hosts']}
-- Distribuição por Severidade: {stats.get('by_severity', {})}
-
-🤖 RESUMO EXECUTIVO:
-{result['summary']}
-
-💾 Relatório completo salvo em: {output_file}
-"""
-            return summary
+            # Estatísticas primeiro: o cabeçalho é publicado no stream do grafo
+            # antes de o resumo começar a ser gerado
+            stats, groups = analyzer.get_file_analysis(file_path)
+            header = _analysis_header(file_path, stats)
+            emit_text(header)
+            result = {
+                "statistics": stats,
+                "summary": analyzer.generate_summary(None, stats, on_token=emit_text, groups=groups),
+            }
+            footer = _save_analysis(analyzer, file_path, result)
+            emit_text(footer)
+            return header + result['summary'] + footer
         
         else:
             # Analisa todos os CSVs da pasta
@@ -73,32 +98,31 @@ def analyze_csv_report(file_path: str = "") -> str:
             
             results = []
             output_folder = Path("csv_analysis_results")
-            output_folder.mkdir(exist_ok=True)
             
-            for csv_file in csv_files:
-                try:
-                    result = analyzer.analyze_csv_file(str(csv_file))
-                    stats = result['statistics']
-                    
-                    # Salva relatório
-                    output_file = output_folder / f"relatorio_{csv_file.stem}.txt"
-                    analyzer.save_report(result, str(output_file))
-                    
-                    results.append(f"""
+            # Arquivos processados em paralelo; resultados na ordem de conclusão
+            for outcome in iter_folder_analysis(analyzer, csv_files, output_folder):
+                csv_file = outcome['file']
+                if outcome['error']:
+                    results.append(f"❌ Erro ao processar {csv_file.name}: {outcome['error']}")
+                    continue
+                
+                stats = outcome['analysis']['statistics']
+                results.append(f"""
 📄 {csv_file.name}
 - Vulnerabilidades: {stats['total_vulnerabilities']}
 - Hosts: {stats['unique_hosts']}
 - Críticas: {stats.get('by_severity', {}).get('Critical', 0)}
-- Relatório: {output_file.name}
+- Relatório: {outcome['output_file'].name}
 """)
-                except Exception as e:
-                    results.append(f"❌ Erro ao processar {csv_file.name}: {str(e)}")
             
+            cache_stats = get_llm_cache().stats()
             summary = f"""
 ✅ Análise de {len(csv_files)} arquivo(s) CSV concluída!
 
 {''.join(results)}
 
+💾 Cache de resumos: {cache_stats['hits']} acerto(s), {cache_stats['misses']} falha(s) nesta sessão
+
 💡 Para visualização interativa, execute: streamlit run streamlit_app.py
 📂 Todos os relatórios foram salvos em: csv_analysis_results/
 """
@@ -108,6 +132,134 @@ def analyze_csv_report(file_path: str = "") -> str:
         return f"❌ Erro na análise: {str(e)}\n\n💡 Dica: Verifique se o arquivo CSV tem o formato correto do OpenVAS."
 
 
+async def aanalyze_csv_report(file_path: str) -> str:
+    """
+    Versão assíncrona de `analyze_csv_report` para um arquivo (nó do grafo na API)
+    
+    A leitura do CSV e a gravação do relatório rodam no executor; o resumo usa a
+    interface assíncrona do analisador (`asummarize`), sem ocupar uma thread
+    enquanto espera o LLM.
+    """
+    try:
+        if not Path(file_path).exists():
+            return f"❌ Arquivo não encontrado: {file_path}"
+        
+        loop = asyncio.get_running_loop()
+        analyzer = await loop.run_in_executor(None, _get_analyzer)
+        stats, groups = await loop.run_in_executor(None, analyzer.get_file_analysis, file_path)
+        header = _analysis_header(file_path, stats)
+        emit_text(header)
+        summary = await analyzer.asummarize(stats, groups, on_token=emit_text)
+        result = {"statistics": stats, "summary": summary["summary"]}
+        footer = await loop.run_in_executor(None, _save_analysis, analyzer, file_path, result)
+        emit_text(footer)
+        return header + result['summary'] + footer
+    except Exception as e:
+        return f"❌ Erro na análise: {str(e)}\n\n💡 Dica: Verifique se o arquivo CSV tem o formato correto do OpenVAS."
+
+
+@tool
+def compare_csv_reports(previous_file: str, current_file: str) -> str:
+    """
+    Compara dois relatórios CSV do OpenVAS da mesma rede e resume apenas o que mudou.
+    
+    Args:
+        previous_file: Caminho do CSV do scan anterior
+        current_file: Caminho do CSV do scan atual
+        
+    Returns:
+        Resumo das mudanças com contagens de achados novos, corrigidos e com severidade alterada
+    """
+    try:
+        for file_path in (previous_file, current_file):
+            if not Path(file_path).exists():
+                return f"❌ Arquivo não encontrado: {file_path}"
+        
+        analyzer = _get_analyzer()
+        
+        header = f"""
+🔀 Comparação de Scans: {Path(previous_file).name} → {Path(current_file).name}
+{'='*60}
+
+🤖 O QUE MUDOU:
+"""
+        emit_text(header)
+        result = analyzer.analyze_scan_delta(previous_file, current_file, on_token=emit_text)
+        
+        output_folder = Path("csv_analysis_results")
+        output_folder.mkdir(exist_ok=True)
+        output_file = output_folder / f"delta_{Path(previous_file).stem}_{Path(current_file).stem}.txt"
+        analyzer.save_report(result, str(output_file))
+        
+        delta = result['statistics']
+        footer = f"""
+
+📈 DELTA:
+- Novos: {delta['new_count']} {delta['new_by_severity']}
+- Corrigidos: {delta['fixed_count']} {delta['fixed_by_severity']}
+- Severidade alterada: {delta['changed_count']} (pioraram: {delta['escalated_count']}, melhoraram: {delta['deescalated_count']})
+- Sem alteração: {delta['unchanged_count']}
+
+💾 Relatório completo salvo em: {output_file}
+"""
+        emit_text(footer)
+        return header + result['summary'] + footer
+    
+    except Exception as e:
+        return f"❌ Erro na comparação: {str(e)}\n\n💡 Dica: Os dois CSVs precisam ter as colunas NVT OID (ou NVT Name) e IP."
+
+
+@tool
+def search_findings(cve: str = "", nvt_oid: str = "", host: str = "", latest: bool = True) -> str:
+    """
+    Consulta a base local de achados (todos os relatórios já ingeridos) por CVE, NVT ou host.
+    
+    Args:
+        cve: Identificador do CVE (ex.: CVE-2021-44228) ou prefixo (ex.: CVE-2021-44*, CVE-2021)
+        nvt_oid: OID do NVT
+        host: IP do host
+        latest: Considera apenas o relatório mais recente de cada host (quem ainda está afetado)
+        
+    Returns:
+        Hosts afetados (para CVE/NVT) ou achados do host
+    """
+    try:
+        store = get_findings_store()
+        total_reports = store.stats()['reports']
+        if not total_reports:
+            return "📭 A base de achados está vazia. Ingira relatórios com: python -m src.tools.findings_store ingest csv_reports/"
+        
+        scope = "no relatório mais recente de cada host" if latest else "em todos os relatórios"
+        if cve or nvt_oid:
+            target = cve.upper() if cve else f"NVT {nvt_oid}"
+            # CVE completo: busca exata; parcial ou com '*': busca por prefixo no índice invertido
+            exact = bool(re.fullmatch(r"CVE-\d{4}-\d{4,}", cve.strip(), re.IGNORECASE))
+            hosts = store.affected_hosts(nvt_oid=nvt_oid or None, cve=cve if exact else None,
+                                         cve_prefix=cve if cve and not exact else None, latest=latest)
+            if not hosts:
+                return f"✅ Nenhum host com {target} {scope} ({total_reports} relatório(s) na base)."
+            lines = [
+                f"  - {h['ip']}" + (f" ({h['hostname']})" if h['hostname'] else "")
+                + f" - {h['findings']} achado(s), CVSS máx. {h['max_cvss']}, visto em {h['last_seen']}"
+                for h in hosts
+            ]
+            return f"🔎 {len(hosts)} host(s) com {target} {scope}:\n\n" + "\n".join(lines)
+        
+        if host:
+            findings = store.query(host=host, latest=latest, limit=50)
+            if not findings:
+                return f"✅ Nenhum achado para {host} {scope}."
+            lines = [
+                f"  - [{f['severity']}] {f['nvt_name']} ({f['port'] or 'general'}/{f['port_protocol'] or ''}) CVSS {f['cvss']}"
+                for f in findings
+            ]
+            return f"🔎 {len(findings)} achado(s) de {host} {scope}:\n\n" + "\n".join(lines)
+        
+        return "❌ Informe um CVE, um NVT OID ou um host para consultar a base de achados."
+    except Exception as e:
+        return f"❌ Erro na consulta: {str(e)}"
+
+
 @tool
 def list_csv_reports() -> str:
     """
@@ -127,7 +279,16 @@ def list_csv_reports() -> str:
     if not csv_files:
         return "❌ Nenhum arquivo CSV encontrado em csv_reports/."
     
-    file_list = "\n".join([f"  - {f.name} ({f.stat().st_size / 1024:.2f} KB)" for f in csv_files])
+    # Contagens vêm do cache de relatórios, sem reprocessar os CSVs
+    cache = get_report_cache()
+    lines = []
+    for f in csv_files:
+        line = f"  - {f.name} ({f.stat().st_size / 1024:.2f} KB)"
+        stats = cache.peek_stats(str(f))
+        if stats:
+            line += f" - {stats['total_vulnerabilities']} vulnerabilidades, {stats['unique_hosts']} hosts"
+        lines.append(line)
+    file_list = "\n".join(lines)
     
     return f"""
 📂 Arquivos CSV disponíveis ({len(csv_files)}):
@@ -138,49 +299,96 @@ def list_csv_reports() -> str:
 """
 
 
+def _route_csv_request(text: str) -> Optional[Tuple[str, Dict]]:
+    """
+    Escolhe a ferramenta para a mensagem do usuário
+    
+    Returns:
+        (nome da ferramenta, argumentos) ou None se a mensagem não for um pedido de CSV
+    """
+    content = text.lower()
+    
+    # Keywords para detectar solicitação de CSV
+    csv_keywords = ['csv', 'relatório', 'relatorio', 'arquivo', 'planilha']
+    analysis_keywords = ['analise', 'analisa', 'analisar', 'insights', 'resumo', 
+                       'análise', 'report', 'avalia', 'verifica', 'mostra']
+    list_keywords = ['listar', 'lista', 'quais', 'mostrar', 'ver', 'disponível', 
+                    'disponivel', 'tem', 'existe']
+    compare_keywords = ['compar', 'diferença', 'diferenca', 'delta', 'mudou', 'mudança', 'mudanca',
+                       'versus']
+    
+    # Verifica se menciona CSV ou análise de relatórios
+    has_csv = any(keyword in content for keyword in csv_keywords)
+    has_analysis = any(keyword in content for keyword in analysis_keywords)
+    has_list = any(keyword in content for keyword in list_keywords)
+    
+    # Nomes de arquivos CSV citados na mensagem, na ordem (anterior, atual)
+    csv_words = [word.strip('.,;:"\'') for word in text.split() if '.csv' in word]
+    csv_paths = [word if word.startswith('csv_reports/') else f"csv_reports/{word}" for word in csv_words]
+    
+    if len(csv_paths) >= 2 and any(keyword in content for keyword in compare_keywords):
+        # Compara dois scans: o LLM recebe apenas o delta
+        return "compare_csv_reports", {"previous_file": csv_paths[0], "current_file": csv_paths[1]}
+    
+    # CVE ou OID de NVT citado: responde pela base de achados, sem reler os CSVs. Pedidos
+    # de análise ("analise report.csv e explique o CVE-...") continuam indo para a análise
+    analysis_request = bool(csv_paths) or (has_csv and has_analysis)
+    cve_match = re.search(r"CVE-\d{4}(?:-\d+)?\*?", text, re.IGNORECASE)
+    oid_match = re.search(r"\b1\.3\.6\.1\.4\.1\.25623(?:\.\d+)+\b", text)
+    if (cve_match or oid_match) and not analysis_request:
+        return "search_findings", {
+            "cve": cve_match.group(0) if cve_match else "",
+            "nvt_oid": oid_match.group(0) if oid_match and not cve_match else "",
+            "latest": not any(word in content for word in ['histórico', 'historico', 'já teve', 'ja teve']),
+        }
+    
+    # Se menciona CSV ou palavras de análise (covers "insights sobre o csv")
+    if has_csv or has_analysis:
+        if has_list and not has_analysis:
+            # Lista arquivos disponíveis
+            return "list_csv_reports", {}
+        # Analisa CSVs
+        # Tenta extrair nome de arquivo da mensagem
+        file_path = ""
+        for word in text.split():
+            if '.csv' in word:
+                file_path = f"csv_reports/{word}" if not word.startswith('csv_reports/') else word
+                break
+        return "analyze_csv_report", {"file_path": file_path}
+    
+    return None
+
+
 def create_csv_analyzer_node():
-    """Cria o nó do agente de análise de CSV."""
-    tools = [analyze_csv_report, list_csv_reports]
+    """
+    Cria o nó do agente de análise de CSV
+    
+    A função tem a versão assíncrona em `anode`, usada pelo grafo na API: a
+    análise de um arquivo roda em `aanalyze_csv_report` e os demais pedidos
+    (pasta inteira, comparação, consultas) vão para o pool de threads.
+    """
+    tools = {t.name: t for t in [analyze_csv_report, compare_csv_reports, search_findings, list_csv_reports]}
     
     def csv_analyzer_agent(state: AgentState):
         """Agente que analisa relatórios CSV do OpenVAS."""
-        messages = state['messages']
-        last_message = messages[-1]
+        route = _route_csv_request(state['messages'][-1].content)
+        if route is None:
+            return {"messages": [AIMessage(content="Não entendi. Você quer analisar um relatório CSV do OpenVAS?")]}
         
-        # Verifica se é uma solicitação de análise de CSV
-        content = last_message.content.lower()
-        
-        # Keywords para detectar solicitação de CSV
-        csv_keywords = ['csv', 'relatório', 'relatorio', 'arquivo', 'planilha']
-        analysis_keywords = ['analise', 'analisa', 'analisar', 'insights', 'resumo', 
-                           'análise', 'report', 'avalia', 'verifica', 'mostra']
-        list_keywords = ['listar', 'lista', 'quais', 'mostrar', 'ver', 'disponível', 
-                        'disponivel', 'tem', 'existe']
-        
-        # Verifica se menciona CSV ou análise de relatórios
-        has_csv = any(keyword in content for keyword in csv_keywords)
-        has_analysis = any(keyword in content for keyword in analysis_keywords)
-        has_list = any(keyword in content for keyword in list_keywords)
-        
-        # Se menciona CSV ou palavras de análise (covers "insights sobre o csv")
-        if has_csv or has_analysis:
-            if has_list and not has_analysis:
-                # Lista arquivos disponíveis
-                result = list_csv_reports.invoke({})
-            else:
-                # Analisa CSVs
-                # Tenta extrair nome de arquivo da mensagem
-                file_path = ""
-                for word in last_message.content.split():
-                    if '.csv' in word:
-                        file_path = f"csv_reports/{word}" if not word.startswith('csv_reports/') else word
-                        break
-                
-                result = analyze_csv_report.invoke({"file_path": file_path})
-            
-            # Retorna como ToolMessage para que o supervisor reconheça como fim
-            return {"messages": [ToolMessage(content=result, tool_call_id="csv_analysis")]}
+        name, args = route
+        result = tools[name].invoke(args)
+        # Retorna como ToolMessage para que o supervisor reconheça como fim
+        return {"messages": [ToolMessage(content=result, tool_call_id="csv_analysis")]}
+    
+    async def acsv_analyzer_agent(state: AgentState):
+        """Versão assíncrona de `csv_analyzer_agent`"""
+        route = _route_csv_request(state['messages'][-1].content)
+        if route is None or route[0] != "analyze_csv_report" or not route[1]["file_path"]:
+            # O contexto (prazo do LLM e stream do grafo) vai junto para a thread
+            return await asyncio.to_thread(csv_analyzer_agent, state)
         
-        return {"messages": [AIMessage(content="Não entendi. Você quer analisar um relatório CSV do OpenVAS?")]}
+        result = await aanalyze_csv_report(route[1]["file_path"])
+        return {"messages": [ToolMessage(content=result, tool_call_id="csv_analysis")]}
     
+    csv_analyzer_agent.anode = acsv_analyzer_agent
     return csv_analyzer_agent
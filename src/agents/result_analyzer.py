@@ -1,22 +1,30 @@
 import functools
 import os
-from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage, SystemMessage
+import re
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage, SystemMessage
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 
 from ..tools.gvm_results import ResultManager
+from ..tools.llm_resilience import stream_chat_resilient
+from ..tools.llm_streaming import emit_text
 from ..state import AgentState  # Import AgentState
 
-def get_response_from_openai(message: list[BaseMessage]):
-    """Função para obter resposta do OpenAI."""
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENAI_MODEL_ID"),
+def get_response_from_openai(message: list[BaseMessage], on_token=None):
+    """Função para obter resposta do OpenAI (em streaming: cada trecho é repassado a on_token).
+
+    A chamada tem prazo, novas tentativas e failover para a Groq (ver llm_resilience).
+    """
+    _, response = stream_chat_resilient(
+        message,
+        on_token,
+        label="análise de resultados",
+        operation="resultados",
+        provider="openai",
+        model_name=os.environ.get("OPENAI_MODEL_ID"),
         temperature=0.1,
         max_tokens=None, # Changed from max_completion_tokens
-        timeout=None,
     )
-    response = llm.invoke(message)
-    return response
+    return AIMessage(content=response["content"])
 
 @tool
 def get_openvas_results(question: str) -> str:
@@ -54,7 +62,7 @@ def get_openvas_results(question: str) -> str:
             HumanMessage(content=f"Please analyze the following OpenVAS scan result: {context}, using {question}")
         ]
     
-        response = get_response_from_openai(messages)
+        response = get_response_from_openai(messages, on_token=emit_text)
     
         return response.content
     except Exception as e:
@@ -1,10 +1,14 @@
 from typing import Literal
-from langchain_core.messages import ToolMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import HumanMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel, Field
 
 from ..state import AgentState
+from ..tools.intent_router import ROUTER_ENABLED, get_intent_router
+from ..tools.llm_registry import describe_chat_model
+from ..tools.llm_resilience import acall_llm, call_llm
 
 class Route(BaseModel):
     """Defines the route for the agent."""
@@ -12,8 +16,12 @@ class Route(BaseModel):
         ...,
         description="The route to the next worker or 'FINISH' to end.")
     
-def create_supervisor_chain(llm: ChatOpenAI):
-    """Cria a cadeia de decisão do supervisor."""
+def create_supervisor_chain(llm: BaseChatModel):
+    """Cria a cadeia de decisão do supervisor.
+
+    A decisão passa pela camada de resiliência (prazo, novas tentativas e failover
+    entre OpenAI e Groq); a cadeia de cada modelo é montada uma vez.
+    """
     system_prompt_supervisor = (
         """You are an expert OpenVAS supervisor and a helpful assistant. Your primary goal is to assist the user with OpenVAS tasks (creating scans, analyzing results, analyzing CSV reports) and also to provide general information and advice related to cybersecurity and vulnerability mitigation based on your knowledge.
 
@@ -30,20 +38,66 @@ Analyze the conversation and decide the next step:
         MessagesPlaceholder(variable_name="messages"),
     ])
     
-    structured_llm_router = llm.with_structured_output(Route)
-    return prompt_supervisor | structured_llm_router
+    provider, model_name = describe_chat_model(llm)
+    temperature = getattr(llm, "temperature", 0)
+    chains = {}
 
-def router_function(state: AgentState, supervisor_chain):
-    """
-    Decide o próximo passo. Se uma ferramenta acabou de ser executada, finaliza.
-    Caso contrário, pergunta ao supervisor.
-    """
+    def chain_for(model):
+        if id(model) not in chains:
+            structured_llm_router = model.with_structured_output(Route).with_config(
+                {"metadata": {"llm_operation": "roteamento"}})
+            chains[id(model)] = prompt_supervisor | structured_llm_router
+        return chains[id(model)]
+
+    async def adecide(state):
+        # Versão do grafo assíncrono (API): a chamada ao LLM não ocupa uma thread
+        return await acall_llm(lambda model: chain_for(model).ainvoke(state), provider,
+                               model_name, "roteamento", temperature=temperature)
+
+    return RunnableLambda(lambda state: call_llm(lambda model: chain_for(model).invoke(state), provider,
+                                                 model_name, "roteamento", temperature=temperature),
+                          afunc=adecide)
+
+def _route_without_llm(state: AgentState):
+    """Rota decidida sem o supervisor LLM ("FINISH" ou a do roteador local), ou None"""
 
     # Verifica se a última mensagem é o resultado de uma ferramenta.
     # Se sim, o trabalho do agente está concluído e o ciclo deve ser encerrado.
     if isinstance(state['messages'][-1], ToolMessage):
         return "FINISH"
 
-    # Se não, é a primeira chamada. Pergunta ao LLM qual rota seguir.
+    # Pedidos com padrão claro (IP, task entre aspas, arquivo .csv...) não precisam do LLM
+    last_message = state['messages'][-1]
+    if ROUTER_ENABLED and isinstance(last_message, HumanMessage):
+        return get_intent_router().route(str(last_message.content))
+    return None
+
+def router_function(state: AgentState, supervisor_chain):
+    """
+    Decide o próximo passo. Se uma ferramenta acabou de ser executada, finaliza.
+    Caso contrário, tenta o roteador local (regras + classificador) e só
+    pergunta ao supervisor LLM quando ele não tem confiança na rota.
+
+    `supervisor_chain` pode ser a cadeia ou uma função sem argumentos que a
+    devolve: assim o cliente LLM só é criado quando o roteador local não decide.
+    """
+    route = _route_without_llm(state)
+    if route is not None:
+        return route
+
+    # Se não, pergunta ao LLM qual rota seguir.
+    if not hasattr(supervisor_chain, "invoke"):
+        supervisor_chain = supervisor_chain()
     route_decision = supervisor_chain.invoke(state)
-    return route_decision.next
\ No newline at end of file
+    return route_decision.next
+
+async def arouter_function(state: AgentState, supervisor_chain):
+    """`router_function` para o grafo assíncrono: o supervisor LLM é chamado com `ainvoke`"""
+    route = _route_without_llm(state)
+    if route is not None:
+        return route
+
+    if not hasattr(supervisor_chain, "invoke"):
+        supervisor_chain = supervisor_chain()
+    route_decision = await supervisor_chain.ainvoke(state)
+    return route_decision.next
@@ -0,0 +1,3 @@
+"""
+API HTTP do agente (ver src/api/server.py)
+"""
@@ -0,0 +1,325 @@
+"""
+API HTTP assíncrona do agente
+
+Processo de longa duração que monta o grafo (src/graph.py) uma única vez e
+atende pedidos concorrentes com `graph.astream`:
+
+- POST /chat          {"message": "...", "stream": true}
+- POST /csv/analyze   {"file": "scan.csv"} (sem "file": todos os CSVs de csv_reports/)
+- POST /scans         {"target": "10.0.0.5", "name": "Lab"}
+- GET  /health        grafo carregado e filas
+- GET  /stats         filas, roteador local e tempo no ar
+
+Com "stream": true (padrão), a resposta é NDJSON: um evento {"event": "token"}
+para cada trecho publicado pelos agentes e, ao final, {"event": "done"} com a
+resposta completa, a rota e os tempos (ou {"event": "error"}). Com
+"stream": false, volta um único JSON.
+
+Cada tipo de pedido tem a sua fila de admissão (`WorkQueue`): no máximo
+`workers` em execução e `max_queued` esperando, por até `max_wait` segundos.
+Acima disso, a API responde 429 com Retry-After em vez de acumular pedidos que
+não seriam atendidos a tempo. Configuração por ambiente:
+
+- API_CHAT_WORKERS / API_CHAT_QUEUE (padrão 16 / 64)
+- API_CSV_WORKERS / API_CSV_QUEUE (padrão 4 / 16)
+- API_SCAN_WORKERS / API_SCAN_QUEUE (padrão 4 / 16)
+- API_MAX_WAIT: segundos máximos na fila (padrão 30)
+- API_THREADS: threads do pool que executa os agentes (padrão 32)
+
+Uso:
+    python -m src.api.server --port 8000
+    curl -N localhost:8000/chat -d '{"message": "listar csv"}'
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+try:
+    from ..graph import get_graph, preload
+    from ..tools.intent_router import HOST_PATTERN, IP_PATTERN, get_intent_router
+    from ..tools.llm_resilience import DEFAULT_DEADLINE, LLMCallError, llm_deadline
+except ImportError:
+    # Execução direta (python src/api/server.py)
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+    from src.graph import get_graph, preload
+    from src.tools.intent_router import HOST_PATTERN, IP_PATTERN, get_intent_router
+    from src.tools.llm_resilience import DEFAULT_DEADLINE, LLMCallError, llm_deadline
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAX_WAIT = float(os.getenv("API_MAX_WAIT", "30"))
+THREADS = int(os.getenv("API_THREADS", "32"))
+QUEUE_LIMITS = {
+    "chat": (int(os.getenv("API_CHAT_WORKERS", "16")), int(os.getenv("API_CHAT_QUEUE", "64"))),
+    "csv": (int(os.getenv("API_CSV_WORKERS", "4")), int(os.getenv("API_CSV_QUEUE", "16"))),
+    "scan": (int(os.getenv("API_SCAN_WORKERS", "4")), int(os.getenv("API_SCAN_QUEUE", "16"))),
+}
+
+CSV_FOLDER = Path("csv_reports")
+TASK_NAME_PATTERN = re.compile(r"""[^"'\n]{1,100}""")
+
+
+class QueueFull(Exception):
+    """Fila de admissão cheia (ou espera acima de `max_wait`): vira 429"""
+
+    def __init__(self, kind: str, retry_after: int):
+        super().__init__(f"Fila '{kind}' cheia, tente novamente em {retry_after}s")
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+class WorkQueue:
+    """Admissão dos pedidos de um tipo: `workers` em execução e até `max_queued` esperando"""
+
+    def __init__(self, kind: str, workers: int, max_queued: int, max_wait: float = MAX_WAIT):
+        """
+        Args:
+            kind: Nome da fila ("chat", "csv", "scan")
+            workers: Pedidos executados ao mesmo tempo
+            max_queued: Pedidos aguardando além dos em execução (0 = nenhum)
+            max_wait: Segundos máximos de espera antes do 429
+        """
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queued = max(0, max_queued)
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.running = 0
+        self.counters = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._service_seconds = 0.0
+        self._semaphore = asyncio.Semaphore(self.workers)
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos no Retry-After: o tempo para a fila atual ser atendida"""
+        finished = self.counters["completed"] + self.counters["failed"]
+        mean = self._service_seconds / finished if finished else 1.0
+        return max(1, math.ceil(mean * (self.waiting + 1) / self.workers))
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Espera a vez do pedido; levanta `QueueFull` se a fila estiver cheia"""
+        # Conta os que esperam pelo semáforo: numa rajada, todos chegam antes de o primeiro adquiri-lo
+        if self.running + self.waiting >= self.workers + self.max_queued:
+            self.counters["rejected"] += 1
+            raise QueueFull(self.kind, self.retry_after())
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            raise QueueFull(self.kind, self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        self.counters["accepted"] += 1
+        self.running += 1
+        start = time.perf_counter()
+        try:
+            yield
+            self.counters["completed"] += 1
+        except BaseException:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self._service_seconds += time.perf_counter() - start
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {"workers": self.workers, "max_queued": self.max_queued, "running": self.running,
+                "waiting": self.waiting, **self.counters}
+
+
+GRAPH = web.AppKey("graph", object)
+QUEUES = web.AppKey("queues", dict)
+STARTED = web.AppKey("started", float)
+
+
+async def run_graph(message: str):
+    """
+    Executa o grafo para uma mensagem
+
+    Yields:
+        ("token", trecho) para cada trecho publicado pelos agentes e, ao final,
+        ("done", {"response", "route", "seconds", "ttft"})
+    """
+    from langchain_core.messages import HumanMessage
+
+    start = time.perf_counter()
+    ttft = None
+    route, response = None, ""
+    inputs = {"messages": [HumanMessage(content=message)]}
+    # Todas as chamadas ao LLM do pedido dividem o mesmo prazo (LLM_DEADLINE_SECONDS)
+    with llm_deadline(DEFAULT_DEADLINE):
+        async for mode, payload in get_graph().astream(inputs, {"recursion_limit": 5},
+                                                       stream_mode=["custom", "updates"]):
+            if mode == "custom":
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                yield "token", payload
+                continue
+            for node, update in payload.items():
+                if node != "supervisor" and update and update.get("messages"):
+                    route = node
+                    response = str(update["messages"][-1].content)
+    yield "done", {"response": response, "route": route, "seconds": round(time.perf_counter() - start, 4),
+                   "ttft": None if ttft is None else round(ttft, 4)}
+
+
+async def respond(request: web.Request, kind: str, message: str, stream: bool) -> web.StreamResponse:
+    """Passa o pedido pela fila `kind` e devolve a resposta do grafo (NDJSON ou JSON)"""
+    queue: WorkQueue = request.app[QUEUES][kind]
+    try:
+        async with queue.slot():
+            if not stream:
+                result = None
+                async for event, payload in run_graph(message):
+                    if event == "done":
+                        result = payload
+                return web.json_response(result)
+
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            try:
+                async for event, payload in run_graph(message):
+                    line = {"event": "token", "text": payload} if event == "token" else {"event": "done", **payload}
+                    await response.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+            except ConnectionResetError:
+                # Cliente desconectou no meio do stream: não há a quem responder
+                return response
+            except Exception as e:
+                # O status 200 já foi enviado: o erro vai como último evento do stream
+                logger.exception("Falha no pedido %s", kind)
+                error = {"event": "error", "error": f"{type(e).__name__}: {e}"}
+                try:
+                    await response.write((json.dumps(error, ensure_ascii=False) + "\n").encode("utf-8"))
+                except ConnectionResetError:
+                    return response
+            await response.write_eof()
+            return response
+    except QueueFull as e:
+        return web.json_response({"error": str(e)}, status=429, headers={"Retry-After": str(e.retry_after)})
+    except LLMCallError as e:
+        return web.json_response({"error": f"O LLM não respondeu a tempo: {e}"}, status=504)
+
+
+async def read_json(request: web.Request) -> Dict:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Corpo JSON inválido"}), content_type="application/json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Esperado um objeto JSON"}), content_type="application/json")
+    return body
+
+
+def bad_request(message: str) -> web.Response:
+    return web.json_response({"error": message}, status=400)
+
+
+async def chat(request: web.Request) -> web.StreamResponse:
+    body = await read_json(request)
+    message = str(body.get("message", "")).strip()
+    if not message:
+        return bad_request('Campo "message" obrigatório')
+    return await respond(request, "chat", message, bool(body.get("stream", True)))
+
+
+async def analyze_csv(request: web.Request) -> web.StreamResponse:
+    body = await read_json(request)
+    file_name = str(body.get("file", "")).strip()
+    if not file_name:
+        message = "analise os relatórios csv"
+    else:
+        # Só arquivos de csv_reports/, pelo nome
+        if Path(file_name).name != file_name or not file_name.lower().endswith(".csv"):
+            return bad_request('"file" deve ser o nome de um .csv em csv_reports/')
+        if not (CSV_FOLDER / file_name).exists():
+            return web.json_response({"error": f"Arquivo não encontrado: {CSV_FOLDER / file_name}"}, status=404)
+        message = f"analise o csv {file_name}"
+    return await respond(request, "csv", message, bool(body.get("stream", True)))
+
+
+async def create_scan(request: web.Request) -> web.StreamResponse:
+    body = await read_json(request)
+    target = str(body.get("target", "")).strip()
+    name = str(body.get("name", "")).strip()
+    if not (IP_PATTERN.fullmatch(target) or HOST_PATTERN.fullmatch(target)):
+        return bad_request('"target" deve ser um IP, faixa de IPs ou hostname')
+    if name and not TASK_NAME_PATTERN.fullmatch(name):
+        return bad_request('"name" não pode ter aspas nem quebras de linha (até 100 caracteres)')
+    # Mesma mensagem que o usuário escreveria na CLI: o roteador local a manda para o TaskCreator
+    message = f'create task for {target} called "{name}"' if name else f"create task for {target}"
+    return await respond(request, "scan", message, bool(body.get("stream", True)))
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "graph": request.app[GRAPH] is not None})
+
+
+async def stats(request: web.Request) -> web.Response:
+    return web.json_response({
+        "uptime_seconds": round(time.monotonic() - request.app[STARTED], 1),
+        "queues": {kind: queue.stats() for kind, queue in request.app[QUEUES].items()},
+        "intent_router": get_intent_router().stats(),
+    })
+
+
+async def on_startup(app: web.Application):
+    loop = asyncio.get_running_loop()
+    # Os agentes bloqueantes rodam neste pool (asyncio.to_thread usa o executor padrão)
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="agent"))
+    app[QUEUES] = {kind: WorkQueue(kind, workers, max_queued) for kind, (workers, max_queued) in QUEUE_LIMITS.items()}
+    start = time.perf_counter()
+    app[GRAPH] = await asyncio.to_thread(preload)
+    get_intent_router()
+    app[STARTED] = time.monotonic()
+    logger.info("Grafo carregado em %.2fs", time.perf_counter() - start)
+
+
+def create_app() -> web.Application:
+    """Aplicação aiohttp com as rotas da API (o grafo é carregado no startup)"""
+    app = web.Application()
+    app[GRAPH] = None
+    app.on_startup.append(on_startup)
+    app.add_routes([
+        web.post("/chat", chat),
+        web.post("/csv/analyze", analyze_csv),
+        web.post("/scans", create_scan),
+        web.get("/health", health),
+        web.get("/stats", stats),
+    ])
+    return app
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="API HTTP do agente OpenVAS")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(f"🚀 API do agente em http://{args.host}:{args.port}")
+    web.run_app(create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
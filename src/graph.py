@@ -0,0 +1,173 @@
+"""
+Grafo do agente (supervisor + TaskCreator, ResultAnalyzer e CSVAnalyzer)
+
+Compartilhado pela CLI (main.py) e pela API HTTP (src/api/server.py). LangGraph,
+agentes e cliente LLM são importados/criados sob demanda: a CLI mostra o banner
+sem esperar por eles, só o provider escolhido é carregado e cada agente só é
+montado quando uma mensagem é roteada para ele (ver models/profile_startup.py).
+
+Os nós têm versão síncrona (CLI, `graph.stream`) e assíncrona (API,
+`graph.astream`). Na assíncrona, o supervisor LLM é chamado com `ainvoke` no
+próprio event loop; o CSVAnalyzer resume um arquivo pela interface assíncrona do
+analisador (`aanalyze_csv_report`) e o restante do trabalho bloqueante dos agentes
+(GMP, pastas de CSV) roda no pool de threads. Cada agente é limitado por:
+
+- TASK_CREATOR_WORKERS (padrão 4): scans criados ao mesmo tempo no gvmd
+- RESULT_ANALYZER_WORKERS (padrão 4): consultas de resultados ao gvmd
+- CSV_ANALYZER_WORKERS (padrão 2): análises de CSV (pandas + resumo do LLM)
+"""
+import importlib
+import logging
+import os
+import threading
+import weakref
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    import asyncio
+
+logger = logging.getLogger(__name__)
+
+AGENT_NODES = {
+    "TaskCreator": ("src.agents.task_creator", "create_task_creator_node"),
+    "ResultAnalyzer": ("src.agents.result_analyzer", "create_result_analyzer_node"),
+    "CSVAnalyzer": ("src.agents.csv_analyzer", "create_csv_analyzer_node"),
+}
+
+AGENT_WORKERS = {
+    "TaskCreator": int(os.getenv("TASK_CREATOR_WORKERS", "4")),
+    "ResultAnalyzer": int(os.getenv("RESULT_ANALYZER_WORKERS", "4")),
+    "CSVAnalyzer": int(os.getenv("CSV_ANALYZER_WORKERS", "2")),
+}
+
+_graph = None
+_supervisor_chain = None
+_agents: Dict[str, object] = {}
+_lock = threading.Lock()
+
+# Semáforos de cada event loop (asyncio.Semaphore fica preso ao loop em que é usado)
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def get_agent(name: str):
+    """Função do agente `name`, importada e criada na primeira chamada"""
+    with _lock:
+        if name not in _agents:
+            module_name, factory_name = AGENT_NODES[name]
+            _agents[name] = getattr(importlib.import_module(module_name), factory_name)()
+        return _agents[name]
+
+
+def _agent_semaphore(name: str) -> "asyncio.Semaphore":
+    import asyncio
+
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    if name not in semaphores:
+        semaphores[name] = asyncio.Semaphore(max(1, AGENT_WORKERS[name]))
+    return semaphores[name]
+
+
+def lazy_node(name: str):
+    """Nó do grafo que cria o agente na primeira vez em que é executado"""
+    # asyncio só entra com o grafo: a CLI mostra o prompt sem importá-lo
+    import asyncio
+
+    from langchain_core.runnables import RunnableLambda
+
+    def node(state):
+        return get_agent(name)(state)
+
+    async def anode(state):
+        # Espera a vez do agente sem ocupar uma thread. Agentes com versão assíncrona
+        # (`anode`) rodam no loop; os demais vão para o pool (o contexto, com o prazo
+        # do LLM e o stream do grafo, vai junto)
+        async with _agent_semaphore(name):
+            agent = get_agent(name)
+            if hasattr(agent, "anode"):
+                return await agent.anode(state)
+            return await asyncio.to_thread(agent, state)
+
+    return RunnableLambda(node, afunc=anode, name=name)
+
+
+def get_supervisor_chain():
+    """Cadeia do supervisor LLM, criada na primeira mensagem que o roteador local não decide"""
+    global _supervisor_chain
+    with _lock:
+        if _supervisor_chain is None:
+            from src.agents.supervisor import create_supervisor_chain
+            from src.tools.llm_registry import get_chat_model
+
+            # Cliente compartilhado (mesma instância usada pelo analisador de CSV)
+            llm_provider = os.getenv("LLM_PROVIDER", "openai").lower()
+            llm = get_chat_model("groq" if llm_provider == "groq" else "openai", temperature=0)
+            _supervisor_chain = create_supervisor_chain(llm)
+        return _supervisor_chain
+
+
+def get_graph():
+    """Grafo compilado (supervisor + agentes), montado na primeira chamada"""
+    global _graph
+    with _lock:
+        if _graph is not None:
+            return _graph
+
+        from langchain_core.runnables import RunnableLambda
+        from langgraph.graph import StateGraph, END
+
+        from src.agents.supervisor import arouter_function, router_function
+        from src.state import AgentState
+
+        workflow = StateGraph(AgentState)
+
+        # Nós dos agentes, com edges de volta para o supervisor
+        for name in AGENT_NODES:
+            workflow.add_node(name, lazy_node(name))
+            workflow.add_edge(name, "supervisor")
+
+        async def empty_supervisor(state):
+            return {"messages": []}
+
+        # Nó supervisor vazio
+        workflow.add_node("supervisor", RunnableLambda(lambda state: {"messages": []}, afunc=empty_supervisor,
+                                                       name="supervisor"))
+
+        async def aroute(state):
+            return await arouter_function(state, get_supervisor_chain)
+
+        # Roteamento condicional do supervisor
+        workflow.add_conditional_edges(
+            "supervisor",
+            RunnableLambda(lambda state: router_function(state, get_supervisor_chain), afunc=aroute,
+                           name="router"),
+            {
+                "TaskCreator": "TaskCreator",
+                "ResultAnalyzer": "ResultAnalyzer",
+                "CSVAnalyzer": "CSVAnalyzer",
+                "FINISH": END,
+                "supervisor": "supervisor",
+            },
+        )
+
+        workflow.set_entry_point("supervisor")
+        _graph = workflow.compile()
+        return _graph
+
+
+def preload():
+    """
+    Monta o grafo, os agentes e (se houver chave) o supervisor LLM de uma vez
+
+    Usado por processos de longa duração, como a API: o primeiro pedido não paga
+    os imports e a criação dos clientes.
+    """
+    graph = get_graph()
+    for name in AGENT_NODES:
+        get_agent(name)
+    try:
+        get_supervisor_chain()
+    except Exception as e:
+        # Sem chave do LLM, o roteador local ainda atende os pedidos com padrão claro
+        logger.warning("Supervisor LLM indisponível (%s: %s)", type(e).__name__, e)
+    return graph
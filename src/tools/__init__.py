@@ -1,3 +1,28 @@
-from .gvm_results import ResultManager
-from .gvm_workflow import GVMWorkflow
-from .csv_analyzer import OpenVASCSVAnalyzer
\ No newline at end of file
+"""
+Ferramentas do agente
+
+As classes abaixo são carregadas só no primeiro acesso (PEP 562): importar um
+submódulo leve, como `src.tools.intent_router`, não arrasta o cliente GVM nem
+o pandas para o processo.
+"""
+import importlib
+
+_LAZY_EXPORTS = {
+    "ResultManager": ".gvm_results",
+    "GVMWorkflow": ".gvm_workflow",
+    "OpenVASCSVAnalyzer": ".csv_analyzer",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
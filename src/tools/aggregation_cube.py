@@ -0,0 +1,221 @@
+"""
+Cubo de agregação dos achados de um relatório
+
+Os achados são agregados uma vez por (host, severidade, porta/protocolo, NVT,
+tipo de solução), com a contagem e o maior CVSS de cada célula. Como a mesma
+combinação se repete muito num relatório, o cubo tem bem menos linhas que o CSV,
+e qualquer recorte ("hosts com achados High", "severidades na porta 443/tcp")
+é um filtro seguido de agregação sobre as células, sem reler os achados. É o que
+os gráficos com filtro cruzado do Streamlit usam.
+
+As dimensões ficam guardadas como códigos inteiros (um array numpy por dimensão),
+então filtros e agregações são operações vetorizadas sobre esses arrays.
+"""
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .csv_analyzer import classify_cvss
+except ImportError:
+    # Execução direta (python src/tools/aggregation_cube.py)
+    from csv_analyzer import classify_cvss
+
+
+# Nome da dimensão -> coluna exibida
+CUBE_DIMENSIONS = {
+    "host": "IP",
+    "severity": "Severity",
+    "port": "Port",
+    "nvt": "NVT Name",
+    "solution": "Solution Type",
+}
+
+# Colunas equivalentes em exportações mais simples
+COLUMN_FALLBACKS = {"IP": "Host", "Port Protocol": "Protocol", "NVT Name": "Vulnerability"}
+
+# Valor usado quando a dimensão não está preenchida no achado
+MISSING_VALUE = "N/A"
+
+# Tamanho máximo (valores × hosts) da matriz de bits usada para contar hosts distintos
+BITMAP_MAX_CELLS = 50_000_000
+
+
+def _column(df: pd.DataFrame, name: str) -> Optional[pd.Series]:
+    source = name if name in df.columns else COLUMN_FALLBACKS.get(name)
+    return df[source] if source in df.columns else None
+
+
+def _encode(values: Optional[pd.Series], size: int):
+    """(códigos int32, rótulos) de uma coluna, com MISSING_VALUE para vazios"""
+    if values is None:
+        return np.zeros(size, dtype="int32"), np.array([MISSING_VALUE], dtype=object)
+    codes, labels = pd.factorize(values, sort=False)
+    labels = np.asarray(labels.astype("str"), dtype=object)
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels = np.append(labels, MISSING_VALUE)
+    return codes.astype("int32"), labels
+
+
+def _encode_ports(df: pd.DataFrame):
+    """Porta e protocolo como um único rótulo: '443/tcp', ou 'general/tcp' para achados sem porta"""
+    port = _column(df, "Port")
+    if port is None:
+        return _encode(None, len(df))
+    numbers = pd.to_numeric(port, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    numbers = np.where(np.isnan(numbers), -1, numbers).astype("int64")
+    protocol_codes, protocols = _encode(_column(df, "Port Protocol"), len(df))
+    # Fatora os pares (porta, protocolo) e só monta o texto dos pares distintos
+    pairs = (numbers + 1) * (len(protocols) + 1) + protocol_codes
+    codes, uniques = pd.factorize(pairs, sort=False)
+    labels = []
+    for pair in uniques:
+        number, protocol = divmod(int(pair), len(protocols) + 1)
+        name = "general" if number == 0 else str(number - 1)
+        labels.append(name if protocols[protocol] == MISSING_VALUE else f"{name}/{protocols[protocol]}")
+    return codes.astype("int32"), np.array(labels, dtype=object)
+
+
+class FindingsCube:
+    """Contagens e maior CVSS por combinação de dimensões, com recortes sob demanda"""
+
+    def __init__(self, df: pd.DataFrame, cvss_bands: Union[str, List] = "v3"):
+        """
+        Args:
+            df: Achados do relatório
+            cvss_bands: Faixas usadas para classificar o CVSS quando não há coluna 'Severity'
+        """
+        cvss = _column(df, "CVSS")
+        scores = pd.to_numeric(cvss, errors="coerce").to_numpy(dtype="float64", na_value=np.nan) \
+            if cvss is not None else np.full(len(df), np.nan)
+
+        codes, self.labels = {}, {}
+        for name, column in CUBE_DIMENSIONS.items():
+            if name == "port":
+                codes[name], self.labels[name] = _encode_ports(df)
+                continue
+            values = _column(df, column)
+            if name == "severity" and values is None and cvss is not None:
+                values = classify_cvss(cvss, cvss_bands)
+            codes[name], self.labels[name] = _encode(values, len(df))
+
+        # Uma célula por combinação presente no relatório
+        frame = pd.DataFrame(codes)
+        frame["cvss"] = scores
+        cells = frame.groupby(list(CUBE_DIMENSIONS), sort=False).agg(
+            findings=("cvss", "size"), max_cvss=("cvss", "max")).reset_index()
+
+        self.codes = {name: cells[name].to_numpy(dtype="int32") for name in CUBE_DIMENSIONS}
+        self.findings = cells["findings"].to_numpy(dtype="int64")
+        self.max_cvss = cells["max_cvss"].to_numpy(dtype="float64")
+        self.total_findings = int(len(df))
+        self._lookup = {name: {label: code for code, label in enumerate(labels)}
+                        for name, labels in self.labels.items()}
+        self._label_rank = {name: np.argsort(np.argsort(labels.astype("str"), kind="stable"))
+                            for name, labels in self.labels.items()}
+
+    def __len__(self) -> int:
+        return len(self.findings)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [*self.codes.values(), self.findings, self.max_cvss]
+        return int(sum(a.nbytes for a in arrays) + sum(len(labels) * 64 for labels in self.labels.values()))
+
+    def _mask(self, filters: Optional[Dict[str, List[str]]], exclude: Optional[str] = None) -> Optional[np.ndarray]:
+        """Células que atendem aos filtros ({dimensão: valores aceitos}), ignorando `exclude`; None = todas"""
+        mask = None
+        for name, values in (filters or {}).items():
+            if name == exclude or not values:
+                continue
+            if name not in CUBE_DIMENSIONS:
+                raise ValueError(f"Dimensão desconhecida: {name}. Use uma de: {', '.join(CUBE_DIMENSIONS)}")
+            accepted = np.zeros(len(self.labels[name]), dtype=bool)
+            accepted[[self._lookup[name][v] for v in values if v in self._lookup[name]]] = True
+            selected = accepted[self.codes[name]]
+            mask = selected if mask is None else mask & selected
+        return mask
+
+    def rollup(self, dimension: str, filters: Optional[Dict[str, List[str]]] = None,
+               top: Optional[int] = None, cross_filter: bool = True) -> pd.DataFrame:
+        """
+        Agrega o cubo por uma dimensão
+
+        Args:
+            dimension: Uma das chaves de CUBE_DIMENSIONS
+            filters: {dimensão: valores aceitos}
+            top: Mantém só os `top` valores com mais achados
+            cross_filter: Não aplica o filtro da própria dimensão, para que o gráfico
+                dela continue mostrando as outras opções (filtro cruzado)
+
+        Returns:
+            DataFrame com a coluna da dimensão (ver CUBE_DIMENSIONS), 'findings',
+            'max_cvss' e 'hosts' (hosts distintos), do valor com mais achados para o
+            com menos
+        """
+        if dimension not in CUBE_DIMENSIONS:
+            raise ValueError(f"Dimensão desconhecida: {dimension}. Use uma de: {', '.join(CUBE_DIMENSIONS)}")
+        mask = self._mask(filters, dimension if cross_filter else None)
+        codes, findings, max_cvss = self.codes[dimension], self.findings, self.max_cvss
+        hosts = self.codes["host"]
+        if mask is not None:
+            codes, findings, max_cvss, hosts = codes[mask], findings[mask], max_cvss[mask], hosts[mask]
+
+        size = len(self.labels[dimension])
+        totals = np.bincount(codes, weights=findings, minlength=size).astype("int64")
+        highest = np.full(size, -np.inf)
+        np.fmax.at(highest, codes, max_cvss)
+        host_total = len(self.labels["host"])
+        if dimension == "host":
+            host_counts = (totals > 0).astype("int64")
+        elif size * host_total <= BITMAP_MAX_CELLS:
+            # Pares (valor, host) distintos marcados numa matriz de bits
+            seen = np.zeros((size, host_total), dtype=bool)
+            seen[codes, hosts] = True
+            host_counts = seen.sum(axis=1)
+        else:
+            pairs = pd.unique(codes.astype("int64") * host_total + hosts)
+            host_counts = np.bincount(pairs // host_total, minlength=size)
+
+        present = np.flatnonzero(totals)
+        # Mais achados primeiro; no empate, ordem alfabética do rótulo
+        order = present[np.lexsort((self._label_rank[dimension][present], -totals[present]))]
+        if top:
+            order = order[:top]
+        return pd.DataFrame({
+            CUBE_DIMENSIONS[dimension]: self.labels[dimension][order],
+            "findings": totals[order],
+            "max_cvss": np.where(np.isinf(highest[order]), np.nan, highest[order]),
+            "hosts": host_counts[order],
+        })
+
+    def pivot(self, rows: str, columns: str, filters: Optional[Dict[str, List[str]]] = None,
+              row_values: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Matriz de contagens entre duas dimensões (ex.: hosts × severidade)
+
+        Args:
+            row_values: Restringe as linhas a esses valores (ex.: os hosts de um `rollup`)
+        """
+        mask = self._mask({**(filters or {}), **({rows: row_values} if row_values is not None else {})})
+        frame = pd.DataFrame({rows: self.codes[rows], columns: self.codes[columns], "findings": self.findings})
+        if mask is not None:
+            frame = frame[mask]
+        matrix = frame.pivot_table(index=rows, columns=columns, values="findings", aggfunc="sum", fill_value=0)
+        matrix.index = pd.Index(self.labels[rows][matrix.index], name=CUBE_DIMENSIONS[rows])
+        matrix.columns = pd.Index(self.labels[columns][matrix.columns], name=CUBE_DIMENSIONS[columns])
+        return matrix
+
+    def totals(self, filters: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Achados, hosts e NVTs distintos e maior CVSS no recorte"""
+        mask = self._mask(filters)
+        select = (lambda a: a) if mask is None else (lambda a: a[mask])
+        max_cvss = select(self.max_cvss)
+        return {
+            "findings": int(select(self.findings).sum()),
+            "hosts": int(len(np.unique(select(self.codes["host"])))),
+            "nvts": int(len(np.unique(select(self.codes["nvt"])))),
+            "max_cvss": None if np.isnan(max_cvss).all() else float(np.nanmax(max_cvss)),
+        }
@@ -0,0 +1,207 @@
+"""
+Cache em memória das análises de relatórios, compartilhado pelo processo
+
+Cada relatório (identificado pelo hash do conteúdo) é lido uma única vez e gera
+estatísticas, grupos de achados, o explorador paginado e o cubo de agregação
+usado pelos gráficos; os resumos gerados
+também ficam guardados, por provider/modelo (ver `add_summary`). No Streamlit, em que toda interação
+reexecuta o script, isso faz a página ser redesenhada sem reler o CSV e sem
+chamar o LLM. As entradas dividem um orçamento de memória
+(ANALYSIS_CACHE_MAX_MB, padrão: 512) e as menos usadas saem primeiro.
+"""
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+try:
+    from .aggregation_cube import FindingsCube
+    from .csv_analyzer import compute_vulnerability_statistics, load_openvas_csv
+    from .finding_groups import compute_finding_groups
+    from .findings_explorer import FindingsExplorer
+except ImportError:
+    # Execução direta (python src/tools/analysis_memory_cache.py)
+    from aggregation_cube import FindingsCube
+    from csv_analyzer import compute_vulnerability_statistics, load_openvas_csv
+    from finding_groups import compute_finding_groups
+    from findings_explorer import FindingsExplorer
+
+
+DEFAULT_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+def _estimate_size(value) -> int:
+    """Memória aproximada de um valor guardado no cache"""
+    if isinstance(value, FindingsExplorer):
+        return int(value.df.memory_usage(deep=True).sum())
+    if isinstance(value, FindingsCube):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (dict, list)):
+        return len(json.dumps(value, default=str))
+    return sys.getsizeof(value)
+
+
+class ReportAnalysis:
+    """Estatísticas, grupos, explorador, cubo e resumos de um relatório"""
+
+    def __init__(self, digest: str, statistics: Dict, groups: List[Dict], explorer: FindingsExplorer,
+                 cube: FindingsCube):
+        self.digest = digest
+        self.statistics = statistics
+        self.groups = groups
+        self.explorer = explorer
+        self.cube = cube
+        self.summaries: Dict[tuple, str] = {}
+        self.nbytes = sum(_estimate_size(value) for value in (statistics, groups, explorer, cube))
+
+
+def analyze_report_data(source: Union[str, bytes], digest: Optional[str] = None,
+                        cvss_bands: Union[str, List] = "v3") -> ReportAnalysis:
+    """
+    Lê o relatório uma vez (perfil "analysis") e calcula tudo o que a interface exibe
+
+    Args:
+        source: Caminho do CSV ou o conteúdo do arquivo (ex.: upload do Streamlit),
+            lido direto da memória
+        digest: Hash do conteúdo, se já conhecido
+        cvss_bands: Faixas de severidade (ver `classify_cvss`)
+    """
+    if isinstance(source, bytes):
+        digest = digest or hashlib.sha256(source).hexdigest()
+        source = io.BytesIO(source)
+    df = load_openvas_csv(source, profile="analysis")
+    return ReportAnalysis(
+        digest=digest,
+        statistics=compute_vulnerability_statistics(df, cvss_bands),
+        groups=compute_finding_groups(df),
+        explorer=FindingsExplorer(df),
+        cube=FindingsCube(df, cvss_bands),
+    )
+
+
+class AnalysisMemoryCache:
+    """
+    Análises de relatórios em memória, por hash do conteúdo, com orçamento de bytes (LRU)
+
+    Uma análise maior que o orçamento inteiro é devolvida sem ser guardada.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, ReportAnalysis]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def get(self, digest: str) -> Optional[ReportAnalysis]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+            return entry
+
+    def put(self, analysis: ReportAnalysis):
+        with self._lock:
+            self._entries[analysis.digest] = analysis
+            self._entries.move_to_end(analysis.digest)
+            self._evict()
+
+    def add_summary(self, analysis: ReportAnalysis, key: tuple, summary: str):
+        """
+        Guarda o resumo de `key` (provider, modelo) na análise
+
+        O tamanho do resumo entra no orçamento da entrada, e as menos usadas saem
+        se o cache passar de max_bytes.
+        """
+        with self._lock:
+            previous = analysis.summaries.get(key)
+            analysis.summaries[key] = summary
+            analysis.nbytes += _estimate_size(summary) - (_estimate_size(previous) if previous is not None else 0)
+            if self._entries.get(analysis.digest) is analysis:
+                self._entries.move_to_end(analysis.digest)
+                self._evict()
+
+    def _evict(self):
+        used = self.used_bytes
+        while self._entries and used > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            used -= entry.nbytes
+            self.evictions += 1
+
+    def analyze(self, source: Union[str, bytes], digest: Optional[str] = None,
+                cvss_bands: Union[str, List] = "v3") -> ReportAnalysis:
+        """
+        Análise do relatório, do cache ou calculada agora
+
+        Args:
+            source: Caminho do CSV ou conteúdo do arquivo
+            digest: Hash do conteúdo (para caminhos, use `ReportCache.content_hash`,
+                que memoriza o hash por tamanho e data de modificação). Se None, é
+                calculado a partir do conteúdo
+        """
+        if digest is None:
+            data = source if isinstance(source, bytes) else Path(source).read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+        key = f"{digest}:{json.dumps(cvss_bands)}"
+
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        # Sessões diferentes pedindo o mesmo relatório esperam uma única leitura
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            entry = self.get(key)
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                entry = analyze_report_data(source, key, cvss_bands)
+                self.put(entry)
+        with self._lock:
+            self._loading.pop(key, None)
+        return entry
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_analysis_cache: Optional[AnalysisMemoryCache] = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> AnalysisMemoryCache:
+    """Cache de análises compartilhado pelo processo (todas as sessões do Streamlit)"""
+    global _analysis_cache
+    with _analysis_cache_lock:
+        if _analysis_cache is None:
+            _analysis_cache = AnalysisMemoryCache()
+        return _analysis_cache
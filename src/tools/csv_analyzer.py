@@ -2,118 +2,568 @@
 Módulo para análise de relatórios CSV do OpenVAS
 Suporta tanto OpenAI quanto modelos opensource (Groq)
 """
+import asyncio
+import functools
 import os
+import threading
+import time
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 import json
 
-# Imports condicionais para suportar diferentes providers
 try:
-    from langchain_openai import ChatOpenAI
+    from .report_cache import ReportCache, get_report_cache
+    from .llm_cache import LLMResponseCache, get_llm_cache
 except ImportError:
-    ChatOpenAI = None
+    # Execução direta (python src/tools/csv_analyzer.py)
+    from report_cache import ReportCache, get_report_cache
+    from llm_cache import LLMResponseCache, get_llm_cache
+
+
+def _llm_layer():
+    """
+    Módulos de LLM (hedging, registro de clientes e resiliência), importados no primeiro uso
+
+    Eles trazem o LangChain e o httpx; quem só lê relatórios (estatísticas, cubo,
+    base de achados, Streamlit antes do primeiro resumo) não paga por eles.
+    """
+    try:
+        from . import llm_hedging, llm_registry, llm_resilience
+    except ImportError:
+        # Execução direta (python src/tools/csv_analyzer.py)
+        import llm_hedging
+        import llm_registry
+        import llm_resilience
+    return llm_hedging, llm_registry, llm_resilience
+
+
+# Versão do parser: incremente ao mudar a forma como os CSVs são lidos/tipados,
+# para invalidar as entradas do cache de relatórios
+PARSER_VERSION = "2"
+
+# Número de linhas lidas por bloco no modo streaming
+DEFAULT_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "50000"))
+
+# Arquivos a partir deste tamanho são analisados em streaming automaticamente
+STREAMING_THRESHOLD_BYTES = int(os.getenv("CSV_STREAMING_THRESHOLD_MB", "256")) * 1024 * 1024
+
+# Quantidade de itens (grupos de achados) devolvidos em 'raw_data'
+RAW_DATA_LIMIT = 100
+
+# Formato do relatório executivo (também usado na etapa final do map-reduce)
+SUMMARY_SYSTEM_PROMPT = """Você é um especialista em segurança cibernética analisando relatórios de vulnerabilidades do OpenVAS.
+Sua tarefa é criar um relatório executivo claro, objetivo e acionável em português brasileiro.
+
+Estruture o relatório da seguinte forma:
+1. 📊 RESUMO EXECUTIVO - Visão geral em 2-3 frases
+2. 🎯 PRINCIPAIS DESCOBERTAS - Pontos críticos que precisam de atenção imediata
+3. 📈 ANÁLISE DE RISCO - Distribuição e impacto das vulnerabilidades
+4. 🔥 TOP PRIORIDADES - 5 itens mais urgentes para remediar
+5. 💡 RECOMENDAÇÕES - Próximos passos práticos
+
+Use emojis para facilitar a leitura e seja direto ao ponto."""
+
+# Colunas de baixa cardinalidade, armazenadas como category nos perfis tipados
+CATEGORICAL_COLUMNS = [
+    "IP", "Host", "Hostname", "Port Protocol", "Protocol", "Severity",
+    "Solution Type", "NVT Name", "NVT OID", "Task ID", "Task Name",
+]
+
+# Colunas numéricas e o tipo compacto usado nos perfis tipados
+NUMERIC_COLUMNS = {
+    "CVSS": "float32",
+    "QoD": "UInt8",
+}
+
+# Faixas de severidade por versão do CVSS: limite inferior (inclusivo) de cada nível.
+# Scores > 0 abaixo da menor faixa são 'Low'; 0 é 'Info'; valores não numéricos, 'Unknown'.
+CVSS_SEVERITY_BANDS = {
+    "v3": [(4.0, "Medium"), (7.0, "High"), (9.0, "Critical")],
+    "v2": [(4.0, "Medium"), (7.0, "High")],
+}
+
+# Identificadores CVE da coluna CVEs (listas separadas por vírgula: "CVE-2021-44228, CVE-2021-45046")
+CVE_PATTERN = r"(CVE-(\d{4})-\d{4,})"
+
+# Perfis de carga: quais colunas ler e se devem ser tipadas.
+# 'columns' lista alternativas aceitas (ex.: 'IP' ou 'Host'); colunas ausentes são ignoradas.
+LOAD_PROFILES = {
+    # Todas as colunas, tipos inferidos pelo pandas
+    "full": {"columns": None, "typed": False},
+    # Apenas o necessário para get_vulnerability_statistics
+    "stats": {
+        "columns": ["IP", "Host", "Severity", "CVSS", "NVT Name", "Vulnerability"],
+        "typed": True,
+    },
+    # Colunas usadas no agrupamento de achados por vulnerabilidade (finding_groups)
+    "groups": {
+        "columns": ["IP", "Host", "Port", "Port Protocol", "NVT OID", "NVT Name", "Vulnerability", "Severity",
+                    "CVSS", "CVEs", "Solution Type", "Summary", "Solution", "Specific Result"],
+        "typed": True,
+    },
+    # Colunas exibidas na navegação paginada pelos achados (findings_explorer)
+    "explore": {
+        "columns": ["IP", "Host", "Hostname", "Port", "Port Protocol", "Protocol", "NVT OID", "NVT Name",
+                    "Vulnerability", "Severity", "CVSS", "QoD", "CVEs", "Solution Type", "Timestamp"],
+        "typed": True,
+    },
+    # Estatísticas, grupos e navegação de uma só leitura (uploads do Streamlit, analysis_memory_cache)
+    "analysis": {
+        "columns": ["IP", "Host", "Hostname", "Port", "Port Protocol", "Protocol", "NVT OID", "NVT Name",
+                    "Vulnerability", "Severity", "CVSS", "QoD", "CVEs", "Solution Type", "Timestamp",
+                    "Summary", "Solution", "Specific Result"],
+        "typed": True,
+    },
+    # Colunas gravadas na base de achados (findings_store)
+    "store": {
+        "columns": ["IP", "Hostname", "Port", "Port Protocol", "NVT OID", "NVT Name", "Severity", "CVSS",
+                    "QoD", "CVEs", "Solution Type", "Task Name", "Timestamp"],
+        "typed": False,
+    },
+}
+
+
+def _value_counts(series: pd.Series, sort: bool = True) -> pd.Series:
+    """
+    value_counts que ignora categorias sem ocorrências e, em colunas category,
+    desempata pela ordem de aparição (como em colunas de texto), para que os
+    perfis de carga produzam as mesmas estatísticas
+    
+    Com sort=False os valores ficam na ordem de aparição.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        counts = series.value_counts(sort=False)
+        counts = counts[counts > 0].reindex(series.dropna().unique())
+        return counts.sort_values(ascending=False, kind="stable") if sort else counts
+    return series.value_counts(sort=sort)
 
-try:
-    from langchain_groq import ChatGroq
-except ImportError:
-    ChatGroq = None
 
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
+def _read_options(profile: str) -> Dict:
+    """Monta os argumentos de pd.read_csv para um perfil de carga"""
+    if profile not in LOAD_PROFILES:
+        raise ValueError(f"Perfil de carga desconhecido: {profile}. Use um de: {', '.join(LOAD_PROFILES)}")
+    
+    config = LOAD_PROFILES[profile]
+    options = {}
+    if config["columns"] is not None:
+        wanted = set(config["columns"])
+        options["usecols"] = lambda column: column in wanted
+    if config["typed"]:
+        options["dtype"] = {column: "category" for column in CATEGORICAL_COLUMNS}
+    return options
+
+
+def _apply_numeric_dtypes(df: pd.DataFrame, profile: str) -> pd.DataFrame:
+    """Converte as colunas numéricas para tipos compactos (valores inválidos viram NaN)"""
+    if not LOAD_PROFILES[profile]["typed"]:
+        return df
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+    return df
+
+
+def _iter_csv_chunks(file_path: str, chunksize: int, profile: str,
+                     read_options: Dict) -> Iterator[pd.DataFrame]:
+    """Lê o CSV em blocos de `chunksize` linhas"""
+    try:
+        with pd.read_csv(file_path, chunksize=chunksize, **read_options) as reader:
+            for chunk in reader:
+                yield _apply_numeric_dtypes(chunk, profile)
+    except Exception as e:
+        raise Exception(f"Erro ao carregar CSV: {str(e)}")
+
+
+def load_openvas_csv(file_path: str, chunksize: Optional[int] = None,
+                     profile: str = "full") -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Lê um CSV do OpenVAS segundo um perfil de carga (não depende do LLM)
+    
+    Ver `OpenVASCSVAnalyzer.load_csv` para a descrição dos argumentos.
+    """
+    read_options = _read_options(profile)
+    if chunksize:
+        return _iter_csv_chunks(file_path, chunksize, profile, read_options)
+    try:
+        df = pd.read_csv(file_path, **read_options)
+        return _apply_numeric_dtypes(df, profile)
+    except Exception as e:
+        raise Exception(f"Erro ao carregar CSV: {str(e)}")
+
+
+def measure_load_profiles(file_path: str, profiles: Optional[List[str]] = None) -> Dict:
+    """
+    Mede o tempo de parse e a memória ocupada pelo DataFrame em cada perfil de carga
+    
+    Returns:
+        Dict {perfil: {"rows", "columns", "parse_seconds", "memory_mb"}}
+    """
+    results = {}
+    for profile in profiles or list(LOAD_PROFILES):
+        start = time.perf_counter()
+        df = load_openvas_csv(file_path, profile=profile)
+        elapsed = time.perf_counter() - start
+        results[profile] = {
+            "rows": len(df),
+            "columns": len(df.columns),
+            "parse_seconds": round(elapsed, 4),
+            "memory_mb": round(float(df.memory_usage(deep=True).sum()) / 1024 / 1024, 2),
+        }
+    return results
+
+
+def explode_cves(cves: pd.Series) -> pd.DataFrame:
+    """
+    Separa a coluna CVEs em uma linha por (achado, CVE), de forma vetorizada
+    
+    Args:
+        cves: Coluna CVEs do relatório
+    
+    Returns:
+        DataFrame com 'row' (rótulo da linha de origem), 'cve' (em maiúsculas) e 'year';
+        CVEs repetidos na mesma linha aparecem uma vez
+    """
+    matches = cves.dropna().astype("str").str.upper().str.extractall(CVE_PATTERN)
+    exploded = pd.DataFrame({
+        "row": matches.index.get_level_values(0),
+        "cve": matches[0].to_numpy(dtype=object),
+        "year": matches[1].to_numpy(dtype=object).astype(int) if len(matches) else np.array([], dtype=int),
+    })
+    return exploded.drop_duplicates(["row", "cve"], ignore_index=True)
+
+
+def classify_cvss(scores: pd.Series, bands: Union[str, List] = "v3") -> pd.Series:
+    """
+    Classifica scores CVSS em níveis de severidade de forma vetorizada
+    
+    Não altera a série recebida. Valores que não podem ser convertidos para
+    número (texto, vazios) são classificados como 'Unknown'.
+    
+    Args:
+        scores: Série com os scores CVSS (numérica ou texto)
+        bands: Chave de CVSS_SEVERITY_BANDS ("v3", "v2") ou lista de
+            (limite inferior, nível) em ordem crescente
+    
+    Returns:
+        Série category com o nível de cada linha, mesmo índice de `scores`
+    """
+    if isinstance(bands, str):
+        if bands not in CVSS_SEVERITY_BANDS:
+            raise ValueError(f"Faixas CVSS desconhecidas: {bands}. Use um de: {', '.join(CVSS_SEVERITY_BANDS)}")
+        bands = CVSS_SEVERITY_BANDS[bands]
+    
+    bands = sorted(bands)
+    values = pd.to_numeric(scores, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    categories = ["Unknown", "Info", "Low"] + [label for _, label in bands]
+    
+    # Cada limite ultrapassado avança um nível: 1 (Info) + (> 0) + (>= cada limite).
+    # Comparações com NaN são falsas; esses valores recebem 0 (Unknown) no final.
+    codes = np.ones(len(values), dtype="int8")
+    codes += values > 0
+    for limit, _ in bands:
+        codes += values >= limit
+    codes[np.isnan(values)] = 0
+    
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories),
+                     index=scores.index, name="Severity_Level")
+
+
+class VulnerabilityStatsAccumulator:
+    """
+    Acumula as estatísticas de vulnerabilidades bloco a bloco.
+    
+    Produz o mesmo dicionário de `OpenVASCSVAnalyzer.get_vulnerability_statistics`,
+    mas mantém em memória apenas contadores (proporcionais ao número de hosts e
+    NVTs distintos), nunca as linhas do relatório.
+    """
+    
+    def __init__(self, cvss_bands: Union[str, List] = "v3"):
+        """
+        Args:
+            cvss_bands: Faixas usadas para classificar o CVSS quando não há coluna 'Severity'
+        """
+        self.cvss_bands = cvss_bands
+        self.total = 0
+        self.hosts = set()
+        self.by_severity: Optional[Counter] = None
+        self.top_vulnerabilities: Optional[Counter] = None
+        self.most_affected_hosts: Optional[Counter] = None
+    
+    @staticmethod
+    def _merge(counter: Optional[Counter], counts: pd.Series) -> Counter:
+        counter = counter if counter is not None else Counter()
+        counter.update(counts.to_dict())
+        return counter
+    
+    @staticmethod
+    def _most_common(counter: Counter, n: Optional[int] = None) -> Dict:
+        # Ordenação estável: em caso de empate mantém a ordem de aparição, como o value_counts
+        counts = pd.Series(counter, dtype="int64").sort_values(ascending=False, kind="stable")
+        if n is not None:
+            counts = counts.head(n)
+        return counts.to_dict()
+    
+    def update(self, df: pd.DataFrame):
+        """Incorpora um bloco do relatório às estatísticas"""
+        self.total += len(df)
+        
+        host_col = 'IP' if 'IP' in df.columns else 'Host' if 'Host' in df.columns else None
+        if host_col:
+            self.hosts.update(df[host_col].dropna().unique())
+            self.most_affected_hosts = self._merge(self.most_affected_hosts, _value_counts(df[host_col], sort=False))
+        
+        if 'Severity' in df.columns:
+            self.by_severity = self._merge(self.by_severity, _value_counts(df['Severity'], sort=False))
+        elif 'CVSS' in df.columns:
+            self.by_severity = self._merge(
+                self.by_severity, _value_counts(classify_cvss(df['CVSS'], self.cvss_bands), sort=False)
+            )
+        
+        if 'NVT Name' in df.columns:
+            self.top_vulnerabilities = self._merge(self.top_vulnerabilities, _value_counts(df['NVT Name'], sort=False))
+        elif 'Vulnerability' in df.columns:
+            self.top_vulnerabilities = self._merge(self.top_vulnerabilities, _value_counts(df['Vulnerability'], sort=False))
+    
+    def result(self) -> Dict:
+        """Retorna as estatísticas acumuladas até o momento"""
+        stats = {
+            "total_vulnerabilities": self.total,
+            "unique_hosts": len(self.hosts),
+        }
+        if self.by_severity is not None:
+            stats['by_severity'] = self._most_common(self.by_severity)
+        if self.top_vulnerabilities is not None:
+            stats['top_vulnerabilities'] = self._most_common(self.top_vulnerabilities, 10)
+        if self.most_affected_hosts is not None:
+            stats['most_affected_hosts'] = self._most_common(self.most_affected_hosts, 10)
+        return stats
+
+
+def _cache_namespace(profile: str) -> str:
+    return f"v{PARSER_VERSION}-{profile}"
+
+
+def load_report(file_path: str, profile: str = "full", cache: Optional[ReportCache] = None) -> pd.DataFrame:
+    """Carrega o CSV inteiro, passando pelo cache de relatórios quando informado"""
+    if cache is None:
+        return load_openvas_csv(file_path, profile=profile)
+    return cache.load(file_path, _cache_namespace(profile),
+                      lambda path: load_openvas_csv(path, profile=profile))
+
+
+def compute_vulnerability_statistics(df: pd.DataFrame, cvss_bands: Union[str, List] = "v3") -> Dict:
+    """Extrai estatísticas básicas das vulnerabilidades de um DataFrame"""
+    stats = {
+        "total_vulnerabilities": len(df),
+        "unique_hosts": df['IP'].nunique() if 'IP' in df.columns else df['Host'].nunique() if 'Host' in df.columns else 0,
+    }
+    
+    # Análise por severidade
+    if 'Severity' in df.columns:
+        stats['by_severity'] = _value_counts(df['Severity']).to_dict()
+    elif 'CVSS' in df.columns:
+        # Mapeia CVSS para severidade
+        stats['by_severity'] = _value_counts(classify_cvss(df['CVSS'], cvss_bands)).to_dict()
+    
+    # Top vulnerabilidades
+    if 'NVT Name' in df.columns:
+        stats['top_vulnerabilities'] = _value_counts(df['NVT Name']).head(10).to_dict()
+    elif 'Vulnerability' in df.columns:
+        stats['top_vulnerabilities'] = _value_counts(df['Vulnerability']).head(10).to_dict()
+    
+    # Hosts mais afetados
+    host_col = 'IP' if 'IP' in df.columns else 'Host' if 'Host' in df.columns else None
+    if host_col:
+        stats['most_affected_hosts'] = _value_counts(df[host_col]).head(10).to_dict()
+    
+    return stats
+
+
+def compute_streaming_statistics(file_path: str, cvss_bands: Union[str, List] = "v3",
+                                 chunksize: int = DEFAULT_CHUNK_SIZE, profile: str = "stats") -> Dict:
+    """Mesmas estatísticas de `compute_vulnerability_statistics`, lendo o CSV em blocos"""
+    accumulator = VulnerabilityStatsAccumulator(cvss_bands)
+    for chunk in load_openvas_csv(file_path, chunksize=chunksize, profile=profile):
+        accumulator.update(chunk)
+    return accumulator.result()
+
+
+def stats_cache_key(profile: str, cvss_bands: Union[str, List]) -> Tuple[str, str]:
+    """(namespace, variante) das estatísticas no sidecar do cache de relatórios"""
+    return _cache_namespace(profile), json.dumps(cvss_bands)
+
+
+def compute_file_statistics(csv_path: str, cvss_bands: Union[str, List] = "v3",
+                            streaming: Optional[bool] = None, chunksize: int = DEFAULT_CHUNK_SIZE,
+                            profile: str = "stats", cache: Optional[ReportCache] = None) -> Dict:
+    """
+    Estatísticas de um arquivo CSV, sem depender do LLM
+    
+    Usa o sidecar do cache quando o conteúdo do arquivo não mudou. Ver
+    `OpenVASCSVAnalyzer.analyze_csv_file` para a descrição dos argumentos.
+    """
+    namespace, variant = stats_cache_key(profile, cvss_bands)
+    if cache is not None:
+        stats = cache.get_stats(csv_path, namespace, variant)
+        if stats is not None:
+            return stats
+    
+    if streaming is None:
+        streaming = Path(csv_path).stat().st_size >= STREAMING_THRESHOLD_BYTES
+    if streaming:
+        stats = compute_streaming_statistics(csv_path, cvss_bands, chunksize, profile)
+    else:
+        stats = compute_vulnerability_statistics(load_report(csv_path, profile, cache), cvss_bands)
+    
+    if cache is not None:
+        cache.put_stats(csv_path, namespace, stats, variant)
+    return stats
 
 
 class OpenVASCSVAnalyzer:
     """Analisador de relatórios CSV do OpenVAS com suporte a múltiplos modelos LLM"""
     
-    def __init__(self, llm_provider: str = "openai", model_name: Optional[str] = None):
+    def __init__(self, llm_provider: str = "openai", model_name: Optional[str] = None,
+                 cvss_bands: Union[str, List] = "v3", cache: Optional[ReportCache] = None,
+                 llm_cache: Optional[LLMResponseCache] = None, use_cache: bool = True,
+                 hedge: Optional[bool] = None):
         """
         Inicializa o analisador
         
         Args:
             llm_provider: "openai" ou "groq" 
             model_name: Nome do modelo (ex: "gpt-4o", "llama-3.1-70b-versatile")
+            cvss_bands: Faixas CVSS usadas quando o CSV não tem coluna 'Severity'
+                (chave de CVSS_SEVERITY_BANDS ou lista de (limite, nível))
+            cache: Cache de relatórios processados; por padrão, o cache compartilhado do processo
+            llm_cache: Cache de respostas do LLM; por padrão, o cache compartilhado do processo
+            use_cache: False desativa os caches de relatórios e de respostas do LLM
+            hedge: Duplica as chamadas ao LLM que demoram a começar (ver `llm_hedging`);
+                None usa LLM_HEDGE
         """
         self.llm_provider = llm_provider.lower()
+        self.cvss_bands = cvss_bands
+        self.cache = (cache or get_report_cache()) if use_cache else None
+        self.llm_cache = (llm_cache or get_llm_cache()) if use_cache else None
+        self.hedge = _llm_layer()[0].HEDGE_ENABLED if hedge is None else hedge
         self.llm = self._initialize_llm(model_name)
+        self.model_name = getattr(self.llm, "model_name", None) or model_name or ""
         
     def _initialize_llm(self, model_name: Optional[str]):
-        """Inicializa o modelo LLM baseado no provider"""
-        if self.llm_provider == "openai":
-            if ChatOpenAI is None:
-                raise ImportError("langchain-openai não está instalado")
-            return ChatOpenAI(
-                model=model_name or os.getenv("OPENAI_MODEL_ID", "gpt-4o-mini"),
-                temperature=0
-            )
-        elif self.llm_provider == "groq":
-            if ChatGroq is None:
-                raise ImportError("langchain-groq não está instalado. Instale com: pip install langchain-groq")
-            return ChatGroq(
-                model=model_name or os.getenv("GROQ_MODEL_ID", "llama-3.3-70b-versatile"),
-                temperature=0,
-                api_key=os.getenv("GROQ_API_KEY")
-            )
-        else:
-            raise ValueError(f"Provider não suportado: {self.llm_provider}. Use 'openai' ou 'groq'")
+        """Obtém o modelo LLM compartilhado do provider (ver `llm_registry`)"""
+        return _llm_layer()[1].get_chat_model(self.llm_provider, model_name, temperature=0)
     
-    def load_csv(self, file_path: str) -> pd.DataFrame:
-        """Carrega o arquivo CSV do OpenVAS"""
-        try:
-            df = pd.read_csv(file_path)
-            return df
-        except Exception as e:
-            raise Exception(f"Erro ao carregar CSV: {str(e)}")
+    def load_csv(self, file_path: str, chunksize: Optional[int] = None,
+                 profile: str = "full") -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """
+        Carrega o arquivo CSV do OpenVAS
+        
+        Args:
+            file_path: Caminho do arquivo CSV
+            chunksize: Se informado, retorna um iterador de DataFrames com no máximo
+                `chunksize` linhas cada (modo streaming) em vez do arquivo inteiro
+            profile: Perfil de carga (chave de LOAD_PROFILES). "stats" lê apenas as
+                colunas usadas nas estatísticas, com tipos compactos
+        """
+        if chunksize:
+            return load_openvas_csv(file_path, chunksize=chunksize, profile=profile)
+        return load_report(file_path, profile, self.cache)
     
     def get_vulnerability_statistics(self, df: pd.DataFrame) -> Dict:
         """Extrai estatísticas básicas das vulnerabilidades"""
-        stats = {
-            "total_vulnerabilities": len(df),
-            "unique_hosts": df['IP'].nunique() if 'IP' in df.columns else df['Host'].nunique() if 'Host' in df.columns else 0,
-        }
+        return compute_vulnerability_statistics(df, self.cvss_bands)
+    
+    def get_vulnerability_statistics_streaming(self, file_path: str,
+                                               chunksize: int = DEFAULT_CHUNK_SIZE,
+                                               profile: str = "stats") -> Dict:
+        """
+        Extrai as mesmas estatísticas de `get_vulnerability_statistics` lendo o CSV
+        em blocos, com uso de memória constante em relação ao tamanho do arquivo
+        """
+        return compute_streaming_statistics(file_path, self.cvss_bands, chunksize, profile)
+    
+    def get_file_statistics(self, csv_path: str, streaming: Optional[bool] = None,
+                            chunksize: int = DEFAULT_CHUNK_SIZE, profile: str = "stats") -> Dict:
+        """
+        Estatísticas de um arquivo CSV, reaproveitando o sidecar do cache quando o
+        conteúdo do arquivo não mudou
         
-        # Análise por severidade
-        if 'Severity' in df.columns:
-            stats['by_severity'] = df['Severity'].value_counts().to_dict()
-        elif 'CVSS' in df.columns:
-            # Mapeia CVSS para severidade
-            df['Severity_Level'] = df['CVSS'].apply(self._cvss_to_severity)
-            stats['by_severity'] = df['Severity_Level'].value_counts().to_dict()
+        Args: ver `analyze_csv_file`
+        """
+        return compute_file_statistics(csv_path, self.cvss_bands, streaming, chunksize, profile, self.cache)
+    
+    def get_file_groups(self, csv_path: str, streaming: Optional[bool] = None,
+                        chunksize: int = DEFAULT_CHUNK_SIZE) -> List[Dict]:
+        """
+        Achados agrupados por vulnerabilidade (ver `finding_groups`), com o mesmo
+        cache das estatísticas
+        """
+        try:
+            from .finding_groups import compute_file_groups
+        except ImportError:
+            from finding_groups import compute_file_groups
+        return compute_file_groups(csv_path, streaming, chunksize, self.cache)
+    
+    def get_file_analysis(self, csv_path: str, streaming: Optional[bool] = None,
+                          chunksize: int = DEFAULT_CHUNK_SIZE, profile: str = "stats") -> Tuple[Dict, List[Dict]]:
+        """
+        Estatísticas e grupos do arquivo com uma única leitura do CSV (ver
+        `finding_groups.compute_file_analysis`)
+        """
+        try:
+            from .finding_groups import compute_file_analysis
+        except ImportError:
+            from finding_groups import compute_file_analysis
+        return compute_file_analysis(csv_path, self.cvss_bands, streaming, chunksize, profile, self.cache)
+    
+    def get_findings_page(self, csv_path: str, page: int = 1, page_size: int = 50, **filters) -> Dict:
+        """
+        Uma página dos achados do relatório, filtrada e ordenada
         
-        # Top vulnerabilidades
-        if 'NVT Name' in df.columns:
-            stats['top_vulnerabilities'] = df['NVT Name'].value_counts().head(10).to_dict()
-        elif 'Vulnerability' in df.columns:
-            stats['top_vulnerabilities'] = df['Vulnerability'].value_counts().head(10).to_dict()
+        Só as linhas da página são convertidas; o relatório fica carregado em memória
+        entre as chamadas (ver `findings_explorer`).
         
-        # Hosts mais afetados
-        host_col = 'IP' if 'IP' in df.columns else 'Host' if 'Host' in df.columns else None
-        if host_col:
-            stats['most_affected_hosts'] = df[host_col].value_counts().head(10).to_dict()
+        Args:
+            csv_path: Caminho do arquivo CSV
+            page: Número da página (a partir de 1)
+            page_size: Achados por página
+            **filters: host, severity, port, nvt, search, sort_by e ascending
+                (ver `FindingsExplorer.page`)
         
-        return stats
-    
-    def _cvss_to_severity(self, cvss_score: float) -> str:
-        """Converte score CVSS para nível de severidade"""
+        Returns:
+            Dict com 'rows', 'total', 'page', 'page_size', 'pages' e 'elapsed_ms'
+        """
         try:
-            score = float(cvss_score)
-            if score >= 9.0:
-                return "Critical"
-            elif score >= 7.0:
-                return "High"
-            elif score >= 4.0:
-                return "Medium"
-            elif score > 0:
-                return "Low"
-            else:
-                return "Info"
-        except:
-            return "Unknown"
-    
-    def generate_summary(self, df: pd.DataFrame, stats: Dict) -> str:
-        """Gera um resumo detalhado usando o LLM"""
+            from .findings_explorer import get_findings_explorer
+        except ImportError:
+            from findings_explorer import get_findings_explorer
+        return get_findings_explorer(csv_path, self.cache).page(page, page_size, **filters)
+    
+    def build_summary_messages(self, stats: Dict, groups: Optional[List[Dict]] = None,
+                               max_groups: Optional[int] = None) -> List:
+        """
+        Monta as mensagens enviadas ao LLM para o resumo executivo
+        
+        Com `groups`, a lista das vulnerabilidades mais comuns é trocada pelos grupos
+        (uma linha por vulnerabilidade distinta, com hosts, portas e solução), limitados
+        a `max_groups` (None usa SUMMARY_MAX_GROUPS)
+        """
         
         # Prepara dados para o LLM
+        if groups:
+            try:
+                from .finding_groups import PROMPT_MAX_GROUPS, format_groups_for_prompt
+            except ImportError:
+                from finding_groups import PROMPT_MAX_GROUPS, format_groups_for_prompt
+            vulnerabilities = f"""Vulnerabilidades Distintas ({len(groups)}), por CVSS e hosts afetados:
+{format_groups_for_prompt(groups, max_groups or PROMPT_MAX_GROUPS)}"""
+        else:
+            vulnerabilities = f"""Top 10 Vulnerabilidades Mais Comuns:
+{json.dumps(stats.get('top_vulnerabilities', {}), indent=2)}"""
+        
         data_summary = f"""
 Estatísticas do Relatório OpenVAS:
 
@@ -123,47 +573,271 @@ Hosts Únicos Afetados: {stats['unique_hosts']}
 Distribuição por Severidade:
 {json.dumps(stats.get('by_severity', {}), indent=2)}
 
-Top 10 Vulnerabilidades Mais Comuns:
-{json.dumps(stats.get('top_vulnerabilities', {}), indent=2)}
+{vulnerabilities}
 
 Hosts Mais Afetados:
 {json.dumps(stats.get('most_affected_hosts', {}), indent=2)}
 """
         
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content="""Você é um especialista em segurança cibernética analisando relatórios de vulnerabilidades do OpenVAS.
-Sua tarefa é criar um relatório executivo claro, objetivo e acionável em português brasileiro.
+        from langchain_core.messages import HumanMessage, SystemMessage
+        from langchain_core.prompts import ChatPromptTemplate
 
-Estruture o relatório da seguinte forma:
-1. 📊 RESUMO EXECUTIVO - Visão geral em 2-3 frases
-2. 🎯 PRINCIPAIS DESCOBERTAS - Pontos críticos que precisam de atenção imediata
-3. 📈 ANÁLISE DE RISCO - Distribuição e impacto das vulnerabilidades
-4. 🔥 TOP PRIORIDADES - 5 itens mais urgentes para remediar
-5. 💡 RECOMENDAÇÕES - Próximos passos práticos
-
-Use emojis para facilitar a leitura e seja direto ao ponto."""),
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
             HumanMessage(content=data_summary)
         ])
+        return prompt.format_messages()
+    
+    def _complete(self, messages: List, on_token: Optional[Callable[[str], None]], label: str) -> str:
+        """
+        Resposta do LLM em streaming, consultando antes o cache de respostas
+
+        A chamada passa pela camada de resiliência (ver `llm_resilience`) e, com
+        `hedge`, pelo hedging (ver `llm_hedging`); respostas de outro provider ou
+        modelo (failover ou hedge) não são gravadas no cache.
+        """
+        cache_key = None
+        if self.llm_cache is not None:
+            cache_key = self.llm_cache.make_key(messages, self.llm_provider, self.model_name)
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+        
+        llm_hedging, _, llm_resilience = _llm_layer()
+        stream = llm_hedging.hedged_stream_chat if self.hedge else llm_resilience.stream_chat_resilient
+        llm, response = stream(messages, on_token, label=f"{label} {self.llm_provider}/{self.model_name}",
+                               operation=label, provider=self.llm_provider, model_name=self.model_name,
+                               temperature=0)
+        if cache_key is not None and llm is self.llm:
+            self.llm_cache.put(cache_key, response["content"], self.llm_provider, self.model_name,
+                               latency=response["elapsed"])
+        return response["content"]
+    
+    def generate_summary(self, df: Optional[pd.DataFrame], stats: Dict,
+                         on_token: Optional[Callable[[str], None]] = None,
+                         groups: Optional[List[Dict]] = None) -> str:
+        """
+        Gera um resumo detalhado usando o LLM (ou o cache de respostas)
         
-        response = self.llm.invoke(prompt.format_messages())
+        Args:
+            df: DataFrame do relatório (não usado; mantido por compatibilidade)
+            stats: Estatísticas de `get_vulnerability_statistics`
+            on_token: Recebe o texto em trechos, conforme o modelo o gera. Respostas
+                vindas do cache são entregues em um único trecho
+            groups: Achados agrupados de `get_file_groups` (opcional). Relatórios cujos
+                grupos não cabem em um prompt são resumidos em map-reduce (ver `summarize`)
+        """
+        return self.summarize(stats, groups, on_token)["summary"]
+    
+    def summarize(self, stats: Dict, groups: Optional[List[Dict]] = None,
+                  on_token: Optional[Callable[[str], None]] = None, mode: Optional[str] = None) -> Dict:
+        """
+        Resumo executivo com o detalhamento das chamadas ao LLM
+        
+        Args:
+            stats: Estatísticas do relatório
+            groups: Achados agrupados de `get_file_groups` (opcional)
+            on_token: Recebe o texto do resumo final em trechos
+            mode: "auto", "single" ou "map_reduce" (None usa SUMMARY_MODE)
+        
+        Returns:
+            Dict com 'summary', 'mode' e 'stages' (chamadas, tempo e tokens por etapa)
+        """
+        try:
+            from .map_reduce_summary import summarize_report
+        except ImportError:
+            from map_reduce_summary import summarize_report
+        return summarize_report(self, stats, groups, on_token, mode)
+    
+    async def _acomplete(self, messages: List, on_token: Optional[Callable[[str], None]], label: str) -> str:
+        """
+        Versão assíncrona de `_complete`
+        
+        Usa `ainvoke` do modelo, pela camada de resiliência, com a mesma chave de
+        cache das chamadas síncronas; as consultas ao cache (SQLite) rodam no
+        executor para não bloquear o event loop. `on_token` recebe a resposta em
+        um único trecho.
+        """
+        loop = asyncio.get_running_loop()
+        cache_key = None
+        if self.llm_cache is not None:
+            cache_key = self.llm_cache.make_key(messages, self.llm_provider, self.model_name)
+            cached = await loop.run_in_executor(None, self.llm_cache.get, cache_key)
+            if cached is not None:
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+        
+        start = time.perf_counter()
+        served = {}
+
+        async def attempt(llm):
+            served["llm"] = llm
+            return await llm.ainvoke(messages, config={"metadata": {"llm_operation": label}})
+
+        response = await _llm_layer()[2].acall_llm(attempt, self.llm_provider, self.model_name, label, temperature=0)
+        if cache_key is not None and served["llm"] is self.llm:
+            await loop.run_in_executor(None, functools.partial(
+                self.llm_cache.put, cache_key, response.content, self.llm_provider, self.model_name,
+                latency=time.perf_counter() - start,
+            ))
+        if on_token is not None:
+            on_token(response.content)
         return response.content
     
-    def analyze_csv_file(self, csv_path: str) -> Dict:
+    async def asummarize(self, stats: Dict, groups: Optional[List[Dict]] = None,
+                         on_token: Optional[Callable[[str], None]] = None, mode: Optional[str] = None) -> Dict:
+        """Versão assíncrona de `summarize` (mesmos prompts e etapas, ver `asummarize_report`)"""
+        try:
+            from .map_reduce_summary import asummarize_report
+        except ImportError:
+            from map_reduce_summary import asummarize_report
+        return await asummarize_report(self, stats, groups, on_token, mode)
+    
+    async def agenerate_summary(self, df: Optional[pd.DataFrame], stats: Dict,
+                                groups: Optional[List[Dict]] = None) -> str:
+        """Versão assíncrona de `generate_summary`"""
+        return (await self.asummarize(stats, groups))["summary"]
+    
+    def analyze_csv_file(self, csv_path: str, streaming: Optional[bool] = None,
+                         chunksize: int = DEFAULT_CHUNK_SIZE, profile: str = "stats",
+                         on_token: Optional[Callable[[str], None]] = None) -> Dict:
         """
         Análise completa de um arquivo CSV do OpenVAS
         
+        Args:
+            csv_path: Caminho do arquivo CSV
+            streaming: Lê o arquivo em blocos em vez de carregá-lo inteiro. Se None,
+                ativa automaticamente para arquivos maiores que CSV_STREAMING_THRESHOLD_MB
+            chunksize: Linhas por bloco no modo streaming
+            profile: Perfil de carga usado nas estatísticas (ver LOAD_PROFILES)
+            on_token: Recebe o resumo em trechos, conforme é gerado (ver `generate_summary`)
+        
         Returns:
-            Dict com 'statistics', 'summary' e 'raw_data'
+            Dict com 'statistics', 'summary', 'summary_stages' (tempo e tokens de cada
+            etapa do resumo) e 'raw_data' (os achados agrupados por vulnerabilidade, dos
+            mais graves para os menos graves)
         """
         # Carrega e analisa
-        df = self.load_csv(csv_path)
-        stats = self.get_vulnerability_statistics(df)
-        summary = self.generate_summary(df, stats)
+        stats, groups = self.get_file_analysis(csv_path, streaming, chunksize, profile)
+        summary = self.summarize(stats, groups, on_token)
+        
+        return {
+            "statistics": stats,
+            "summary": summary["summary"],
+            "summary_stages": summary["stages"],
+            "raw_data": groups[:RAW_DATA_LIMIT]  # Limita para não sobrecarregar
+        }
+    
+    async def aanalyze_csv_file(self, csv_path: str, streaming: Optional[bool] = None,
+                                chunksize: int = DEFAULT_CHUNK_SIZE, profile: str = "stats") -> Dict:
+        """
+        Versão assíncrona de `analyze_csv_file`
+        
+        A leitura do CSV e as estatísticas (CPU) rodam no executor padrão do loop e
+        o resumo (mesmos prompts e orçamento de `analyze_csv_file`) usa a interface
+        assíncrona do modelo. O analisador não guarda estado
+        por chamada, então uma mesma instância pode atender várias tarefas ao mesmo tempo.
+        """
+        loop = asyncio.get_running_loop()
+        stats, groups = await loop.run_in_executor(None, functools.partial(
+            self.get_file_analysis, csv_path, streaming, chunksize, profile
+        ))
+        summary = await self.asummarize(stats, groups)
         
         return {
             "statistics": stats,
+            "summary": summary["summary"],
+            "summary_stages": summary["stages"],
+            "raw_data": groups[:RAW_DATA_LIMIT]
+        }
+    
+    def build_delta_messages(self, delta: Dict) -> List:
+        """Monta as mensagens enviadas ao LLM para o resumo do que mudou entre dois scans"""
+        data_summary = f"""
+Comparação entre dois scans OpenVAS da mesma rede:
+
+Achados no scan anterior: {delta['total_previous']}
+Achados no scan atual: {delta['total_current']}
+Novos: {delta['new_count']} | Corrigidos: {delta['fixed_count']} | Severidade alterada: {delta['changed_count']} \
+(pioraram: {delta['escalated_count']}, melhoraram: {delta['deescalated_count']}) | Sem alteração: {delta['unchanged_count']}
+
+Novos achados por severidade:
+{json.dumps(delta['new_by_severity'], indent=2, ensure_ascii=False)}
+
+Achados corrigidos por severidade:
+{json.dumps(delta['fixed_by_severity'], indent=2, ensure_ascii=False)}
+
+Vulnerabilidades novas mais frequentes:
+{json.dumps(delta['top_new_vulnerabilities'], indent=2, ensure_ascii=False)}
+
+Vulnerabilidades corrigidas mais frequentes:
+{json.dumps(delta['top_fixed_vulnerabilities'], indent=2, ensure_ascii=False)}
+
+Hosts com mais achados novos:
+{json.dumps(delta['hosts_with_new_findings'], indent=2, ensure_ascii=False)}
+
+Maiores mudanças de severidade:
+{json.dumps(delta['severity_changes'], indent=2, ensure_ascii=False)}
+"""
+        
+        from langchain_core.messages import HumanMessage, SystemMessage
+        from langchain_core.prompts import ChatPromptTemplate
+
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content="""Você é um especialista em segurança cibernética acompanhando scans periódicos do OpenVAS.
+Você recebe apenas o que mudou entre o scan anterior e o atual. Crie um relatório claro e acionável em português brasileiro.
+
+Estruture o relatório da seguinte forma:
+1. 📊 O QUE MUDOU - Visão geral em 2-3 frases (a postura de segurança melhorou ou piorou?)
+2. 🆕 NOVOS RISCOS - Achados novos que precisam de atenção imediata
+3. ✅ CORREÇÕES CONFIRMADAS - O que foi resolvido desde o último scan
+4. ⚠️ MUDANÇAS DE SEVERIDADE - Achados que pioraram ou melhoraram
+5. 💡 PRÓXIMOS PASSOS - Ações práticas priorizadas
+
+Use emojis para facilitar a leitura e seja direto ao ponto."""),
+            HumanMessage(content=data_summary)
+        ])
+        return prompt.format_messages()
+    
+    def generate_delta_summary(self, delta: Dict, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """Resumo do delta entre dois scans (estatísticas de `scan_diff.delta_statistics`)"""
+        return self._complete(self.build_delta_messages(delta), on_token, "delta")
+    
+    def analyze_scan_delta(self, previous_csv: str, current_csv: str,
+                           on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        """
+        Compara dois scans e pede ao LLM um resumo apenas do que mudou
+        
+        Args:
+            previous_csv: CSV (ou DataFrame) do scan anterior
+            current_csv: CSV (ou DataFrame) do scan atual
+            on_token: Recebe o resumo em trechos, conforme é gerado
+        
+        Returns:
+            Dict com 'statistics' (contagens do delta), 'summary' e 'diff'
+            (DataFrames 'new', 'fixed' e 'changed')
+        """
+        try:
+            from .scan_diff import compare_scans
+        except ImportError:
+            from scan_diff import compare_scans
+        
+        comparison = compare_scans(previous_csv, current_csv, cache=self.cache)
+        if comparison["statistics"]["new_count"] or comparison["statistics"]["fixed_count"] \
+                or comparison["statistics"]["changed_count"]:
+            summary = self.generate_delta_summary(comparison["statistics"], on_token)
+        else:
+            summary = "✅ Nenhuma mudança entre os dois scans."
+            if on_token is not None:
+                on_token(summary)
+        
+        return {
+            "statistics": comparison["statistics"],
             "summary": summary,
-            "raw_data": df.to_dict('records')[:100]  # Limita para não sobrecarregar
+            "diff": comparison["diff"],
         }
     
     def save_report(self, analysis: Dict, output_path: str):
@@ -180,26 +854,67 @@ Use emojis para facilitar a leitura e seja direto ao ponto."""),
             f.write("ESTATÍSTICAS DETALHADAS\n")
             f.write("=" * 80 + "\n\n")
             f.write(json.dumps(analysis['statistics'], indent=2, ensure_ascii=False))
+            
+            if analysis.get('summary_stages'):
+                f.write("\n\n" + "=" * 80 + "\n")
+                f.write("ETAPAS DO RESUMO\n")
+                f.write("=" * 80 + "\n\n")
+                for stage in analysis['summary_stages']:
+                    f.write(f"{stage['stage']}: {stage['calls']} chamada(s), {stage['wall_time']:.2f}s, "
+                            f"{stage['prompt_tokens']} tokens de prompt, {stage['completion_tokens']} de resposta\n")
+
+
+_shared_analyzers: Dict[tuple, OpenVASCSVAnalyzer] = {}
+_shared_analyzers_lock = threading.Lock()
+
+
+def get_csv_analyzer(llm_provider: str = "openai", model_name: Optional[str] = None) -> OpenVASCSVAnalyzer:
+    """
+    Retorna um analisador compartilhado pelo processo para (provider, modelo)
+    
+    O analisador não guarda estado por chamada, então pode ser reutilizado entre
+    arquivos, threads e sessões do Streamlit.
+    """
+    key = (llm_provider.lower(), model_name)
+    with _shared_analyzers_lock:
+        if key not in _shared_analyzers:
+            _shared_analyzers[key] = OpenVASCSVAnalyzer(llm_provider=llm_provider, model_name=model_name)
+        return _shared_analyzers[key]
 
 
 def analyze_from_folder(folder_path: str = "csv_reports", 
                         output_folder: str = "csv_analysis_results",
                         llm_provider: str = "openai",
-                        model_name: Optional[str] = None):
+                        model_name: Optional[str] = None,
+                        streaming: Optional[bool] = None,
+                        parse_workers: Optional[int] = None,
+                        llm_concurrency: Optional[int] = None):
     """
     Analisa todos os arquivos CSV em uma pasta
     
+    Os arquivos são processados em paralelo (ver `folder_pipeline`) e os
+    resultados aparecem na ordem em que ficam prontos.
+    
     Args:
         folder_path: Pasta com os CSVs do OpenVAS
         output_folder: Pasta para salvar os relatórios
         llm_provider: "openai" ou "groq"
         model_name: Nome do modelo específico
+        streaming: Força (True) ou desativa (False) a leitura em blocos; None decide pelo tamanho
+        parse_workers: Processos para leitura/estatísticas (padrão: CSV_PARSE_WORKERS ou nº de CPUs)
+        llm_concurrency: Chamadas simultâneas ao LLM (padrão: LLM_CONCURRENCY)
     """
+    try:
+        from .folder_pipeline import DEFAULT_LLM_CONCURRENCY, DEFAULT_PARSE_WORKERS, iter_folder_analysis
+    except ImportError:
+        # Execução direta (python src/tools/csv_analyzer.py)
+        from folder_pipeline import DEFAULT_LLM_CONCURRENCY, DEFAULT_PARSE_WORKERS, iter_folder_analysis
+    
     folder = Path(folder_path)
     output = Path(output_folder)
     output.mkdir(exist_ok=True)
     
-    analyzer = OpenVASCSVAnalyzer(llm_provider=llm_provider, model_name=model_name)
+    analyzer = get_csv_analyzer(llm_provider=llm_provider, model_name=model_name)
     
     csv_files = list(folder.glob("*.csv"))
     
@@ -208,21 +923,27 @@ def analyze_from_folder(folder_path: str = "csv_reports",
         return
     
     print(f"📁 Encontrados {len(csv_files)} arquivo(s) CSV")
+    print("\n⚙️  Analisando em paralelo...")
     
-    for csv_file in csv_files:
-        print(f"\n⚙️  Analisando: {csv_file.name}")
-        try:
-            analysis = analyzer.analyze_csv_file(str(csv_file))
-            
-            # Salva relatório
-            output_file = output / f"relatorio_{csv_file.stem}.txt"
-            analyzer.save_report(analysis, str(output_file))
-            
-            print(f"✅ Relatório salvo em: {output_file}")
-            print(f"\n{analysis['summary'][:200]}...\n")
-            
-        except Exception as e:
-            print(f"❌ Erro ao processar {csv_file.name}: {str(e)}")
+    results = iter_folder_analysis(
+        analyzer, csv_files, output,
+        parse_workers=DEFAULT_PARSE_WORKERS if parse_workers is None else parse_workers,
+        llm_concurrency=llm_concurrency or DEFAULT_LLM_CONCURRENCY,
+        streaming=streaming,
+    )
+    for result in results:
+        csv_file = result['file']
+        if result['error']:
+            print(f"❌ Erro ao processar {csv_file.name}: {result['error']}")
+            continue
+        
+        print(f"\n✅ {csv_file.name} ({result['elapsed']:.1f}s) - Relatório salvo em: {result['output_file']}")
+        print(f"\n{result['analysis']['summary'][:200]}...\n")
+    
+    if analyzer.llm_cache is not None:
+        cache_stats = analyzer.llm_cache.stats()
+        print(f"💾 Cache de resumos: {cache_stats['hits']} acerto(s), {cache_stats['misses']} falha(s) "
+              f"({cache_stats['saved_seconds']:.1f}s de LLM economizados no total)")
 
 
 if __name__ == "__main__":
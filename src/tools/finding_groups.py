@@ -0,0 +1,272 @@
+"""
+Agrupamento de achados por vulnerabilidade
+
+Um mesmo NVT costuma disparar em centenas de hosts, repetindo os mesmos textos de
+Summary/Solution milhares de vezes. Aqui os achados são condensados em um grupo
+por NVT, com o conjunto de hosts e de portas afetados, o maior CVSS, contagens e
+uma evidência representativa (o achado de maior CVSS). O prompt do LLM e os dados
+brutos devolvidos pela análise são montados a partir dos grupos, então crescem com
+o número de vulnerabilidades distintas e não com o número de linhas.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from .csv_analyzer import (DEFAULT_CHUNK_SIZE, PARSER_VERSION, STREAMING_THRESHOLD_BYTES,
+                               VulnerabilityStatsAccumulator, compute_file_statistics,
+                               compute_vulnerability_statistics, explode_cves, load_openvas_csv, load_report,
+                               stats_cache_key)
+    from .report_cache import ReportCache
+except ImportError:
+    # Execução direta (python src/tools/finding_groups.py)
+    from csv_analyzer import (DEFAULT_CHUNK_SIZE, PARSER_VERSION, STREAMING_THRESHOLD_BYTES,
+                              VulnerabilityStatsAccumulator, compute_file_statistics,
+                              compute_vulnerability_statistics, explode_cves, load_openvas_csv, load_report,
+                              stats_cache_key)
+    from report_cache import ReportCache
+
+
+# Tamanho máximo de cada texto representativo (Summary, Solution, Specific Result)
+EVIDENCE_MAX_CHARS = int(os.getenv("GROUP_EVIDENCE_MAX_CHARS", "400"))
+
+# Grupos enviados ao LLM no resumo executivo (os de maior CVSS e mais hosts)
+PROMPT_MAX_GROUPS = int(os.getenv("SUMMARY_MAX_GROUPS", "20"))
+
+# Hosts/portas listados por grupo no prompt (os demais aparecem só na contagem)
+PROMPT_MAX_HOSTS = 3
+
+# Tamanho da solução de cada grupo no prompt
+PROMPT_SOLUTION_CHARS = 160
+
+# Campo do grupo -> coluna do CSV com o texto representativo
+EVIDENCE_COLUMNS = {"summary": "Summary", "solution": "Solution", "evidence": "Specific Result"}
+
+
+def _truncate(value, max_chars: int) -> Optional[str]:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    text = " ".join(str(value).split())
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+class FindingGroupsAccumulator:
+    """
+    Agrupa achados por NVT, bloco a bloco
+
+    Processar o relatório inteiro ou em blocos produz os mesmos grupos: contagens e
+    conjuntos são somados/unidos e a evidência é a do achado de maior CVSS (o
+    primeiro, em caso de empate).
+    """
+
+    def __init__(self, evidence_chars: int = EVIDENCE_MAX_CHARS):
+        self.evidence_chars = evidence_chars
+        self._groups: Dict[str, Dict] = {}
+
+    def update(self, df: pd.DataFrame):
+        """Acrescenta os achados de um bloco do relatório"""
+        key_column = next((c for c in ("NVT OID", "NVT Name", "Vulnerability") if c in df.columns), None)
+        if key_column is None:
+            raise ValueError("O relatório não tem coluna de vulnerabilidade (NVT OID, NVT Name ou Vulnerability)")
+        df = df[df[key_column].notna()]
+        if df.empty:
+            return
+
+        keys = df[key_column].astype("str")
+        host_column = "IP" if "IP" in df.columns else "Host" if "Host" in df.columns else None
+        cvss = pd.to_numeric(df["CVSS"], errors="coerce") if "CVSS" in df.columns \
+            else pd.Series(float("nan"), index=df.index)
+
+        by_key = keys.groupby(keys, sort=False)
+        sizes = by_key.size()
+        best_rows = cvss.fillna(-1).groupby(keys, sort=False).idxmax()
+        hosts = df[host_column].astype("str").groupby(keys, sort=False).unique() if host_column else None
+        ports = None
+        if "Port" in df.columns:
+            port = df["Port"]
+            port = port.astype("Int64").astype("str") if pd.api.types.is_float_dtype(port.dtype) else port.astype("str")
+            if "Port Protocol" in df.columns:
+                port = port.fillna("general") + "/" + df["Port Protocol"].astype("str").fillna("")
+            ports = port.dropna().groupby(keys, sort=False).unique()
+        cves = None
+        if "CVEs" in df.columns:
+            exploded = explode_cves(df["CVEs"])
+            cves = pd.Series(exploded["cve"].to_numpy(), index=exploded["row"]).groupby(
+                keys.loc[exploded["row"]].to_numpy(), sort=False).unique()
+
+        for key, count in sizes.items():
+            best = best_rows[key]
+            best_cvss = cvss.loc[best]
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = {
+                    "nvt_oid": str(df.at[best, "NVT OID"]) if "NVT OID" in df.columns else None,
+                    "nvt_name": str(df.at[best, "NVT Name"]) if "NVT Name" in df.columns else str(key),
+                    "occurrences": 0,
+                    "max_cvss": None,
+                    "hosts": set(),
+                    "ports": set(),
+                    "cves": set(),
+                    "_rank": -2.0,
+                }
+            group["occurrences"] += int(count)
+            if hosts is not None:
+                group["hosts"].update(hosts[key])
+            if ports is not None and key in ports.index:
+                group["ports"].update(ports[key])
+            if cves is not None and key in cves.index:
+                group["cves"].update(cves[key])
+
+            rank = -1.0 if pd.isna(best_cvss) else float(best_cvss)
+            if rank > group["_rank"]:
+                # Evidência representativa: o achado de maior CVSS
+                group["_rank"] = rank
+                group["max_cvss"] = None if pd.isna(best_cvss) else round(float(best_cvss), 1)
+                group["severity"] = str(df.at[best, "Severity"]) if "Severity" in df.columns else None
+                group["solution_type"] = _truncate(df.at[best, "Solution Type"], 50) \
+                    if "Solution Type" in df.columns else None
+                for field, column in EVIDENCE_COLUMNS.items():
+                    group[field] = _truncate(df.at[best, column], self.evidence_chars) if column in df.columns else None
+
+    def result(self) -> List[Dict]:
+        """
+        Grupos em tipos simples (JSON), do maior CVSS para o menor e, no empate,
+        do que afeta mais hosts para o que afeta menos
+        """
+        groups = []
+        for group in self._groups.values():
+            group = {k: v for k, v in group.items() if k != "_rank"}
+            group["hosts"] = sorted(group["hosts"])
+            group["ports"] = sorted(group["ports"])
+            group["cves"] = sorted(group["cves"])
+            group["host_count"] = len(group["hosts"])
+            groups.append(group)
+        groups.sort(key=lambda g: (-(g["max_cvss"] if g["max_cvss"] is not None else -1), -g["host_count"],
+                                   -g["occurrences"]))
+        return groups
+
+
+def compute_finding_groups(df: pd.DataFrame, evidence_chars: int = EVIDENCE_MAX_CHARS) -> List[Dict]:
+    """Grupos de um DataFrame já carregado (ver `FindingGroupsAccumulator`)"""
+    accumulator = FindingGroupsAccumulator(evidence_chars)
+    accumulator.update(df)
+    return accumulator.result()
+
+
+def groups_cache_key() -> Tuple[str, str]:
+    """(namespace, variante) dos grupos no sidecar do cache de relatórios"""
+    return f"v{PARSER_VERSION}-groups", json.dumps({"evidence_chars": EVIDENCE_MAX_CHARS})
+
+
+def compute_file_groups(csv_path: str, streaming: Optional[bool] = None, chunksize: int = DEFAULT_CHUNK_SIZE,
+                        cache: Optional[ReportCache] = None) -> List[Dict]:
+    """
+    Grupos de um arquivo CSV, lendo em blocos quando o arquivo é grande
+
+    O resultado fica no sidecar do cache de relatórios, como as estatísticas.
+    """
+    namespace, variant = groups_cache_key()
+    if cache is not None:
+        groups = cache.get_stats(csv_path, namespace, variant)
+        if groups is not None:
+            return groups
+
+    if streaming is None:
+        streaming = Path(csv_path).stat().st_size >= STREAMING_THRESHOLD_BYTES
+    accumulator = FindingGroupsAccumulator()
+    if streaming:
+        for chunk in load_openvas_csv(csv_path, chunksize=chunksize, profile="groups"):
+            accumulator.update(chunk)
+    else:
+        accumulator.update(load_report(csv_path, "groups", cache))
+    groups = accumulator.result()
+
+    if cache is not None:
+        cache.put_stats(csv_path, namespace, groups, variant)
+    return groups
+
+
+def format_groups_for_prompt(groups: List[Dict], max_groups: int = PROMPT_MAX_GROUPS,
+                             max_hosts: int = PROMPT_MAX_HOSTS) -> str:
+    """
+    Uma linha por vulnerabilidade distinta, com hosts/portas resumidos e a solução
+
+    Só os `max_groups` primeiros grupos são detalhados; os demais são listados pelo
+    nome em uma única linha.
+    """
+    lines = []
+    for group in groups[:max_groups]:
+        hosts = ", ".join(group["hosts"][:max_hosts])
+        if group["host_count"] > max_hosts:
+            hosts += f" (+{group['host_count'] - max_hosts})"
+        line = (f"- [{group.get('severity') or '?'} | CVSS {group['max_cvss']}] {group['nvt_name']}: "
+                f"{group['host_count']} host(s) ({hosts})")
+        if group.get("occurrences") is not None:
+            line += f", {group['occurrences']} ocorrência(s)"
+        if group["ports"]:
+            line += f", portas {', '.join(group['ports'][:max_hosts])}"
+        if group["cves"]:
+            line += f", {', '.join(group['cves'][:3])}"
+        if group.get("solution"):
+            solution = _truncate(group["solution"], PROMPT_SOLUTION_CHARS)
+            line += f"\n  Solução ({group.get('solution_type') or 'N/A'}): {solution}"
+        lines.append(line)
+    if len(groups) > max_groups:
+        # As demais entram só pelo nome, para o prompt ainda cobrir todas as vulnerabilidades distintas
+        names = "; ".join(group["nvt_name"] for group in groups[max_groups:])
+        lines.append(f"- Demais {len(groups) - max_groups} vulnerabilidade(s), de menor severidade: {names}")
+    return "\n".join(lines)
+
+
+def compute_file_analysis(csv_path: str, cvss_bands="v3", streaming: Optional[bool] = None,
+                          chunksize: int = DEFAULT_CHUNK_SIZE, profile: str = "stats",
+                          cache: Optional[ReportCache] = None) -> Tuple[Dict, List[Dict]]:
+    """
+    Estatísticas e grupos de um arquivo CSV com uma única leitura
+
+    O perfil "groups" tem todas as colunas do perfil "stats": quando nenhum dos
+    dois resultados está no cache, o arquivo é lido uma vez com ele (ou percorrido
+    uma vez em blocos, alimentando os dois acumuladores) e cada resultado vai para o
+    seu sidecar. Com um deles no cache, só o outro é calculado.
+
+    Args: ver `OpenVASCSVAnalyzer.analyze_csv_file`
+
+    Returns:
+        (estatísticas, grupos)
+    """
+    stats_namespace, stats_variant = stats_cache_key(profile, cvss_bands)
+    groups_namespace, groups_variant = groups_cache_key()
+    stats = groups = None
+    if cache is not None:
+        stats = cache.get_stats(csv_path, stats_namespace, stats_variant)
+        groups = cache.get_stats(csv_path, groups_namespace, groups_variant)
+    # Perfis com outros tipos ("full") podem mudar as estatísticas: leituras separadas
+    if stats is not None or groups is not None or profile not in ("stats", "groups"):
+        if stats is None:
+            stats = compute_file_statistics(csv_path, cvss_bands, streaming, chunksize, profile, cache)
+        if groups is None:
+            groups = compute_file_groups(csv_path, streaming, chunksize, cache)
+        return stats, groups
+
+    if streaming is None:
+        streaming = Path(csv_path).stat().st_size >= STREAMING_THRESHOLD_BYTES
+    accumulator = FindingGroupsAccumulator()
+    if streaming:
+        stats_accumulator = VulnerabilityStatsAccumulator(cvss_bands)
+        for chunk in load_openvas_csv(csv_path, chunksize=chunksize, profile="groups"):
+            stats_accumulator.update(chunk)
+            accumulator.update(chunk)
+        stats = stats_accumulator.result()
+    else:
+        df = load_report(csv_path, "groups", cache)
+        stats = compute_vulnerability_statistics(df, cvss_bands)
+        accumulator.update(df)
+    groups = accumulator.result()
+
+    if cache is not None:
+        cache.put_stats(csv_path, stats_namespace, stats, stats_variant)
+        cache.put_stats(csv_path, groups_namespace, groups, groups_variant)
+    return stats, groups
@@ -0,0 +1,291 @@
+"""
+Navegação paginada pelos achados de um relatório
+
+O relatório é carregado uma vez (pelo cache de relatórios, em Parquet) com as
+colunas de texto como category. Filtros e buscas são avaliados sobre as
+categorias (valores distintos, normalmente milhares) e aplicados às linhas pelos
+códigos, e cada ordenação é calculada uma vez e reaproveitada entre páginas.
+Só as linhas da página pedida viram dicionários, então navegar por um relatório
+de milhões de linhas custa milissegundos por página.
+"""
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .csv_analyzer import load_report
+    from .report_cache import ReportCache
+except ImportError:
+    # Execução direta (python src/tools/findings_explorer.py)
+    from csv_analyzer import load_report
+    from report_cache import ReportCache
+
+
+# Relatórios mantidos carregados em memória (os menos usados saem primeiro)
+EXPLORER_CACHE_SIZE = int(os.getenv("FINDINGS_EXPLORER_CACHE_SIZE", "4"))
+
+# Combinações de filtro/ordenação memorizadas por relatório
+_VIEW_CACHE_SIZE = 16
+
+# Colunas exibidas, na ordem, e alternativas em exportações mais simples
+EXPLORER_COLUMNS = ["IP", "Hostname", "Port", "Port Protocol", "Severity", "CVSS", "QoD",
+                    "NVT Name", "NVT OID", "CVEs", "Solution Type", "Timestamp"]
+COLUMN_FALLBACKS = {"IP": "Host", "Port Protocol": "Protocol", "NVT Name": "Vulnerability"}
+
+# Colunas de texto pesquisadas pela busca livre
+SEARCH_COLUMNS = ["IP", "Hostname", "NVT Name", "NVT OID", "CVEs"]
+
+# Critérios de ordenação aceitos por `page`
+SORT_KEYS = ["severity", "cvss", "host", "port", "nvt"]
+
+_SEVERITY_ORDER = {"Log": 0, "Low": 1, "Medium": 2, "High": 3, "Critical": 4}
+
+
+def _ipv4_number(value: str) -> int:
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, value), "big")
+    except OSError:
+        return -1
+
+
+def _ip_order(categories: pd.Index) -> np.ndarray:
+    """
+    Posições das categorias ordenadas como endereços IP: IPv4 numericamente, depois
+    os demais valores (IPv6 e hostnames)
+    """
+    numbers = np.fromiter((_ipv4_number(value) for value in categories), dtype=np.int64, count=len(categories))
+    ipv4 = np.flatnonzero(numbers >= 0)
+    ipv4 = ipv4[np.argsort(numbers[ipv4], kind="stable")]
+
+    def other_key(position):
+        value = categories[position]
+        try:
+            return (0, int(ipaddress.ip_address(value)), "")
+        except ValueError:
+            return (1, 0, value)
+
+    others = sorted(np.flatnonzero(numbers < 0), key=other_key)
+    return np.concatenate([ipv4, np.asarray(others, dtype=np.int64)])
+
+
+def _category_rank(series: pd.Series, as_ip: bool = False) -> np.ndarray:
+    """Posição de cada linha na ordem das categorias (ausentes ficam com -1)"""
+    categories = series.cat.categories.astype("str")
+    ranks = np.full(len(categories) + 1, -1, dtype=np.int64)
+    ordered = _ip_order(categories) if as_ip else np.argsort(categories.to_numpy(dtype=object), kind="stable")
+    ranks[ordered] = np.arange(len(categories))
+    return ranks[series.cat.codes.to_numpy()]
+
+
+def _category_mask(series: pd.Series, matches: np.ndarray) -> np.ndarray:
+    """Aplica às linhas um resultado calculado sobre as categorias (códigos -1 = ausente = False)"""
+    lookup = np.append(np.asarray(matches, dtype=bool), False)
+    return lookup[series.cat.codes.to_numpy()]
+
+
+class FindingsExplorer:
+    """Filtros, busca, ordenação e paginação sobre os achados de um relatório"""
+
+    def __init__(self, df: pd.DataFrame):
+        columns = {}
+        for column in EXPLORER_COLUMNS:
+            source = column if column in df.columns else COLUMN_FALLBACKS.get(column)
+            if source in df.columns:
+                columns[column] = df[source]
+        findings = pd.DataFrame(columns, index=pd.RangeIndex(len(df)))
+        for column in findings.columns:
+            if column == "CVSS":
+                # float32 do perfil tipado exibiria 2.5999999 em vez de 2.6
+                findings[column] = pd.to_numeric(findings[column], errors="coerce").astype("float64").round(1)
+            elif column == "QoD":
+                findings[column] = pd.to_numeric(findings[column], errors="coerce")
+            elif column == "Port":
+                findings[column] = pd.to_numeric(findings[column], errors="coerce").astype("Int32")
+            elif not isinstance(findings[column].dtype, pd.CategoricalDtype):
+                findings[column] = findings[column].astype("category")
+        self.df = findings
+        self._sort_values: Dict[str, np.ndarray] = {}
+        self._orders: Dict[Tuple, np.ndarray] = {}
+        self._views: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def _mask(self, host: Optional[str], severity: Optional[Sequence[str]], port: Optional[str],
+              nvt: Optional[str], search: Optional[str]) -> Optional[np.ndarray]:
+        df = self.df
+        mask = None
+
+        def combine(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        if host and "IP" in df.columns:
+            # Prefixo do IP (ex.: "192.168.1.") ou parte do hostname
+            ip_match = df["IP"].cat.categories.str.startswith(host)
+            condition = _category_mask(df["IP"], ip_match)
+            if "Hostname" in df.columns:
+                name_match = df["Hostname"].cat.categories.str.contains(host, case=False, regex=False)
+                condition |= _category_mask(df["Hostname"], name_match)
+            combine(condition)
+        if severity and "Severity" in df.columns:
+            combine(_category_mask(df["Severity"], df["Severity"].cat.categories.isin(list(severity))))
+        if port and "Port" in df.columns:
+            number, _, protocol = str(port).strip().partition("/")
+            if number.isdigit():
+                combine((df["Port"] == int(number)).fillna(False).to_numpy(dtype=bool))
+            elif number.lower() == "general":
+                # Achados sem porta (ex.: "general/tcp" no OpenVAS)
+                combine(df["Port"].isna().to_numpy())
+                protocol = ""
+            elif not protocol:
+                protocol = number
+            if protocol.strip() and "Port Protocol" in df.columns:
+                matches = df["Port Protocol"].cat.categories.str.lower() == protocol.strip().lower()
+                combine(_category_mask(df["Port Protocol"], matches))
+        if nvt:
+            condition = np.zeros(len(df), dtype=bool)
+            for column in ("NVT Name", "NVT OID"):
+                if column in df.columns:
+                    matches = df[column].cat.categories.str.contains(nvt, case=False, regex=False)
+                    condition |= _category_mask(df[column], matches)
+            combine(condition)
+        if search:
+            condition = np.zeros(len(df), dtype=bool)
+            for column in SEARCH_COLUMNS:
+                if column in df.columns:
+                    matches = df[column].cat.categories.str.contains(search, case=False, regex=False)
+                    condition |= _category_mask(df[column], matches)
+            combine(condition)
+        return mask
+
+    def _values(self, name: str) -> np.ndarray:
+        """Valores numéricos usados na ordenação (NaN = ausente), calculados uma vez por coluna"""
+        if name not in self._sort_values:
+            self._sort_values[name] = self._compute_values(name)
+        return self._sort_values[name]
+
+    def _compute_values(self, name: str) -> np.ndarray:
+        df = self.df
+        if name == "severity":
+            return df["Severity"].map(_SEVERITY_ORDER).to_numpy(dtype=float, na_value=np.nan) \
+                if "Severity" in df.columns else np.full(len(df), np.nan)
+        column = {"cvss": "CVSS", "port": "Port", "host": "IP", "nvt": "NVT Name"}[name]
+        if column not in df.columns:
+            return np.full(len(df), np.nan)
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            ranks = _category_rank(df[column], as_ip=column == "IP").astype(float)
+            ranks[ranks < 0] = np.nan
+            return ranks
+        return df[column].to_numpy(dtype=float, na_value=np.nan)
+
+    def _order(self, sort_by: str, ascending: bool) -> np.ndarray:
+        """Ordem de todas as linhas para um critério (calculada uma vez por critério)"""
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Ordenação não suportada: {sort_by}. Use um de: {', '.join(SORT_KEYS)}")
+        key = (sort_by, ascending)
+        if key not in self._orders:
+            # Critério principal (severidade desempata pelo CVSS) e, nos empates, hosts em ordem crescente
+            primary = ["severity", "cvss"] if sort_by == "severity" else [sort_by]
+            keys = [] if sort_by == "host" else [np.nan_to_num(self._values("host"), nan=np.inf)]
+            for name in reversed(primary):
+                values = self._values(name) if ascending else -self._values(name)
+                keys.append(np.nan_to_num(values, nan=np.inf))  # ausentes sempre no final
+            # np.lexsort ordena pela última chave e desempata pelas anteriores
+            self._orders[key] = np.lexsort(keys)
+        return self._orders[key]
+
+    def page(self, page: int = 1, page_size: int = 50, host: Optional[str] = None,
+             severity: Optional[Sequence[str]] = None, port: Optional[str] = None,
+             nvt: Optional[str] = None, search: Optional[str] = None,
+             sort_by: str = "severity", ascending: bool = False) -> Dict:
+        """
+        Uma página de achados
+
+        Args:
+            page: Número da página (a partir de 1; páginas além da última retornam a última)
+            page_size: Achados por página
+            host: Prefixo do IP (ex.: "192.168.1.") ou parte do hostname
+            severity: Severidades aceitas (ex.: ["Critical", "High"])
+            port: Porta, protocolo ou ambos (ex.: "443", "443/tcp", "udp")
+            nvt: Parte do nome do NVT ou do OID
+            search: Texto procurado em IP, hostname, NVT e CVEs
+            sort_by: Um de SORT_KEYS; os empates seguem a ordem dos hosts
+            ascending: Ordem crescente (padrão: mais graves primeiro)
+
+        Returns:
+            Dict com 'rows' (achados da página), 'total' (achados após os filtros),
+            'page', 'page_size', 'pages' e 'elapsed_ms'
+        """
+        start = time.perf_counter()
+        page_size = max(1, int(page_size))
+        view_key = (host or None, tuple(severity) if severity else None, port or None, nvt or None,
+                    search or None, sort_by, bool(ascending))
+
+        with self._lock:
+            view = self._views.get(view_key)
+            if view is not None:
+                self._views.move_to_end(view_key)
+            else:
+                order = self._order(sort_by, bool(ascending))
+                mask = self._mask(host, severity, port, nvt, search)
+                view = order if mask is None else order[mask[order]]
+                self._views[view_key] = view
+                while len(self._views) > _VIEW_CACHE_SIZE:
+                    self._views.popitem(last=False)
+
+        total = len(view)
+        pages = max(1, -(-total // page_size))
+        page = min(max(1, int(page)), pages)
+        rows = self.df.iloc[view[(page - 1) * page_size:page * page_size]]
+        records = [{column: None if pd.isna(value) else value for column, value in record.items()}
+                   for record in rows.to_dict("records")]
+        return {
+            "rows": records,
+            "total": int(total),
+            "page": page,
+            "page_size": page_size,
+            "pages": pages,
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+
+
+_explorers: "OrderedDict[Tuple, FindingsExplorer]" = OrderedDict()
+_explorers_lock = threading.Lock()
+
+
+def get_findings_explorer(csv_path: str, cache: Optional[ReportCache] = None) -> FindingsExplorer:
+    """
+    Explorador do relatório, mantido em memória entre chamadas
+
+    Identificado pelo hash do conteúdo (com cache) ou por caminho, tamanho e data
+    de modificação; até EXPLORER_CACHE_SIZE relatórios ficam carregados.
+    """
+    path = Path(csv_path).resolve()
+    if cache is not None:
+        key = ("sha256", cache.content_hash(str(path)))
+    else:
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+
+    with _explorers_lock:
+        explorer = _explorers.get(key)
+        if explorer is not None:
+            _explorers.move_to_end(key)
+            return explorer
+
+    explorer = FindingsExplorer(load_report(str(path), "explore", cache))
+    with _explorers_lock:
+        _explorers[key] = explorer
+        while len(_explorers) > EXPLORER_CACHE_SIZE:
+            _explorers.popitem(last=False)
+    return explorer
@@ -0,0 +1,494 @@
+"""
+Base local de achados de todos os relatórios ingeridos
+
+Cada CSV do OpenVAS ingerido (via `load_openvas_csv`) vira um registro em
+`reports` e suas linhas vão para `findings`, indexadas por host, NVT OID, CVE,
+severidade, porta e timestamp do scan. Assim perguntas que cruzam relatórios
+("quais hosts ainda têm o NVT X?") são respondidas por consultas indexadas,
+sem reler os arquivos. O banco SQLite é compartilhado pela CLI, pelo agente e
+pelo Streamlit.
+
+Uso pela linha de comando:
+    python -m src.tools.findings_store ingest csv_reports/
+    python -m src.tools.findings_store query --nvt-oid 1.3.6.1.4.1.25623.1.0.10330
+    python -m src.tools.findings_store cves --year-from 2021 --year-to 2022
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+
+try:
+    from .csv_analyzer import DEFAULT_CHUNK_SIZE, explode_cves, load_openvas_csv
+    from .report_cache import ReportCache, get_report_cache
+    from .scan_diff import _as_key
+except ImportError:
+    # Execução direta (python src/tools/findings_store.py)
+    from csv_analyzer import DEFAULT_CHUNK_SIZE, explode_cves, load_openvas_csv
+    from report_cache import ReportCache, get_report_cache
+    from scan_diff import _as_key
+
+
+DEFAULT_DB_PATH = os.getenv("FINDINGS_DB_PATH", "data/findings.sqlite")
+
+# Coluna do CSV -> coluna da tabela findings
+FINDING_COLUMNS = {
+    "IP": "ip",
+    "Hostname": "hostname",
+    "Port": "port",
+    "Port Protocol": "port_protocol",
+    "NVT OID": "nvt_oid",
+    "NVT Name": "nvt_name",
+    "Severity": "severity",
+    "CVSS": "cvss",
+    "QoD": "qod",
+    "CVEs": "cves",
+    "Solution Type": "solution_type",
+    "Timestamp": "timestamp",
+}
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS reports (
+        id INTEGER PRIMARY KEY,
+        sha256 TEXT UNIQUE NOT NULL,
+        source TEXT NOT NULL,
+        task_name TEXT,
+        scanned_at TEXT,
+        ingested_at REAL NOT NULL,
+        findings INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS findings (
+        id INTEGER PRIMARY KEY,
+        report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+        ip TEXT,
+        hostname TEXT,
+        port TEXT,
+        port_protocol TEXT,
+        nvt_oid TEXT,
+        nvt_name TEXT,
+        severity TEXT,
+        cvss REAL,
+        qod INTEGER,
+        cves TEXT,
+        solution_type TEXT,
+        timestamp TEXT
+    )""",
+    # Índice invertido CVE -> achados: a chave primária ordenada por CVE atende buscas
+    # exatas, por prefixo e por faixa de anos ("CVE-2019-" <= cve < "CVE-2022-")
+    """CREATE TABLE IF NOT EXISTS finding_cves (
+        cve TEXT NOT NULL,
+        finding_id INTEGER NOT NULL REFERENCES findings(id) ON DELETE CASCADE,
+        PRIMARY KEY (cve, finding_id)
+    ) WITHOUT ROWID""",
+    # Relatório mais recente de cada host (para "ainda tem")
+    """CREATE TABLE IF NOT EXISTS host_latest (
+        ip TEXT PRIMARY KEY,
+        report_id INTEGER NOT NULL,
+        scanned_at TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_findings_host ON findings(ip)",
+    "CREATE INDEX IF NOT EXISTS idx_findings_nvt_oid ON findings(nvt_oid)",
+    "CREATE INDEX IF NOT EXISTS idx_findings_nvt_name ON findings(nvt_name)",
+    "CREATE INDEX IF NOT EXISTS idx_findings_severity ON findings(severity)",
+    "CREATE INDEX IF NOT EXISTS idx_findings_port ON findings(port, port_protocol)",
+    "CREATE INDEX IF NOT EXISTS idx_findings_timestamp ON findings(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_findings_report ON findings(report_id)",
+    "CREATE INDEX IF NOT EXISTS idx_finding_cves_finding ON finding_cves(finding_id)",
+]
+
+
+def _prefix_end(prefix: str) -> str:
+    """Menor texto maior que todos os que começam com `prefix`"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _cve_conditions(cve: Optional[str], prefix: Optional[str], year_from: Optional[int],
+                    year_to: Optional[int]):
+    """Condições sobre finding_cves.cve, todas resolvidas por faixa na chave primária"""
+    conditions, params = [], []
+    if cve:
+        conditions.append("cve = ?")
+        params.append(cve.strip().upper())
+    if prefix and prefix.strip().rstrip("*"):
+        prefix = prefix.strip().rstrip("*").upper()
+        conditions.extend(["cve >= ?", "cve < ?"])
+        params.extend([prefix, _prefix_end(prefix)])
+    if year_from is not None:
+        conditions.append("cve >= ?")
+        params.append(f"CVE-{int(year_from):04d}-")
+    if year_to is not None:
+        conditions.append("cve < ?")
+        params.append(f"CVE-{int(year_to) + 1:04d}-")
+    return conditions, params
+
+
+class FindingsStore:
+    """Base SQLite de achados de vários relatórios do OpenVAS"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, report_cache: Optional[ReportCache] = None):
+        """
+        Args:
+            db_path: Arquivo SQLite da base
+            report_cache: Cache usado para o hash de conteúdo dos CSVs (ingestão idempotente);
+                None usa o cache compartilhado
+        """
+        self.db_path = db_path
+        self.report_cache = report_cache or get_report_cache()
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    # --- Ingestão ---
+
+    def ingest_csv(self, csv_path: str, chunksize: int = DEFAULT_CHUNK_SIZE) -> Dict:
+        """
+        Ingere um CSV do OpenVAS, lido em blocos com `load_openvas_csv`
+
+        Um arquivo com o mesmo conteúdo de um já ingerido é ignorado.
+
+        Returns:
+            Dict com 'report_id', 'findings' (linhas ingeridas) e 'skipped'
+            (True se o relatório já estava na base)
+        """
+        sha256 = self.report_cache.content_hash(csv_path)
+        with self._lock:
+            row = self._conn.execute("SELECT id, findings FROM reports WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is not None:
+            return {"report_id": row["id"], "findings": row["findings"], "skipped": True}
+
+        chunks = load_openvas_csv(csv_path, chunksize=chunksize, profile="store")
+        with self._lock, self._conn:
+            report_id = self._conn.execute(
+                "INSERT INTO reports(sha256, source, ingested_at) VALUES (?, ?, ?)",
+                (sha256, str(Path(csv_path).resolve()), time.time()),
+            ).lastrowid
+            total = 0
+            task_names = set()
+            for chunk in chunks:
+                total += self._insert_chunk(report_id, chunk)
+                if "Task Name" in chunk.columns:
+                    task_names.update(chunk["Task Name"].dropna().unique())
+
+            self._conn.execute(
+                "UPDATE reports SET findings = ?, task_name = ?, "
+                "scanned_at = (SELECT MAX(timestamp) FROM findings WHERE report_id = ?) WHERE id = ?",
+                (total, ", ".join(sorted(map(str, task_names))) or None, report_id, report_id),
+            )
+            self._update_host_latest(report_id)
+        return {"report_id": report_id, "findings": total, "skipped": False}
+
+    def ingest_folder(self, folder_path: str, pattern: str = "*.csv") -> List[Dict]:
+        """Ingere todos os CSVs de uma pasta; retorna o resultado de cada arquivo (com 'file' e 'error')"""
+        results = []
+        for csv_file in sorted(Path(folder_path).glob(pattern)):
+            try:
+                results.append({"file": csv_file, "error": None, **self.ingest_csv(str(csv_file))})
+            except Exception as e:
+                results.append({"file": csv_file, "error": str(e)})
+        return results
+
+    def _insert_chunk(self, report_id: int, chunk: pd.DataFrame) -> int:
+        if chunk.empty:
+            return 0
+        first_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM findings").fetchone()[0]
+        ids = range(first_id, first_id + len(chunk))
+
+        columns = {"id": ids, "report_id": [report_id] * len(chunk)}
+        for csv_column, column in FINDING_COLUMNS.items():
+            if csv_column not in chunk.columns:
+                columns[column] = [None] * len(chunk)
+            elif column in ("cvss", "qod"):
+                values = pd.to_numeric(chunk[csv_column], errors="coerce")
+                columns[column] = values.astype(object).where(values.notna(), None).tolist()
+            else:
+                values = _as_key(chunk[csv_column]) if column == "port" else chunk[csv_column].astype("str")
+                columns[column] = values.astype(object).where(values.notna() & (values != ""), None).tolist()
+
+        names = list(columns)
+        self._conn.executemany(
+            f"INSERT INTO findings({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            zip(*columns.values()),
+        )
+        if "CVEs" in chunk.columns:
+            # Índice invertido, atualizado a cada relatório ingerido
+            cves = explode_cves(chunk["CVEs"])
+            finding_ids = first_id + chunk.index.get_indexer(cves["row"])
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO finding_cves(cve, finding_id) VALUES (?, ?)",
+                zip(cves["cve"].tolist(), finding_ids.tolist()),
+            )
+        return len(chunk)
+
+    def _update_host_latest(self, report_id: int):
+        """Atualiza o relatório mais recente dos hosts do relatório (desempate pelo mais recente ingerido)"""
+        self._conn.execute(
+            """INSERT INTO host_latest(ip, report_id, scanned_at)
+               SELECT DISTINCT f.ip, r.id, r.scanned_at FROM findings f JOIN reports r ON r.id = f.report_id
+               WHERE f.report_id = ? AND f.ip IS NOT NULL
+               ON CONFLICT(ip) DO UPDATE SET report_id = excluded.report_id, scanned_at = excluded.scanned_at
+               WHERE COALESCE(excluded.scanned_at, '') >= COALESCE(host_latest.scanned_at, '')""",
+            (report_id,),
+        )
+
+    def delete_report(self, report_id: int):
+        """Remove um relatório e seus achados"""
+        with self._lock, self._conn:
+            ips = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT ip FROM findings WHERE report_id = ? AND ip IS NOT NULL", (report_id,)
+            )]
+            self._conn.execute("DELETE FROM reports WHERE id = ?", (report_id,))
+            self._conn.executemany("DELETE FROM host_latest WHERE ip = ?", ((ip,) for ip in ips))
+            # Recalcula o mais recente dos hosts afetados a partir dos relatórios restantes
+            for (other_id,) in self._conn.execute(
+                "SELECT id FROM reports ORDER BY COALESCE(scanned_at, ''), id"
+            ).fetchall():
+                self._update_host_latest(other_id)
+
+    # --- Consultas ---
+
+    def query(self, host: Optional[str] = None, nvt_oid: Optional[str] = None, nvt_name: Optional[str] = None,
+              cve: Optional[str] = None, severity: Union[str, Sequence[str], None] = None,
+              port: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+              report_id: Optional[int] = None, latest: bool = False, limit: Optional[int] = 100,
+              cve_prefix: Optional[str] = None, cve_year_from: Optional[int] = None,
+              cve_year_to: Optional[int] = None) -> List[Dict]:
+        """
+        Busca achados por qualquer combinação de filtros indexados
+
+        Args:
+            host: IP do host
+            nvt_oid: OID do NVT
+            nvt_name: Nome exato do NVT
+            cve: Identificador do CVE (ex.: CVE-2021-44228)
+            severity: Severidade ou lista de severidades (Critical, High, Medium, Low, Log)
+            port: Porta ("443") ou porta/protocolo ("443/tcp")
+            since, until: Intervalo do timestamp do scan (ISO 8601, inclusivo)
+            report_id: Restringe a um relatório
+            latest: Apenas o relatório mais recente de cada host ("ainda tem")
+            limit: Máximo de linhas (None para todas)
+            cve_prefix: Prefixo do CVE (ex.: "CVE-2021-44", "CVE-2021-*")
+            cve_year_from, cve_year_to: Faixa de anos do CVE (inclusiva)
+
+        Returns:
+            Lista de achados (dicts com as colunas de `findings` mais 'source' do relatório),
+            do último ingerido para o primeiro
+        """
+        where, params, joins = [], [], []
+        cve_conditions, cve_params = _cve_conditions(cve, cve_prefix, cve_year_from, cve_year_to)
+        if cve_conditions:
+            # Semi-join pelo índice invertido: custo proporcional aos achados encontrados
+            where.append(f"f.id IN (SELECT finding_id FROM finding_cves WHERE {' AND '.join(cve_conditions)})")
+            params.extend(cve_params)
+        if latest:
+            joins.append("JOIN host_latest hl ON hl.ip = f.ip AND hl.report_id = f.report_id")
+        if host:
+            where.append("f.ip = ?")
+            params.append(host)
+        if nvt_oid:
+            where.append("f.nvt_oid = ?")
+            params.append(nvt_oid)
+        if nvt_name:
+            where.append("f.nvt_name = ?")
+            params.append(nvt_name)
+        if severity:
+            severities = [severity] if isinstance(severity, str) else list(severity)
+            where.append(f"f.severity IN ({', '.join('?' * len(severities))})")
+            params.extend(severities)
+        if port:
+            number, _, protocol = str(port).partition("/")
+            where.append("f.port = ?")
+            params.append(number)
+            if protocol:
+                where.append("f.port_protocol = ?")
+                params.append(protocol)
+        if since:
+            where.append("f.timestamp >= ?")
+            params.append(since)
+        if until:
+            where.append("f.timestamp <= ?")
+            params.append(until)
+        if report_id is not None:
+            where.append("f.report_id = ?")
+            params.append(report_id)
+
+        sql = f"SELECT f.*, r.source FROM findings f JOIN reports r ON r.id = f.report_id {' '.join(joins)}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Ordem de ingestão (id) em vez de timestamp: os índices já estão nessa ordem,
+        # então o LIMIT não precisa ordenar todas as linhas encontradas
+        sql += " ORDER BY f.id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def affected_hosts(self, nvt_oid: Optional[str] = None, nvt_name: Optional[str] = None,
+                       cve: Optional[str] = None, latest: bool = True, cve_prefix: Optional[str] = None) -> List[Dict]:
+        """
+        Hosts com um NVT ou CVE (exato ou por prefixo), agrupados
+
+        Com latest=True (padrão), considera só o relatório mais recente de cada host,
+        ou seja, os hosts que *ainda* têm o problema.
+
+        Returns:
+            Lista de dicts com 'ip', 'hostname', 'findings', 'max_cvss' e 'last_seen'
+        """
+        if not (nvt_oid or nvt_name or cve or cve_prefix):
+            raise ValueError("Informe nvt_oid, nvt_name, cve ou cve_prefix")
+        rows = self.query(nvt_oid=nvt_oid, nvt_name=nvt_name, cve=cve, cve_prefix=cve_prefix,
+                          latest=latest, limit=None)
+
+        hosts: Dict[str, Dict] = {}
+        for row in rows:
+            entry = hosts.setdefault(row["ip"], {
+                "ip": row["ip"], "hostname": row["hostname"], "findings": 0, "max_cvss": None, "last_seen": None,
+            })
+            entry["findings"] += 1
+            if row["cvss"] is not None and (entry["max_cvss"] is None or row["cvss"] > entry["max_cvss"]):
+                entry["max_cvss"] = row["cvss"]
+            if row["timestamp"] and (entry["last_seen"] is None or row["timestamp"] > entry["last_seen"]):
+                entry["last_seen"] = row["timestamp"]
+        return sorted(hosts.values(), key=lambda entry: (-(entry["max_cvss"] or 0), entry["ip"] or ""))
+
+    def cve_counts(self, cve_prefix: Optional[str] = None, year_from: Optional[int] = None,
+                   year_to: Optional[int] = None, latest: bool = False, limit: Optional[int] = 100) -> List[Dict]:
+        """
+        CVEs presentes na base, com número de achados e de hosts de cada um
+
+        Args:
+            cve_prefix: Prefixo do CVE (ex.: "CVE-2021-")
+            year_from, year_to: Faixa de anos do CVE (inclusiva)
+            latest: Apenas o relatório mais recente de cada host
+            limit: Máximo de CVEs (None para todos)
+
+        Returns:
+            Lista de dicts com 'cve', 'findings', 'hosts' e 'max_cvss', dos mais frequentes
+            para os menos frequentes
+        """
+        conditions, params = _cve_conditions(None, cve_prefix, year_from, year_to)
+        sql = ("SELECT c.cve, COUNT(*) AS findings, COUNT(DISTINCT f.ip) AS hosts, MAX(f.cvss) AS max_cvss "
+               "FROM finding_cves c JOIN findings f ON f.id = c.finding_id")
+        if latest:
+            sql += " JOIN host_latest hl ON hl.ip = f.ip AND hl.report_id = f.report_id"
+        if conditions:
+            sql += " WHERE " + " AND ".join(f"c.{condition}" for condition in conditions)
+        sql += " GROUP BY c.cve ORDER BY findings DESC, c.cve"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def reports(self) -> List[Dict]:
+        """Relatórios ingeridos, do scan mais recente para o mais antigo"""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(
+                "SELECT * FROM reports ORDER BY COALESCE(scanned_at, '') DESC, id DESC"
+            )]
+
+    def stats(self) -> Dict:
+        """Totais da base"""
+        with self._lock:
+            reports, findings = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(findings), 0) FROM reports"
+            ).fetchone()
+            hosts = self._conn.execute("SELECT COUNT(*) FROM host_latest").fetchone()[0]
+            cves = self._conn.execute("SELECT COUNT(DISTINCT cve) FROM finding_cves").fetchone()[0]
+        return {"reports": reports, "findings": findings, "hosts": hosts, "cves": cves}
+
+    def clear(self):
+        """Remove todos os relatórios e achados"""
+        with self._lock, self._conn:
+            for table in ("finding_cves", "findings", "host_latest", "reports"):
+                self._conn.execute(f"DELETE FROM {table}")
+
+
+_default_store: Optional[FindingsStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_findings_store() -> FindingsStore:
+    """Retorna a base de achados compartilhada do processo (configurada por FINDINGS_DB_PATH)"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = FindingsStore()
+        return _default_store
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Base local de achados do OpenVAS")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Ingere CSVs (arquivos ou pastas)")
+    ingest_parser.add_argument("paths", nargs="+")
+
+    query_parser = commands.add_parser("query", help="Consulta achados")
+    query_parser.add_argument("--host")
+    query_parser.add_argument("--nvt-oid")
+    query_parser.add_argument("--nvt-name")
+    query_parser.add_argument("--cve")
+    query_parser.add_argument("--cve-prefix", help='Ex.: "CVE-2021-44"')
+    query_parser.add_argument("--cve-year-from", type=int)
+    query_parser.add_argument("--cve-year-to", type=int)
+    query_parser.add_argument("--severity", nargs="*")
+    query_parser.add_argument("--port")
+    query_parser.add_argument("--latest", action="store_true", help="Apenas o relatório mais recente de cada host")
+    query_parser.add_argument("--limit", type=int, default=20)
+
+    cves_parser = commands.add_parser("cves", help="CVEs presentes na base")
+    cves_parser.add_argument("--prefix")
+    cves_parser.add_argument("--year-from", type=int)
+    cves_parser.add_argument("--year-to", type=int)
+    cves_parser.add_argument("--latest", action="store_true", help="Apenas o relatório mais recente de cada host")
+    cves_parser.add_argument("--limit", type=int, default=20)
+
+    commands.add_parser("stats", help="Totais da base")
+
+    args = parser.parse_args()
+    store = get_findings_store()
+
+    if args.command == "ingest":
+        for path in args.paths:
+            outcomes = store.ingest_folder(path) if Path(path).is_dir() else [
+                {"file": Path(path), "error": None, **store.ingest_csv(path)}
+            ]
+            for outcome in outcomes:
+                if outcome["error"]:
+                    print(f"❌ {outcome['file'].name}: {outcome['error']}")
+                elif outcome["skipped"]:
+                    print(f"⏭️  {outcome['file'].name}: já ingerido (relatório {outcome['report_id']})")
+                else:
+                    print(f"✅ {outcome['file'].name}: {outcome['findings']} achados (relatório {outcome['report_id']})")
+    elif args.command == "query":
+        start = time.perf_counter()
+        rows = store.query(host=args.host, nvt_oid=args.nvt_oid, nvt_name=args.nvt_name, cve=args.cve,
+                           severity=args.severity, port=args.port, latest=args.latest, limit=args.limit,
+                           cve_prefix=args.cve_prefix, cve_year_from=args.cve_year_from,
+                           cve_year_to=args.cve_year_to)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        print(f"🔎 {len(rows)} achado(s) em {elapsed_ms:.1f} ms")
+    elif args.command == "cves":
+        for row in store.cve_counts(args.prefix, args.year_from, args.year_to, args.latest, args.limit):
+            print(f"{row['cve']}: {row['findings']} achado(s) em {row['hosts']} host(s), CVSS máx. {row['max_cvss']}")
+    else:
+        print(json.dumps(store.stats(), indent=2))
@@ -0,0 +1,143 @@
+"""
+Pipeline paralelo para análise de pastas de relatórios CSV do OpenVAS
+
+Os arquivos passam por três estágios que rodam sobrepostos:
+1. Leitura do CSV e estatísticas, em um pool de processos (trabalho de CPU)
+2. Resumo com o LLM, em threads; as chamadas ao LLM de todos os resumos, inclusive
+   as partes do map-reduce, dividem um único limite (`llm_concurrency`)
+3. Gravação do relatório, no thread de quem consome o pipeline, assim que cada resumo fica pronto
+
+Os resultados saem na ordem de conclusão e a falha de um arquivo não interrompe os demais.
+"""
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+try:
+    from .csv_analyzer import RAW_DATA_LIMIT, OpenVASCSVAnalyzer
+    from .finding_groups import compute_file_analysis
+    from .map_reduce_summary import llm_call_limit
+    from .report_cache import ReportCache
+except ImportError:
+    # Execução direta (python src/tools/csv_analyzer.py)
+    from csv_analyzer import RAW_DATA_LIMIT, OpenVASCSVAnalyzer
+    from finding_groups import compute_file_analysis
+    from map_reduce_summary import llm_call_limit
+    from report_cache import ReportCache
+
+
+# Processos para leitura/estatísticas (0 = número de CPUs)
+DEFAULT_PARSE_WORKERS = int(os.getenv("CSV_PARSE_WORKERS", "0"))
+
+# Chamadas simultâneas ao LLM
+DEFAULT_LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+
+# Os chamadores (grafo, API, Streamlit) já têm threads: um fork copiaria locks presos
+# (httpx, sqlite, logging) para os processos filhos
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _parse_stage(csv_path: str, cvss_bands: Union[str, List], streaming: Optional[bool],
+                 cache_dir: Optional[str], cache_max_bytes: int) -> Dict:
+    """Estágio 1 (processo separado): estatísticas e achados agrupados por vulnerabilidade"""
+    cache = ReportCache(cache_dir, cache_max_bytes) if cache_dir else None
+    stats, groups = compute_file_analysis(csv_path, cvss_bands, streaming=streaming, cache=cache)
+    return {"statistics": stats, "groups": groups}
+
+
+def _summary_stage(analyzer: OpenVASCSVAnalyzer, parsed: Dict, call_limit: threading.Semaphore) -> Dict:
+    """Estágio 2 (thread): resumo executivo com o LLM, dentro do limite de chamadas do pipeline"""
+    with llm_call_limit(call_limit):
+        summary = analyzer.summarize(parsed["statistics"], parsed["groups"])
+    return {
+        "statistics": parsed["statistics"],
+        "summary": summary["summary"],
+        "summary_stages": summary["stages"],
+        "raw_data": parsed["groups"][:RAW_DATA_LIMIT],
+    }
+
+
+def iter_folder_analysis(analyzer: OpenVASCSVAnalyzer, csv_files: List[Path], output_folder: Path,
+                         parse_workers: int = DEFAULT_PARSE_WORKERS,
+                         llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+                         streaming: Optional[bool] = None) -> Iterator[Dict]:
+    """
+    Analisa vários CSVs em paralelo e entrega cada resultado assim que fica pronto
+
+    Args:
+        analyzer: Analisador usado nos resumos (compartilhado entre as threads)
+        csv_files: Arquivos a analisar
+        output_folder: Pasta onde os relatórios são gravados
+        parse_workers: Processos para leitura/estatísticas (0 = número de CPUs)
+        llm_concurrency: Máximo de chamadas simultâneas ao LLM, somando todos os arquivos
+            e as partes dos resumos em map-reduce
+        streaming: Repassado para as estatísticas (None decide pelo tamanho do arquivo)
+
+    Yields:
+        Dict com 'file', 'analysis', 'output_file', 'error' (None em caso de sucesso)
+        e 'elapsed' (segundos desde o início do pipeline)
+    """
+    if not csv_files:
+        return
+
+    output_folder = Path(output_folder)
+    output_folder.mkdir(exist_ok=True)
+    cache = analyzer.cache
+    cache_dir = str(cache.cache_dir) if cache is not None else None
+    cache_max_bytes = cache.max_bytes if cache is not None else 0
+
+    workers = min(parse_workers or os.cpu_count() or 1, len(csv_files))
+    parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(PARSE_START_METHOD))
+    llm_pool = ThreadPoolExecutor(max_workers=max(1, llm_concurrency))
+    call_limit = threading.BoundedSemaphore(max(1, llm_concurrency))
+    start = time.perf_counter()
+
+    def outcome(csv_file, analysis=None, output_file=None, error=None):
+        return {
+            "file": csv_file,
+            "analysis": analysis,
+            "output_file": output_file,
+            "error": error,
+            "elapsed": time.perf_counter() - start,
+        }
+
+    try:
+        pending = {}
+        for csv_file in csv_files:
+            future = parse_pool.submit(_parse_stage, str(csv_file), analyzer.cvss_bands, streaming,
+                                       cache_dir, cache_max_bytes)
+            pending[future] = ("parse", csv_file)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, csv_file = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield outcome(csv_file, error=str(e))
+                    continue
+
+                if stage == "parse":
+                    # Com o contexto de quem chamou (nó do grafo, para a telemetria do LLM)
+                    summary = llm_pool.submit(contextvars.copy_context().run, _summary_stage, analyzer, result,
+                                            call_limit)
+                    pending[summary] = ("summary", csv_file)
+                    continue
+
+                # Estágio 3: grava o relatório assim que o resumo chega
+                output_file = output_folder / f"relatorio_{csv_file.stem}.txt"
+                try:
+                    analyzer.save_report(result, str(output_file))
+                except Exception as e:
+                    yield outcome(csv_file, analysis=result, error=str(e))
+                    continue
+                yield outcome(csv_file, analysis=result, output_file=output_file)
+    finally:
+        parse_pool.shutdown(wait=True, cancel_futures=True)
+        llm_pool.shutdown(wait=True, cancel_futures=True)
@@ -13,8 +13,7 @@ path = os.getenv('GVMD_SOCKET_PATH')
 username = os.getenv('GVMD_USERNAME')
 password = os.getenv('GVMD_PASSWORD')
 
-# Configuração da conexão com OpenVAS
-connection = UnixSocketConnection(path=path)
+# Configuração da conexão com OpenVAS (cada consulta abre a sua: a API atende várias ao mesmo tempo)
 transform = EtreeCheckCommandTransform()
 
 class ResultManager:
@@ -22,6 +21,7 @@ class ResultManager:
         pass
         
     def result(self, task_name_input):
+        connection = UnixSocketConnection(path=path)
         with GMP(connection=connection, transform=transform) as gmp:
             try:
                 gmp.authenticate(username=username, password=password)
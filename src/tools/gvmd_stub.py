@@ -0,0 +1,210 @@
+"""
+Servidor local que imita o gvmd (GMP sobre Unix socket)
+
+Serve para exercitar o TaskCreator e o ResultAnalyzer sem um OpenVAS de verdade:
+responde aos comandos GMP usados por `GVMWorkflow` e `ResultManager`
+(get_version, authenticate, get_targets, get_port_lists, create_target,
+get_configs, get_scanners, create_task, get_tasks, start_task e
+get_results), com uma latência configurável por comando. Alvos e tarefas ficam
+em memória; uma tarefa iniciada passa a "Done" depois de `scan_seconds`, e os
+resultados de qualquer tarefa concluída são os mesmos achados de exemplo.
+Aponte os clientes com GVMD_SOCKET_PATH=<path>.
+"""
+import os
+import socketserver
+import tempfile
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+GMP_VERSION = "22.4"
+
+PORT_LISTS = {"All IANA assigned TCP": "33d0cd82-57c6-11e1-8ed1-406186ea4fc5"}
+SCAN_CONFIGS = {"Full and fast": "daba56c8-73ec-11df-a475-002264764cea"}
+SCANNERS = {"OpenVAS Default": "08b69003-5fc2-4037-a479-93b440211c73"}
+
+# Achados devolvidos por get_results
+SAMPLE_RESULTS = [
+    {"name": "OpenSSH Multiple Vulnerabilities", "host": "10.0.0.5", "port": "22/tcp", "severity": "7.8",
+     "oid": "1.3.6.1.4.1.25623.1.0.108440", "solution": "Update OpenSSH to the latest version."},
+    {"name": "SSL/TLS: Deprecated TLSv1.0 and TLSv1.1 Protocol Detection", "host": "10.0.0.5", "port": "443/tcp",
+     "severity": "4.3", "oid": "1.3.6.1.4.1.25623.1.0.117274", "solution": "Disable TLSv1.0 and TLSv1.1."},
+]
+
+
+class _GMPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        stub = self.server.stub
+        stub._count("connections")
+        parser = ET.XMLPullParser(events=("start", "end"))
+        depth = 0
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            parser.feed(data)
+            for event, element in parser.read_events():
+                depth += 1 if event == "start" else -1
+                if event == "end" and depth == 0:
+                    # Um comando completo: responde e prepara o parser para o próximo
+                    self.request.sendall(stub.handle_command(element))
+                    parser = ET.XMLPullParser(events=("start", "end"))
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clientes que fecham o socket no meio de um comando não são erro do stub
+        pass
+
+
+class StubGVMDServer:
+    """gvmd falso, executado em uma thread em segundo plano"""
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0, scan_seconds: float = 0.0,
+                 tasks: Optional[List[str]] = None):
+        """
+        Args:
+            path: Caminho do Unix socket (None cria um em um diretório temporário)
+            latency: Segundos de espera por comando GMP
+            scan_seconds: Tempo até uma tarefa iniciada ficar "Done"
+            tasks: Nomes de tarefas já concluídas (para consultar resultados)
+        """
+        self._tmpdir = None
+        if path is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="gvmd-stub-")
+            path = os.path.join(self._tmpdir, "gvmd.sock")
+        self.path = path
+        self.latency = latency
+        self.scan_seconds = scan_seconds
+        self.targets: Dict[str, Dict] = {}
+        self.tasks: Dict[str, Dict] = {}
+        self.counters = {"connections": 0, "commands": 0}
+        self._lock = threading.Lock()
+        for name in tasks or []:
+            self.tasks[str(uuid.uuid4())] = {"name": name, "target": None, "started": 0.0}
+        self._server = _UnixServer(path, _GMPHandler)
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _task_status(self, task: Dict) -> str:
+        if task["started"] is None:
+            return "New"
+        return "Done" if time.time() - task["started"] >= self.scan_seconds else "Running"
+
+    def handle_command(self, command: ET.Element) -> bytes:
+        """Resposta GMP (XML) a um comando"""
+        self._count("commands")
+        if self.latency:
+            time.sleep(self.latency)
+
+        handler = getattr(self, f"_cmd_{command.tag}", None)
+        if handler is None:
+            response = ET.Element(f"{command.tag}_response", status="400", status_text="Bogus command name")
+        else:
+            with self._lock:
+                response = handler(command)
+        return ET.tostring(response)
+
+    @staticmethod
+    def _response(command: ET.Element, status: str = "200", status_text: str = "OK", **attrs) -> ET.Element:
+        return ET.Element(f"{command.tag}_response", status=status, status_text=status_text, **attrs)
+
+    def _listing(self, command: ET.Element, tag: str, items: Dict[str, str]) -> ET.Element:
+        response = self._response(command)
+        for name, item_id in items.items():
+            ET.SubElement(ET.SubElement(response, tag, id=item_id), "name").text = name
+        return response
+
+    def _cmd_get_version(self, command):
+        response = self._response(command)
+        ET.SubElement(response, "version").text = GMP_VERSION
+        return response
+
+    def _cmd_authenticate(self, command):
+        response = self._response(command)
+        ET.SubElement(response, "role").text = "Admin"
+        ET.SubElement(response, "timezone").text = "UTC"
+        return response
+
+    def _cmd_get_port_lists(self, command):
+        return self._listing(command, "port_list", PORT_LISTS)
+
+    def _cmd_get_configs(self, command):
+        return self._listing(command, "config", SCAN_CONFIGS)
+
+    def _cmd_get_scanners(self, command):
+        return self._listing(command, "scanner", SCANNERS)
+
+    def _cmd_get_targets(self, command):
+        response = self._response(command)
+        for target_id, target in self.targets.items():
+            element = ET.SubElement(response, "target", id=target_id)
+            ET.SubElement(element, "name").text = target["name"]
+            ET.SubElement(element, "hosts").text = target["hosts"]
+        return response
+
+    def _cmd_create_target(self, command):
+        target_id = str(uuid.uuid4())
+        self.targets[target_id] = {"name": command.findtext("name"), "hosts": command.findtext("hosts")}
+        return self._response(command, "201", "OK, resource created", id=target_id)
+
+    def _cmd_create_task(self, command):
+        task_id = str(uuid.uuid4())
+        self.tasks[task_id] = {"name": command.findtext("name"), "target": command.find("target").get("id"),
+                               "started": None}
+        return self._response(command, "201", "OK, resource created", id=task_id)
+
+    def _cmd_get_tasks(self, command):
+        response = self._response(command)
+        for task_id, task in self.tasks.items():
+            element = ET.SubElement(response, "task", id=task_id)
+            ET.SubElement(element, "name").text = task["name"]
+            ET.SubElement(element, "status").text = self._task_status(task)
+        return response
+
+    def _cmd_start_task(self, command):
+        task = self.tasks.get(command.get("task_id"))
+        if task is None:
+            return self._response(command, "404", "Failed to find task")
+        task["started"] = time.time()
+        response = self._response(command, "202", "OK, request submitted")
+        ET.SubElement(response, "report_id").text = str(uuid.uuid4())
+        return response
+
+    def _cmd_get_results(self, command):
+        response = self._response(command)
+        for finding in SAMPLE_RESULTS:
+            result = ET.SubElement(response, "result", id=str(uuid.uuid4()))
+            ET.SubElement(result, "name").text = finding["name"]
+            ET.SubElement(result, "host").text = finding["host"]
+            ET.SubElement(result, "port").text = finding["port"]
+            ET.SubElement(result, "severity").text = finding["severity"]
+            ET.SubElement(ET.SubElement(result, "nvt", oid=finding["oid"]), "solution").text = finding["solution"]
+        return response
+
+    def start(self) -> "StubGVMDServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        if self._tmpdir is not None:
+            os.rmdir(self._tmpdir)
+
+    def __enter__(self) -> "StubGVMDServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
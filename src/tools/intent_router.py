@@ -0,0 +1,260 @@
+"""
+Roteamento local das mensagens, antes do supervisor LLM
+
+Pedidos como "create task for 10.0.0.5" ou "listar csv" já trazem os padrões
+que as ferramentas procuram (IP/hostname, nome da task entre aspas, arquivo
+.csv, CVE, OID). O `IntentRouter` decide a rota dessas mensagens sem chamar o
+LLM, em microssegundos:
+
+1. Regras determinísticas (as mesmas expressões dos agentes): se só uma rota
+   casar, ela é usada com confiança 1.0.
+2. Um classificador Naive Bayes multinomial (palavras, bigramas e marcadores
+   como <ip> e <csv>), treinado com as consultas rotuladas de
+   `intent_queries.jsonl`. Ele tem também a classe "LLM" (perguntas gerais),
+   para reconhecer o que não é dele.
+
+Quando nenhuma regra decide e a probabilidade do classificador fica abaixo de
+INTENT_ROUTER_THRESHOLD, a mensagem vai para o supervisor LLM, como antes.
+Com INTENT_ROUTER=0, todas as mensagens vão para o LLM.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROUTES = ("TaskCreator", "ResultAnalyzer", "CSVAnalyzer")
+
+ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "1").lower() not in ("0", "false", "no")
+ROUTER_THRESHOLD = float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.9"))
+QUERIES_PATH = Path(os.getenv("INTENT_ROUTER_QUERIES", str(Path(__file__).with_name("intent_queries.jsonl"))))
+
+# Mesmos padrões de create_openvas_task, get_openvas_results e csv_analyzer_agent
+IP_PATTERN = re.compile(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}(?:-[0-9]{1,3})?\b')
+HOST_PATTERN = re.compile(r'\b(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,6}\b')
+RESULT_TASK_PATTERN = re.compile(r"""(?:for task|task named|task called)\s+["']([^'"]+)[""]""", re.IGNORECASE)
+CSV_FILE_PATTERN = re.compile(r'\S+\.csv\b', re.IGNORECASE)
+CVE_PATTERN = re.compile(r'\bCVE-\d{4}-\d{4,}\b', re.IGNORECASE)
+OID_PATTERN = re.compile(r'\b1\.3\.6\.1\.4\.1\.25623(?:\.\d+)+\b')
+QUOTED_PATTERN = re.compile(r"""["'“”][^"'“”]*["'“”]""")
+WORD_PATTERN = re.compile(r"<\w+>|\w+")
+
+# Pedido de criação (sem acento): o imperativo abre a mensagem, depois de "please",
+# "quero"... Verbos genéricos ("run", "start") só valem com scan/tarefa na mensagem
+CREATE_PREFIX = r"^\W*(?:(?:please|pls|por favor|i want to|i'd like to|i would like to|quero|gostaria de)\W+)*"
+CREATE_PATTERN = re.compile(CREATE_PREFIX + r"(?:scan|escanear|escaneie|(?:faca|faz|fazer)\s+(?:um|uma)\s+"
+                            r"(?:scan|varredura|tarefa))\b")
+GENERIC_CREATE_PATTERN = re.compile(CREATE_PREFIX + r"(?:create|criar|crie|cria|start|iniciar|inicie|inicia|comecar|"
+                                    r"comece|run|rodar|rode|execute|executar|launch|dispara|dispare|agende|agendar|"
+                                    r"schedule)\b")
+SCAN_NOUN_PATTERN = re.compile(r"\b(?:scan|scanning|varredura|task|tarefa|assessment)\b")
+# Verbos que, junto de um alvo, não pedem um scan novo ("stop the scan on...", "list scans for...")
+NEGATIVE_WORDS = ("stop", "cancel", "pause", "abort", "delete", "remov", "kill", "pare", "parar", "pausar",
+                  "interromp", "exclu", "apag", "list", "status", "result", "finding", "achado")
+RESULT_WORDS = ("result", "finding", "vulnerab", "achado", "analy", "analis", "encontrou", "issues")
+CSV_WORDS = ("csv", "planilha", "spreadsheet")
+# Pedidos sobre os relatórios: listar, analisar, resumir, buscar, comparar...
+CSV_ACTION_WORDS = ("list", "mostr", "show", "analis", "analy", "avali", "verific", "resum", "summar", "insight",
+                    "procur", "busc", "busq", "search", "find", "compar", "leia", "read", "gera", "quais", "which", "tem",
+                    "existe", "afet", "affect")
+# Perguntas gerais ("o que é", "como mitigar"...): ficam com o classificador ou o LLM
+QUESTION_WORDS = ("what is", "what are", "what's", "what does", "o que e", "o que sao", "o que significa", "how",
+                  "como", "mitig", "explain", "expli", "difference", "diferenca", "why", "por que", "mean",
+                  "significa")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas e sem acentos ("Análise" -> "analise")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def extract_features(text: str) -> List[str]:
+    """
+    Palavras, bigramas e marcadores das entidades da mensagem
+
+    Arquivos .csv, IPs, hostnames, CVEs, OIDs e textos entre aspas viram
+    marcadores (<csv>, <ip>, <host>, <cve>, <oid>, <quoted>), para que o
+    classificador aprenda a forma do pedido e não os valores.
+    """
+    text = CSV_FILE_PATTERN.sub(" <csv> ", text)
+    text = QUOTED_PATTERN.sub(" <quoted> ", text)
+    text = OID_PATTERN.sub(" <oid> ", text)
+    text = CVE_PATTERN.sub(" <cve> ", text)
+    text = IP_PATTERN.sub(" <ip> ", text)
+    text = HOST_PATTERN.sub(" <host> ", text)
+    words = WORD_PATTERN.findall(normalize(text))
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def match_rules(text: str) -> Optional[str]:
+    """
+    Rota decidida pelas regras, ou None quando nenhuma (ou mais de uma) casa
+
+    - TaskCreator: um IP ou hostname fora das aspas e a mensagem aberta por um
+      pedido de criação ("scan 10.0.0.5", "create task for...", "quero rodar um
+      scan em..."), sem forma de pergunta nem verbos como stop/cancel/list
+    - ResultAnalyzer: "for task/task named/task called" seguido de nome entre
+      aspas e uma palavra de resultado, sem pedido de criação
+    - CSVAnalyzer: arquivo .csv citado, ou "csv"/"planilha", CVE ou OID junto
+      de um pedido (listar, analisar, buscar...) que não tenha forma de
+      pergunta geral ("o que é a CVE-...", "como mitigar...")
+    """
+    # Nomes de tasks e de arquivos não contam como alvo nem como verbo
+    bare = QUOTED_PATTERN.sub(" ", CSV_FILE_PATTERN.sub(" ", text))
+    words = normalize(bare)
+    has_target = bool(IP_PATTERN.search(bare) or HOST_PATTERN.search(bare))
+    is_question = "?" in text or any(re.search(rf"\b{word}", words) for word in QUESTION_WORDS)
+    wants_create = bool(CREATE_PATTERN.search(words)
+                        or (GENERIC_CREATE_PATTERN.search(words) and SCAN_NOUN_PATTERN.search(words))) \
+        and not is_question and not any(re.search(rf"\b{word}", words) for word in NEGATIVE_WORDS)
+
+    matched = set()
+    if has_target and wants_create:
+        matched.add("TaskCreator")
+    if RESULT_TASK_PATTERN.search(text) and any(word in words for word in RESULT_WORDS) \
+            and not (has_target and wants_create):
+        matched.add("ResultAnalyzer")
+    mentions_reports = any(re.search(rf"\b{word}\b", words) for word in CSV_WORDS) \
+        or CVE_PATTERN.search(text) or OID_PATTERN.search(text)
+    wants_reports = any(re.search(rf"\b{word}", words) for word in CSV_ACTION_WORDS) \
+        and not any(re.search(rf"\b{word}", words) for word in QUESTION_WORDS)
+    if CSV_FILE_PATTERN.search(text) or (mentions_reports and wants_reports):
+        matched.add("CSVAnalyzer")
+    return matched.pop() if len(matched) == 1 else None
+
+
+def load_labeled_queries(path: Path = QUERIES_PATH) -> List[Dict]:
+    """Consultas rotuladas ({"text", "label"}), uma por linha"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class NaiveBayesIntentModel:
+    """
+    Naive Bayes multinomial com suavização de Laplace, em Python puro
+
+    O Naive Bayes supõe features independentes e, com bigramas, conta a mesma
+    evidência várias vezes: as probabilidades saem perto de 0 ou 1 mesmo em
+    mensagens ambíguas. A `temperature` divide os log-scores antes da
+    normalização, para que o limiar de confiança separe de fato os casos
+    duvidosos.
+    """
+
+    def __init__(self, alpha: float = 0.5, temperature: float = 3.0):
+        self.alpha = alpha
+        self.temperature = temperature
+        self.labels: List[str] = []
+        self.log_prior: Dict[str, float] = {}
+        self.log_likelihood: Dict[str, Dict[str, float]] = {}
+        self.log_unknown: Dict[str, float] = {}
+        self._vocabulary: set = set()
+
+    def fit(self, texts: List[str], labels: List[str]) -> "NaiveBayesIntentModel":
+        counts: Dict[str, Counter] = {}
+        documents = Counter(labels)
+        for text, label in zip(texts, labels):
+            counts.setdefault(label, Counter()).update(extract_features(text))
+        vocabulary = set().union(*counts.values())
+
+        self.labels = sorted(counts)
+        for label in self.labels:
+            total = sum(counts[label].values()) + self.alpha * (len(vocabulary) + 1)
+            self.log_prior[label] = math.log(documents[label] / len(labels))
+            self.log_likelihood[label] = {feature: math.log((count + self.alpha) / total)
+                                          for feature, count in counts[label].items()}
+            self.log_unknown[label] = math.log(self.alpha / total)
+        self._vocabulary = vocabulary
+        return self
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Probabilidade de cada rótulo (features fora do vocabulário são ignoradas)"""
+        features = [feature for feature in extract_features(text) if feature in self._vocabulary]
+        scores = {}
+        for label in self.labels:
+            likelihood, unknown = self.log_likelihood[label], self.log_unknown[label]
+            score = self.log_prior[label] + sum(likelihood.get(feature, unknown) for feature in features)
+            scores[label] = score / self.temperature
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+
+class IntentRouter:
+    """Regras + classificador local; devolve a rota ou None (decide o LLM)"""
+
+    def __init__(self, queries: Optional[List[Dict]] = None, threshold: float = ROUTER_THRESHOLD):
+        """
+        Args:
+            queries: Consultas rotuladas para o treino (padrão: intent_queries.jsonl)
+            threshold: Probabilidade mínima para aceitar a rota do classificador
+        """
+        queries = load_labeled_queries() if queries is None else queries
+        self.threshold = threshold
+        self.model = NaiveBayesIntentModel().fit([query["text"] for query in queries],
+                                                 [query["label"] for query in queries])
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def classify(self, text: str) -> Tuple[Optional[str], float, str]:
+        """
+        Classifica uma mensagem
+
+        Returns:
+            (rota ou None, confiança, origem: "rule", "model" ou "llm")
+        """
+        route = match_rules(text)
+        if route is not None:
+            return route, 1.0, "rule"
+        probabilities = self.model.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        if label in ROUTES and probabilities[label] >= self.threshold:
+            return label, probabilities[label], "model"
+        return None, probabilities[label], "llm"
+
+    def route(self, text: str) -> Optional[str]:
+        """Rota local da mensagem, ou None quando a decisão deve ficar com o LLM"""
+        start = time.perf_counter()
+        route, confidence, source = self.classify(text)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats[source] += 1
+            self._stats["seconds"] += elapsed
+        logger.info("Roteamento local: %s (%s, confiança %.2f, %.0f µs)",
+                    route or "supervisor LLM", source, confidence, elapsed * 1e6)
+        return route
+
+    def stats(self) -> Dict:
+        """Decisões por origem ("rule", "model", "llm") e tempo médio de decisão em µs"""
+        with self._lock:
+            stats = dict(self._stats)
+        decisions = sum(stats.get(source, 0) for source in ("rule", "model", "llm"))
+        return {
+            "rule": stats.get("rule", 0),
+            "model": stats.get("model", 0),
+            "llm": stats.get("llm", 0),
+            "local_rate": round((decisions - stats.get("llm", 0)) / decisions, 4) if decisions else 0.0,
+            "mean_us": round(stats.get("seconds", 0.0) / decisions * 1e6, 1) if decisions else None,
+        }
+
+
+_intent_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """Instância compartilhada do roteador local (treinada na primeira chamada)"""
+    global _intent_router
+    with _router_lock:
+        if _intent_router is None:
+            _intent_router = IntentRouter()
+        return _intent_router
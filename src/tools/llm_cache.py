@@ -0,0 +1,162 @@
+"""
+Cache persistente de respostas do LLM
+
+As respostas são indexadas pelo hash das mensagens enviadas mais a identidade
+do modelo (provider + nome). Como os resumos são gerados com temperatura 0,
+reanalisar um relatório inalterado devolve a resposta gravada sem chamar o LLM.
+O banco SQLite é compartilhado pela CLI, pelo agente e pelo Streamlit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Sequence
+
+if TYPE_CHECKING:
+    # Só para as anotações: o Streamlit consulta o cache sem carregar o LangChain
+    from langchain_core.messages import BaseMessage
+
+
+DEFAULT_DB_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite")
+DEFAULT_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000"))
+
+
+class LLMResponseCache:
+    """Cache SQLite de respostas do LLM com expiração (TTL) e despejo LRU"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            db_path: Arquivo SQLite do cache
+            ttl_seconds: Tempo de vida de cada resposta; None ou 0 para não expirar
+            max_entries: Número máximo de respostas; as menos acessadas são removidas
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds or None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    provider TEXT,
+                    model TEXT,
+                    content TEXT NOT NULL,
+                    latency REAL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    @staticmethod
+    def make_key(messages: Sequence["BaseMessage"], provider: str, model: str) -> str:
+        """Hash das mensagens (tipo + conteúdo) e da identidade do modelo"""
+        payload = {
+            "provider": provider,
+            "model": model,
+            "messages": [[message.type, message.content] for message in messages],
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _increment(self, name: str, amount: float = 1):
+        self._conn.execute(
+            "INSERT INTO counters(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Retorna a resposta gravada, ou None se não existir ou tiver expirado"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content, latency, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self.misses += 1
+                self._increment("misses")
+                return None
+
+            self.hits += 1
+            self._increment("hits")
+            self._increment("saved_seconds", row[1] or 0)
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, content: str, provider: str = "", model: str = "", latency: float = 0.0):
+        """Grava uma resposta e aplica o limite de entradas"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, provider, model, content, latency, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, content, latency, now, now),
+            )
+            if self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> Dict:
+        """
+        Contadores de acertos/falhas
+
+        'hits'/'misses' são do processo atual; 'total_*' e 'saved_seconds' (tempo de
+        LLM economizado) acumulam entre todos os processos que usam o mesmo banco.
+        """
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total_hits = int(counters.get("hits", 0))
+        total_misses = int(counters.get("misses", 0))
+        lookups = total_hits + total_misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": total_hits,
+            "total_misses": total_misses,
+            "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0,
+            "saved_seconds": round(counters.get("saved_seconds", 0.0), 2),
+            "entries": entries,
+        }
+
+    def clear(self):
+        """Remove todas as respostas e zera os contadores"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM counters")
+            self.hits = 0
+            self.misses = 0
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Retorna o cache de respostas compartilhado do processo (configurado por LLM_CACHE_*)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
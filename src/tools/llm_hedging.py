@@ -0,0 +1,344 @@
+"""
+Requisições com hedging para reduzir a cauda de latência do LLM
+
+Um provider ocasionalmente lento domina o p99 do resumo. Com o hedging ativo
+(opt-in: LLM_HEDGE=1 ou `OpenVASCSVAnalyzer(hedge=True)`), a chamada principal
+é enviada normalmente e, se o primeiro token não chegar dentro do atraso de
+hedge, uma cópia da requisição vai para o alvo secundário (outro provider ou
+modelo). A primeira das duas a produzir texto vence e a outra é cancelada no
+próximo trecho que receber. Depois do primeiro token a geração tem ritmo estável,
+e o texto já exibido não pode trocar de origem.
+
+- Atraso de hedge: o percentil LLM_HEDGE_PERCENTILE (padrão: 95) dos tempos até
+  o primeiro token recentes do modelo principal; com menos de
+  LLM_HEDGE_MIN_SAMPLES amostras, LLM_HEDGE_DELAY segundos
+- Orçamento por chamada: o hedge só é disparado se o custo estimado da cópia
+  (prompt + resposta típica do alvo, pela tabela de preços da telemetria) não
+  passar de LLM_HEDGE_MAX_COST (USD)
+- Taxa máxima: no máximo LLM_HEDGE_MAX_RATE das chamadas recentes disparam hedge
+  (se o provider inteiro ficou lento, duplicar tudo só aumentaria a carga)
+- Alvo: LLM_HEDGE_TARGET ("provider:modelo"); por padrão, o outro provider se a
+  chave dele estiver configurada, senão o mesmo modelo
+
+Cada perna passa pela camada de resiliência (prazo, novas tentativas e limite de
+taxa). As métricas de hedging (chamadas, hedges disparados por resultado, hedges
+evitados pelo orçamento e segundos economizados) vão para a telemetria.
+"""
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import BaseMessage
+
+try:
+    from .llm_registry import resolve_model_name
+    from .llm_resilience import (FAILOVER_PROVIDERS, LLMCallError, LLMStreamInterrupted, call_llm,
+                                 remaining_time)
+    from .llm_streaming import stream_chat
+    from .llm_telemetry import get_llm_telemetry
+except ImportError:
+    # Execução direta (python src/tools/llm_hedging.py)
+    from llm_registry import resolve_model_name
+    from llm_resilience import FAILOVER_PROVIDERS, LLMCallError, LLMStreamInterrupted, call_llm, remaining_time
+    from llm_streaming import stream_chat
+    from llm_telemetry import get_llm_telemetry
+
+logger = logging.getLogger(__name__)
+
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "2.0"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_COST = float(os.getenv("LLM_HEDGE_MAX_COST", "0.02"))
+HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.1"))
+HEDGE_TARGET = os.getenv("LLM_HEDGE_TARGET", "")
+
+# Amostras de tempo até o primeiro token (e de tamanho de resposta) mantidas por modelo
+HEDGE_WINDOW = 200
+
+# Tamanho de resposta suposto para o custo da cópia enquanto não há amostras do modelo
+DEFAULT_OUTPUT_TOKENS = 800
+
+# Threads das pernas das chamadas; as perdedoras terminam em segundo plano
+HEDGE_WORKERS = int(os.getenv("LLM_HEDGE_WORKERS", "32"))
+
+
+class LLMHedgeCancelled(Exception):
+    """Levantada na perna perdedora para interromper o stream dela"""
+
+    # A telemetria registra a chamada como "cancelled", e não como erro
+    cancelled = True
+
+
+def parse_target(value: str) -> Optional[Tuple[str, Optional[str]]]:
+    """"provider:modelo" (ou só "provider") -> (provider, modelo)"""
+    if not value:
+        return None
+    provider, _, model = value.partition(":")
+    return provider.strip().lower(), model.strip() or None
+
+
+class HedgePolicy:
+    """Quando e para onde disparar o hedge, com o atraso aprendido dos tempos recentes"""
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, default_delay: float = HEDGE_DELAY,
+                 min_samples: int = HEDGE_MIN_SAMPLES, max_cost: float = HEDGE_MAX_COST,
+                 max_rate: float = HEDGE_MAX_RATE, target: Optional[Tuple[str, Optional[str]]] = None,
+                 window: int = HEDGE_WINDOW):
+        """
+        Args:
+            percentile: Percentil dos tempos até o primeiro token usado como atraso
+            default_delay: Atraso (segundos) enquanto não há `min_samples` amostras
+            min_samples: Amostras necessárias para usar o percentil
+            max_cost: Custo estimado máximo (USD) da cópia de uma chamada
+            max_rate: Fração máxima das chamadas recentes que podem disparar hedge
+            target: (provider, modelo) da cópia; None usa LLM_HEDGE_TARGET ou o padrão
+            window: Amostras e chamadas recentes consideradas
+        """
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.max_cost = max_cost
+        self.max_rate = max_rate
+        self.target = target or parse_target(HEDGE_TARGET)
+        self._ttft: Dict[Tuple[str, str], Deque[float]] = {}
+        self._output_tokens: Dict[Tuple[str, str], Deque[int]] = {}
+        # Instantes das chamadas e dos hedges recentes, para a taxa de hedge
+        self._calls: Deque[float] = deque(maxlen=window)
+        self._hedges: Deque[float] = deque(maxlen=window)
+        self._window = window
+        self._lock = threading.Lock()
+
+    def delay(self, provider: str, model: str) -> float:
+        """Segundos de espera pelo primeiro token antes de disparar o hedge"""
+        with self._lock:
+            samples = list(self._ttft.get((provider, model), ()))
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return float(np.percentile(samples, self.percentile))
+
+    def record_ttft(self, provider: str, model: str, seconds: float):
+        with self._lock:
+            self._ttft.setdefault((provider, model), deque(maxlen=self._window)).append(seconds)
+
+    def record_output(self, provider: str, model: str, tokens: int):
+        with self._lock:
+            self._output_tokens.setdefault((provider, model), deque(maxlen=self._window)).append(tokens)
+
+    def hedge_target(self, provider: str, model: str) -> Tuple[str, str]:
+        """(provider, modelo) que recebe a cópia da requisição"""
+        if self.target is not None:
+            target_provider, target_model = self.target
+        else:
+            fallback = FAILOVER_PROVIDERS.get(provider)
+            if fallback and os.getenv(f"{fallback.upper()}_API_KEY"):
+                target_provider, target_model = fallback, None
+            else:
+                target_provider, target_model = provider, model
+        return target_provider, resolve_model_name(target_provider, target_model)
+
+    def estimate_cost(self, provider: str, model: str, messages: Sequence[BaseMessage]) -> float:
+        """Custo estimado (USD) de enviar `messages` a `model`, com a resposta típica dele"""
+        try:
+            from .map_reduce_summary import get_token_counter
+        except ImportError:
+            from map_reduce_summary import get_token_counter
+        counter = get_token_counter(model)
+        prompt_tokens = sum(counter.count(str(message.content)) for message in messages)
+        with self._lock:
+            outputs = list(self._output_tokens.get((provider, model), ()))
+        output_tokens = sum(outputs) / len(outputs) if outputs else DEFAULT_OUTPUT_TOKENS
+        price_in, price_out = get_llm_telemetry().prices.get(model, (0.0, 0.0))
+        return (prompt_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+    def register_call(self):
+        with self._lock:
+            self._calls.append(time.monotonic())
+
+    def allow(self, provider: str, model: str, messages: Sequence[BaseMessage]) -> Optional[str]:
+        """
+        Reserva um hedge para a chamada atual
+
+        Returns:
+            None se o hedge pode ser disparado, ou o motivo ("cost" ou "rate") se não
+        """
+        if self.estimate_cost(provider, model, messages) > self.max_cost:
+            return "cost"
+        with self._lock:
+            oldest = self._calls[0] if self._calls else 0.0
+            fired = sum(1 for moment in self._hedges if moment >= oldest)
+            if (fired + 1) / max(1, len(self._calls)) > self.max_rate:
+                return "rate"
+            self._hedges.append(time.monotonic())
+        return None
+
+
+_policy: Optional[HedgePolicy] = None
+_policy_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """Política de hedging compartilhada pelo processo (os tempos aprendidos valem para todas as chamadas)"""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = HedgePolicy()
+        return _policy
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _policy_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        return _executor
+
+
+def hedged_stream_chat(messages: Sequence[BaseMessage], on_token: Optional[Callable[[str], None]] = None,
+                       label: str = "llm", operation: Optional[str] = None, provider: str = "openai",
+                       model_name: Optional[str] = None, policy: Optional[HedgePolicy] = None,
+                       **model_kwargs) -> Tuple[Any, Dict]:
+    """
+    `stream_chat_resilient` com hedging
+
+    O texto da perna vencedora é repassado a `on_token` no thread de quem chamou
+    (o Streamlit só atualiza a página a partir do thread do script).
+
+    Args:
+        messages: Mensagens enviadas (as mesmas nas duas pernas)
+        on_token: Recebe os trechos da resposta vencedora
+        label: Identificação da chamada nos logs
+        operation: Nome da operação na telemetria (padrão: `label`)
+        provider: Provider da chamada principal
+        model_name: Modelo da chamada principal (None usa o padrão do provider)
+        policy: Política de hedging (padrão: a compartilhada)
+        **model_kwargs: Parâmetros do modelo, usados nas duas pernas
+
+    Returns:
+        (modelo que respondeu, resposta de `stream_chat`)
+    """
+    policy = policy or get_hedge_policy()
+    operation = operation or label
+    model_name = resolve_model_name(provider, model_name)
+    metrics = get_llm_telemetry().metrics
+    metrics.record_hedge(provider, model_name, operation, "call")
+    policy.register_call()
+
+    events: "queue.Queue[Tuple[str, str, Any]]" = queue.Queue()
+    lock = threading.Lock()
+    state: Dict[str, Any] = {"winner": None, "first": {}, "hedged_at": None}
+    start = time.perf_counter()
+
+    def run_leg(leg: str, leg_provider: str, leg_model: str):
+        emitted = False
+
+        def forward(text: str):
+            nonlocal emitted
+            elapsed = time.perf_counter() - start
+            with lock:
+                first_token = leg not in state["first"]
+                if first_token:
+                    state["first"][leg] = elapsed
+                if state["winner"] is None:
+                    state["winner"] = leg
+                winner = state["winner"]
+            if first_token:
+                # Tempo até o primeiro token contado desde o envio de cada perna
+                policy.record_ttft(leg_provider, leg_model, elapsed - (state["hedged_at"] if leg == "hedge" else 0.0))
+            if first_token and leg == "primary":
+                if winner == "hedge":
+                    # Só agora se sabe quanto a chamada principal teria demorado
+                    metrics.record_hedge(provider, model_name, operation, "saved",
+                                         elapsed - state["first"]["hedge"])
+            if winner != leg:
+                raise LLMHedgeCancelled(f"{label}: a outra requisição respondeu primeiro")
+            if on_token is not None:
+                emitted = True
+                events.put(("token", leg, text))
+
+        def attempt(llm):
+            if state["winner"] not in (None, leg):
+                # Não repete a perna que já perdeu (ex.: nova tentativa depois de um timeout)
+                raise LLMHedgeCancelled(f"{label}: a outra requisição respondeu primeiro")
+            try:
+                return llm, stream_chat(llm, messages, forward, label=f"{label} [{leg}]", operation=operation)
+            except Exception as e:
+                if emitted and not isinstance(e, (LLMCallError, LLMHedgeCancelled)):
+                    raise LLMStreamInterrupted(f"{label}: resposta interrompida ({type(e).__name__}: {e})") from e
+                raise
+
+        try:
+            result = call_llm(attempt, leg_provider, leg_model, operation, **model_kwargs)
+        except BaseException as e:
+            if leg == "primary" and state["winner"] == "hedge" and leg not in state["first"]:
+                # A principal falhou (ou estourou o prazo) depois de o hedge vencer
+                metrics.record_hedge(provider, model_name, operation, "saved",
+                                     time.perf_counter() - start - state["first"]["hedge"])
+            events.put(("error", leg, e))
+            return
+        events.put(("done", leg, result))
+
+    def submit(leg: str, leg_provider: str, leg_model: str):
+        # Cada perna roda numa cópia do contexto (prazo e nó do grafo)
+        _get_executor().submit(contextvars.copy_context().run, run_leg, leg, leg_provider, leg_model)
+
+    submit("primary", provider, model_name)
+    delay = policy.delay(provider, model_name)
+    hedge_provider, hedge_model = policy.hedge_target(provider, model_name)
+    targets = {"primary": (provider, model_name), "hedge": (hedge_provider, hedge_model)}
+    legs, errors = {"primary"}, {}
+
+    while True:
+        timeout = None
+        if state["hedged_at"] is None and not state["first"] and "hedge" not in errors:
+            timeout = max(0.0, start + delay - time.perf_counter())
+            remaining = remaining_time()
+            if remaining is not None and remaining <= timeout:
+                timeout = None
+        try:
+            kind, leg, payload = events.get(timeout=timeout)
+        except queue.Empty:
+            reason = policy.allow(hedge_provider, hedge_model, messages)
+            if reason is not None:
+                metrics.record_hedge(provider, model_name, operation, "skipped", detail=reason)
+                errors["hedge"] = reason
+                continue
+            logger.info("%s: sem primeiro token em %.2fs; hedge para %s/%s", label, delay, hedge_provider, hedge_model)
+            state["hedged_at"] = time.perf_counter() - start
+            legs.add("hedge")
+            submit("hedge", hedge_provider, hedge_model)
+            continue
+
+        if kind == "token":
+            on_token(payload)
+            continue
+        if kind == "done":
+            with lock:
+                if state["winner"] is None:
+                    state["winner"] = leg
+            if state["winner"] != leg:
+                continue
+            llm, response = payload
+            if "hedge" in legs:
+                metrics.record_hedge(provider, model_name, operation, "fired",
+                                     detail="won" if leg == "hedge" else "lost")
+            usage = response["usage"] or {}
+            if usage.get("output_tokens"):
+                policy.record_output(*targets[leg], int(usage["output_tokens"]))
+            return llm, response
+
+        # kind == "error"
+        errors[leg] = payload
+        if state["winner"] == leg or legs <= set(errors):
+            if "hedge" in legs:
+                metrics.record_hedge(provider, model_name, operation, "fired", detail="failed")
+            error = payload if state["winner"] == leg else errors["primary"]
+            raise error
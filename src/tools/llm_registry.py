@@ -0,0 +1,202 @@
+"""
+Registro de clientes LLM compartilhados pelo processo
+
+Construir um ChatOpenAI/ChatGroq custa a criação do cliente e uma conexão TLS
+nova a cada chamada. Aqui os modelos de chat são criados uma única vez por
+(provider, modelo, parâmetros) e reutilizados, cada um com um pool de conexões
+HTTP persistente e limites configuráveis:
+
+- LLM_MAX_CONNECTIONS: conexões simultâneas por cliente (padrão: 20)
+- LLM_MAX_KEEPALIVE: conexões ociosas mantidas abertas (padrão: 10)
+- LLM_KEEPALIVE_EXPIRY: segundos até fechar uma conexão ociosa (padrão: 30)
+
+Cada modelo recebe o callback de telemetria (ver `llm_telemetry`) e o pool HTTP
+avisa a telemetria a cada requisição, para contar as tentativas repetidas. O pool
+também limita o tempo de cada requisição ao prazo da chamada (ver
+`llm_resilience.apply_deadline`), e o cliente não repete requisições por conta
+própria (LLM_CLIENT_MAX_RETRIES, padrão 0): as novas tentativas, com backoff e
+failover, ficam com `llm_resilience`.
+
+O cliente síncrono é um só por modelo. O pool assíncrono fica preso ao event
+loop em que abriu as conexões, então o cliente assíncrono mantém um pool por
+loop (`LoopBoundTransport`): o mesmo modelo funciona em vários `asyncio.run`
+seguidos e no loop da API.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+try:
+    from .llm_resilience import aapply_deadline, apply_deadline
+    from .llm_telemetry import get_llm_telemetry
+except ImportError:
+    # Execução direta (python src/tools/llm_registry.py)
+    from llm_resilience import aapply_deadline, apply_deadline
+    from llm_telemetry import get_llm_telemetry
+
+DEFAULT_MODELS = {
+    "openai": ("OPENAI_MODEL_ID", "gpt-4o-mini"),
+    "groq": ("GROQ_MODEL_ID", "llama-3.3-70b-versatile"),
+}
+
+# Tentativas extras feitas pelo próprio cliente OpenAI/Groq (as da camada de resiliência são à parte)
+CLIENT_MAX_RETRIES = int(os.getenv("LLM_CLIENT_MAX_RETRIES", "0"))
+
+_chat_models: Dict[Tuple, object] = {}
+_lock = threading.Lock()
+
+
+def chat_model_class(provider: str):
+    """
+    Classe do modelo de chat do provider, importada só quando é usada
+
+    langchain_openai (com o SDK da OpenAI) leva quase um segundo para importar;
+    quem usa só a Groq não paga por ele, e vice-versa.
+    """
+    if provider == "openai":
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError:
+            raise ImportError("langchain-openai não está instalado")
+        return ChatOpenAI
+    try:
+        from langchain_groq import ChatGroq
+    except ImportError:
+        raise ImportError("langchain-groq não está instalado. Instale com: pip install langchain-groq")
+    return ChatGroq
+
+
+def http_limits() -> httpx.Limits:
+    """Limites do pool de conexões, lidos das variáveis de ambiente"""
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+    )
+
+
+class LoopBoundTransport(httpx.AsyncBaseTransport):
+    """Transporte assíncrono com um pool de conexões por event loop"""
+
+    def __init__(self):
+        self._transports: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                # O pool de um loop encerrado é descartado junto com ele
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=http_limits())
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        """Fecha o pool do loop atual (os dos outros loops não podem ser fechados daqui)"""
+        with self._lock:
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+def resolve_model_name(provider: str, model_name: Optional[str] = None) -> str:
+    """Nome do modelo informado ou o padrão do provider (OPENAI_MODEL_ID/GROQ_MODEL_ID)"""
+    provider = provider.lower()
+    if provider not in DEFAULT_MODELS:
+        raise ValueError(f"Provider não suportado: {provider}. Use 'openai' ou 'groq'")
+    env_var, default = DEFAULT_MODELS[provider]
+    return model_name or os.getenv(env_var, default)
+
+
+def _build_chat_model(provider: str, model_name: str, temperature: float, **kwargs):
+    telemetry = get_llm_telemetry()
+    kwargs.setdefault("max_retries", CLIENT_MAX_RETRIES)
+    clients = {
+        "http_client": httpx.Client(limits=http_limits(),
+                                    event_hooks={"request": [telemetry.on_http_request, apply_deadline]}),
+        "http_async_client": httpx.AsyncClient(transport=LoopBoundTransport(),
+                                               event_hooks={"request": [telemetry.aon_http_request,
+                                                                        aapply_deadline]}),
+        "callbacks": [telemetry],
+    }
+    chat_class = chat_model_class(provider)
+    if provider == "openai":
+        return chat_class(model=model_name, temperature=temperature, **clients, **kwargs)
+    return chat_class(model=model_name, temperature=temperature, api_key=os.getenv("GROQ_API_KEY"),
+                      **clients, **kwargs)
+
+
+def get_chat_model(provider: str = "openai", model_name: Optional[str] = None,
+                   temperature: float = 0, **kwargs):
+    """
+    Retorna o modelo de chat compartilhado para (provider, modelo, parâmetros)
+
+    Args:
+        provider: "openai" ou "groq"
+        model_name: Nome do modelo; None usa OPENAI_MODEL_ID/GROQ_MODEL_ID
+        temperature: Temperatura de amostragem
+        **kwargs: Demais parâmetros do construtor (ex.: max_tokens)
+    """
+    provider = provider.lower()
+    model_name = resolve_model_name(provider, model_name)
+    key = (provider, model_name, temperature, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+    with _lock:
+        if key not in _chat_models:
+            _chat_models[key] = _build_chat_model(provider, model_name, temperature, **kwargs)
+        return _chat_models[key]
+
+
+def describe_chat_model(chat_model) -> Tuple[str, Optional[str]]:
+    """(provider, modelo) de um modelo de chat, para refazer a chamada pela camada de resiliência"""
+    with _lock:
+        for key, registered in _chat_models.items():
+            if registered is chat_model:
+                return key[0], key[1]
+    provider = "groq" if type(chat_model).__module__.startswith("langchain_groq") else "openai"
+    return provider, getattr(chat_model, "model_name", None)
+
+
+def clear_registry():
+    """Descarta os clientes registrados (fecha os pools de conexão síncronos)"""
+    with _lock:
+        for chat_model in _chat_models.values():
+            http_client = getattr(chat_model, "http_client", None)
+            if http_client is not None:
+                http_client.close()
+        _chat_models.clear()
+
+
+if __name__ == "__main__":
+    # Demonstração: chamadas pelo cliente compartilhado reaproveitam a mesma conexão HTTP,
+    # enquanto um cliente novo (com pool próprio) por chamada abre uma conexão a cada vez
+    from langchain_core.messages import HumanMessage
+
+    try:
+        from .llm_stub import StubLLMServer
+    except ImportError:
+        from llm_stub import StubLLMServer
+
+    calls = 10
+    with StubLLMServer() as stub:
+        os.environ["OPENAI_BASE_URL"] = stub.url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+        for _ in range(calls):
+            get_chat_model("openai", "stub-model").invoke([HumanMessage(content="ping")])
+        shared_connections = stub.counters["connections"]
+
+        for _ in range(calls):
+            llm = chat_model_class("openai")(model="stub-model", temperature=0, http_client=httpx.Client(limits=http_limits()))
+            llm.invoke([HumanMessage(content="ping")])
+        fresh_connections = stub.counters["connections"] - shared_connections
+
+        print(f"🔁 Cliente compartilhado: {calls} chamadas em {shared_connections} conexão(ões)")
+        print(f"🆕 Cliente novo por chamada: {calls} chamadas em {fresh_connections} conexão(ões)")
@@ -0,0 +1,570 @@
+"""
+Camada de resiliência das chamadas ao LLM
+
+Toda chamada do supervisor, do resumo de CSV e da análise de resultados passa
+por `call_llm` (ou `stream_chat_resilient`/`acall_llm`), que acrescenta:
+
+- prazo total (deadline): um orçamento de tempo para o turno inteiro, definido
+  com `llm_deadline` e herdado pelas chamadas aninhadas (inclusive as das threads
+  do map-reduce, que copiam o contexto). Sem prazo definido, cada chamada recebe
+  LLM_DEADLINE_SECONDS. O cliente HTTP limita o tempo de cada requisição ao que
+  resta do prazo e a LLM_ATTEMPT_TIMEOUT (ver `apply_deadline`)
+- novas tentativas com backoff exponencial e jitter nos erros transitórios (429,
+  5xx, timeouts e conexões perdidas), respeitando o Retry-After do provider
+- limite de taxa por provider (token bucket compartilhado entre as threads)
+- circuit breaker por provider: depois de LLM_BREAKER_FAILURES falhas seguidas, o
+  provider é evitado por LLM_BREAKER_RESET segundos e as chamadas vão direto para
+  o outro provider (openai <-> groq), se ele tiver chave configurada
+
+As tentativas repetidas pelo próprio cliente OpenAI/Groq ficam desativadas (ver
+`llm_registry`), para que o backoff e o prazo sejam controlados só aqui.
+
+Variáveis de ambiente:
+- LLM_DEADLINE_SECONDS: prazo padrão de uma chamada/turno (padrão: 180)
+- LLM_ATTEMPT_TIMEOUT: tempo máximo de espera por resposta em cada requisição (padrão: 60)
+- LLM_MAX_ATTEMPTS: tentativas por provider (padrão: 3)
+- LLM_BACKOFF_BASE / LLM_BACKOFF_MAX: espera base e máxima do backoff, em segundos (0.5 / 8)
+- LLM_RATE_LIMIT / LLM_RATE_BURST: requisições por segundo e rajada por provider (0 = sem limite)
+- LLM_BREAKER_FAILURES / LLM_BREAKER_RESET: limiar e duração do circuit breaker (5 / 30)
+- LLM_FAILOVER: 0 desativa a troca de provider
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+from langchain_core.messages import BaseMessage
+
+try:
+    from .llm_streaming import stream_chat
+    from .llm_telemetry import llm_attempt
+except ImportError:
+    # Execução direta (python src/tools/llm_resilience.py)
+    from llm_streaming import stream_chat
+    from llm_telemetry import llm_attempt
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE = float(os.getenv("LLM_DEADLINE_SECONDS", "180"))
+ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "60"))
+MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0"))
+RATE_BURST = int(os.getenv("LLM_RATE_BURST", "0"))
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+FAILOVER = os.getenv("LLM_FAILOVER", "1") != "0"
+
+# Provider alternativo de cada provider
+FAILOVER_PROVIDERS = {"openai": "groq", "groq": "openai"}
+
+# Códigos HTTP que indicam falha transitória
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Exceções (pelo nome da classe, para valer para os SDKs da OpenAI e da Groq) de timeout e de conexão
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+# Instante (time.monotonic) em que o prazo do contexto atual termina
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("llm_deadline", default=None)
+
+
+class LLMCallError(RuntimeError):
+    """Falha definitiva de uma chamada ao LLM, depois das tentativas e do failover"""
+
+
+class LLMDeadlineExceeded(LLMCallError, TimeoutError):
+    """O prazo da chamada (ou do turno) terminou antes de uma resposta"""
+
+
+class LLMUnavailableError(LLMCallError):
+    """Nenhum provider respondeu: erros transitórios em todas as tentativas ou circuitos abertos"""
+
+
+class LLMStreamInterrupted(LLMCallError):
+    """A resposta caiu depois de parte dela já ter sido entregue (não é repetida, para não duplicar texto)"""
+
+
+# --- Prazo ---
+
+@contextmanager
+def llm_deadline(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Prazo total para as chamadas ao LLM feitas dentro do bloco
+
+    Um prazo interno nunca estende o externo: vale o que terminar primeiro.
+
+    Args:
+        seconds: Duração do prazo; None mantém o prazo atual
+    """
+    current = _deadline.get()
+    if seconds is None:
+        yield current
+        return
+    expiry = time.monotonic() + seconds
+    token = _deadline.set(expiry if current is None else min(current, expiry))
+    try:
+        yield _deadline.get()
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Segundos restantes do prazo atual (None quando não há prazo)"""
+    expiry = _deadline.get()
+    return None if expiry is None else expiry - time.monotonic()
+
+
+def _expired() -> bool:
+    remaining = remaining_time()
+    return remaining is not None and remaining <= 0
+
+
+def check_deadline(operation: str = "llm"):
+    """Levanta LLMDeadlineExceeded se o prazo atual já terminou"""
+    if _expired():
+        raise LLMDeadlineExceeded(f"Prazo esgotado para a chamada ao LLM ({operation})")
+
+
+def apply_deadline(request: httpx.Request):
+    """
+    Hook de requisição do httpx: limita os timeouts da requisição ao prazo restante
+
+    Nenhuma requisição espera mais que LLM_ATTEMPT_TIMEOUT por dados (conexão,
+    leitura, escrita ou pool), nem mais que o que resta do prazo do contexto.
+    """
+    limit = ATTEMPT_TIMEOUT
+    remaining = remaining_time()
+    if remaining is not None:
+        limit = min(limit, max(remaining, 0.001))
+    timeout = request.extensions.get("timeout") or {}
+    request.extensions["timeout"] = {
+        key: limit if timeout.get(key) is None else min(timeout[key], limit)
+        for key in ("connect", "read", "write", "pool")
+    }
+
+
+async def aapply_deadline(request: httpx.Request):
+    apply_deadline(request)
+
+
+# --- Classificação dos erros e backoff ---
+
+def is_retryable(error: BaseException) -> bool:
+    """True para falhas transitórias: 429/5xx, timeouts e conexões perdidas"""
+    if isinstance(error, LLMCallError):
+        return False
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Segundos pedidos pelo provider no cabeçalho Retry-After (ou retry-after-ms), se houver"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # Formato de data HTTP
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX,
+                  rng: Optional[random.Random] = None) -> float:
+    """Espera antes da tentativa `attempt + 1`: sorteada entre 0 e min(cap, base * 2^(attempt - 1))"""
+    return (rng or random).uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+# --- Limite de taxa e circuit breaker ---
+
+class TokenBucket:
+    """Limite de `rate` requisições por segundo, com rajadas de até `capacity`, seguro entre threads"""
+
+    def __init__(self, rate: float, capacity: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = max(1, capacity or int(rate) or 1)
+        self._clock = clock
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Consome uma ficha e devolve 0, ou devolve quanto falta esperar por ela"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Espera uma ficha; False se ela não sair dentro de `timeout` segundos"""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if end is not None and time.monotonic() + wait > end:
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, timeout: Optional[float] = None) -> bool:
+        """Versão assíncrona de `acquire` (espera sem bloquear o event loop)"""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if end is not None and time.monotonic() + wait > end:
+                return False
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de um provider
+
+    Fechado: as chamadas passam. Depois de `failure_threshold` falhas transitórias
+    seguidas, abre por `reset_timeout` segundos e recusa as chamadas. Passado esse
+    tempo, deixa uma chamada de teste passar (meio aberto): sucesso fecha o
+    circuito, falha abre de novo.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" ou "half_open" """
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """True se uma chamada pode ser feita agora (no estado meio aberto, só uma por vez)"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._probing = False
+
+
+# --- Chamadas ---
+
+class ResilientLLMCaller:
+    """Executa chamadas ao LLM com prazo, novas tentativas, limite de taxa e failover entre providers"""
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, rate_limit: float = RATE_LIMIT, rate_burst: int = RATE_BURST,
+                 breaker_failures: int = BREAKER_FAILURES, breaker_reset: float = BREAKER_RESET,
+                 failover: bool = FAILOVER, default_deadline: Optional[float] = DEFAULT_DEADLINE,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            max_attempts: Tentativas por provider
+            backoff_base: Espera base do backoff (dobra a cada tentativa)
+            backoff_max: Espera máxima entre tentativas
+            rate_limit: Requisições por segundo por provider (0 = sem limite)
+            rate_burst: Rajada máxima do limite de taxa (0 = rate_limit arredondado)
+            breaker_failures: Falhas seguidas que abrem o circuito de um provider
+            breaker_reset: Segundos com o circuito aberto antes de testar o provider de novo
+            failover: Tenta o outro provider quando o principal falha ou está com o circuito aberto
+            default_deadline: Prazo de cada chamada feita fora de um `llm_deadline`
+            seed: Semente do jitter do backoff
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.failover = failover
+        self.default_deadline = default_deadline
+        self._rng = random.Random(seed)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            return self._breakers[provider]
+
+    def bucket(self, provider: str) -> Optional[TokenBucket]:
+        if self.rate_limit <= 0:
+            return None
+        with self._lock:
+            if provider not in self._buckets:
+                self._buckets[provider] = TokenBucket(self.rate_limit, self.rate_burst)
+            return self._buckets[provider]
+
+    def status(self) -> Dict[str, str]:
+        """Estado do circuit breaker de cada provider já usado"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {provider: breaker.state for provider, breaker in breakers.items()}
+
+    def candidates(self, provider: str, model_name: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+        """(provider, modelo) na ordem em que são tentados: o pedido e, com failover, o alternativo"""
+        provider = provider.lower()
+        targets = [(provider, model_name)]
+        fallback = FAILOVER_PROVIDERS.get(provider)
+        if self.failover and fallback and os.getenv(f"{fallback.upper()}_API_KEY"):
+            # O modelo alternativo é o padrão do outro provider (OPENAI_MODEL_ID/GROQ_MODEL_ID)
+            targets.append((fallback, None))
+        return targets
+
+    def _chat_model(self, provider: str, model_name: Optional[str], model_kwargs: Dict):
+        try:
+            from .llm_registry import get_chat_model
+        except ImportError:
+            from llm_registry import get_chat_model
+        return get_chat_model(provider, model_name, **model_kwargs)
+
+    def _next_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Espera antes da próxima tentativa, ou None se não cabe no prazo ou nas tentativas"""
+        if attempt >= self.max_attempts:
+            return None
+        with self._lock:
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, self._rng)
+        delay = max(delay, retry_after(error) or 0.0)
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+    def _failed(self, provider: str, model: str, attempt: int, error: BaseException, operation: str) -> Optional[float]:
+        """Registra uma falha transitória e devolve a espera até a próxima tentativa (None = desiste do provider)"""
+        breaker = self.breaker(provider)
+        breaker.record_failure()
+        if breaker.state != "closed":
+            logger.warning("%s: circuito de %s aberto após falhas seguidas", operation, provider)
+            return None
+        delay = self._next_delay(attempt, error)
+        logger.warning("%s: %s/%s falhou na tentativa %d/%d (%s: %s)%s", operation, provider, model, attempt,
+                       self.max_attempts, type(error).__name__, str(error)[:200],
+                       f"; nova tentativa em {delay:.2f}s" if delay is not None else "")
+        return delay
+
+    def _give_up(self, operation: str, last_error: Optional[BaseException], skipped: List[str]):
+        if _expired():
+            raise LLMDeadlineExceeded(f"Prazo esgotado para a chamada ao LLM ({operation})") from last_error
+        if last_error is None:
+            raise LLMUnavailableError(f"Nenhum provider disponível para {operation}: circuito aberto "
+                                      f"({', '.join(skipped)})")
+        raise LLMUnavailableError(f"{operation}: o LLM não respondeu "
+                                  f"({type(last_error).__name__}: {last_error})") from last_error
+
+    def call(self, fn: Callable[[Any], Any], provider: str = "openai", model_name: Optional[str] = None,
+             operation: str = "llm", **model_kwargs) -> Any:
+        """
+        Executa `fn(modelo)` com novas tentativas, limite de taxa e failover
+
+        Args:
+            fn: Recebe o modelo de chat do `llm_registry` e faz a chamada (invoke, stream, chain...)
+            provider: Provider principal ("openai" ou "groq")
+            model_name: Modelo do provider principal (None usa o padrão)
+            operation: Nome da chamada nos logs
+            **model_kwargs: Parâmetros do modelo (temperature, max_tokens...), usados também no failover
+
+        Returns:
+            O retorno de `fn`
+
+        Raises:
+            LLMDeadlineExceeded: O prazo terminou antes de uma resposta
+            LLMUnavailableError: Todas as tentativas falharam ou os circuitos estão abertos
+            Os erros não transitórios de `fn` (ex.: 400, 401) são repassados sem nova tentativa
+        """
+        with llm_deadline(None if _deadline.get() is not None else self.default_deadline):
+            last_error, skipped = None, []
+            for target, model in self.candidates(provider, model_name):
+                if _expired():
+                    break
+                if not self.breaker(target).allow():
+                    skipped.append(target)
+                    continue
+                if last_error is not None or skipped:
+                    logger.warning("%s: usando o provider alternativo %s", operation, target)
+                try:
+                    llm = self._chat_model(target, model, model_kwargs)
+                except ImportError as e:
+                    last_error = e
+                    continue
+                label = getattr(llm, "model_name", model) or target
+                for attempt in range(1, self.max_attempts + 1):
+                    check_deadline(operation)
+                    bucket = self.bucket(target)
+                    if bucket is not None and not bucket.acquire(remaining_time()):
+                        raise LLMDeadlineExceeded(f"Prazo esgotado aguardando o limite de taxa de {target} ({operation})")
+                    token = llm_attempt.set(attempt)
+                    try:
+                        result = fn(llm)
+                    except Exception as e:
+                        if not is_retryable(e):
+                            raise
+                        last_error = e
+                        delay = self._failed(target, label, attempt, e, operation)
+                        if delay is None:
+                            break
+                        time.sleep(delay)
+                        continue
+                    finally:
+                        llm_attempt.reset(token)
+                    self.breaker(target).record_success()
+                    return result
+            self._give_up(operation, last_error, skipped)
+
+    async def acall(self, fn: Callable[[Any], Awaitable[Any]], provider: str = "openai",
+                    model_name: Optional[str] = None, operation: str = "llm", **model_kwargs) -> Any:
+        """Versão assíncrona de `call`: `fn(modelo)` devolve um awaitable (ex.: `modelo.ainvoke(...)`)"""
+        with llm_deadline(None if _deadline.get() is not None else self.default_deadline):
+            last_error, skipped = None, []
+            for target, model in self.candidates(provider, model_name):
+                if _expired():
+                    break
+                if not self.breaker(target).allow():
+                    skipped.append(target)
+                    continue
+                if last_error is not None or skipped:
+                    logger.warning("%s: usando o provider alternativo %s", operation, target)
+                try:
+                    llm = self._chat_model(target, model, model_kwargs)
+                except ImportError as e:
+                    last_error = e
+                    continue
+                label = getattr(llm, "model_name", model) or target
+                for attempt in range(1, self.max_attempts + 1):
+                    check_deadline(operation)
+                    bucket = self.bucket(target)
+                    if bucket is not None and not await bucket.aacquire(remaining_time()):
+                        raise LLMDeadlineExceeded(f"Prazo esgotado aguardando o limite de taxa de {target} ({operation})")
+                    token = llm_attempt.set(attempt)
+                    try:
+                        result = await fn(llm)
+                    except Exception as e:
+                        if not is_retryable(e):
+                            raise
+                        last_error = e
+                        delay = self._failed(target, label, attempt, e, operation)
+                        if delay is None:
+                            break
+                        await asyncio.sleep(delay)
+                        continue
+                    finally:
+                        llm_attempt.reset(token)
+                    self.breaker(target).record_success()
+                    return result
+            self._give_up(operation, last_error, skipped)
+
+
+_caller: Optional[ResilientLLMCaller] = None
+_caller_lock = threading.Lock()
+
+
+def get_llm_caller() -> ResilientLLMCaller:
+    """Camada de resiliência compartilhada pelo processo (limites de taxa e circuitos comuns a todas as threads)"""
+    global _caller
+    with _caller_lock:
+        if _caller is None:
+            _caller = ResilientLLMCaller()
+        return _caller
+
+
+def call_llm(fn: Callable[[Any], Any], provider: str = "openai", model_name: Optional[str] = None,
+             operation: str = "llm", **model_kwargs) -> Any:
+    """`ResilientLLMCaller.call` da camada compartilhada"""
+    return get_llm_caller().call(fn, provider, model_name, operation, **model_kwargs)
+
+
+async def acall_llm(fn: Callable[[Any], Awaitable[Any]], provider: str = "openai",
+                    model_name: Optional[str] = None, operation: str = "llm", **model_kwargs) -> Any:
+    """`ResilientLLMCaller.acall` da camada compartilhada"""
+    return await get_llm_caller().acall(fn, provider, model_name, operation, **model_kwargs)
+
+
+def stream_chat_resilient(messages: Sequence[BaseMessage], on_token: Optional[Callable[[str], None]] = None,
+                          label: str = "llm", operation: Optional[str] = None, provider: str = "openai",
+                          model_name: Optional[str] = None, **model_kwargs) -> Tuple[Any, Dict]:
+    """
+    `stream_chat` pela camada de resiliência
+
+    Falhas antes do primeiro trecho entregue a `on_token` são repetidas normalmente;
+    depois dele, viram LLMStreamInterrupted (repetir duplicaria o texto já exibido).
+    O prazo é conferido a cada trecho recebido.
+
+    Returns:
+        (modelo que respondeu, resposta de `stream_chat`)
+    """
+    operation = operation or label
+    emitted = False
+
+    def forward(text: str):
+        nonlocal emitted
+        check_deadline(operation)
+        if on_token is not None:
+            emitted = True
+            on_token(text)
+
+    def attempt(llm):
+        try:
+            return llm, stream_chat(llm, messages, forward, label=label, operation=operation)
+        except Exception as e:
+            if emitted and not isinstance(e, LLMCallError):
+                raise LLMStreamInterrupted(f"{label}: resposta interrompida ({type(e).__name__}: {e})") from e
+            raise
+
+    return call_llm(attempt, provider, model_name, operation, **model_kwargs)
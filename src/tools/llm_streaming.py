@@ -0,0 +1,94 @@
+"""
+Streaming de tokens do LLM
+
+`stream_chat` consome a resposta do modelo token a token, repassa cada trecho a
+um callback e mede o tempo até o primeiro token (TTFT). Dentro do grafo do
+LangGraph, `emit_text` publica texto no stream do grafo (stream_mode="custom"),
+que é o que a CLI usa para mostrar a resposta enquanto ela é gerada.
+"""
+import logging
+import sys
+import time
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_text(chunk) -> str:
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    # Alguns providers entregam o conteúdo como lista de blocos
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+
+
+def stream_chat(llm, messages: Sequence[BaseMessage], on_token: Optional[Callable[[str], None]] = None,
+                label: str = "llm", operation: Optional[str] = None) -> Dict:
+    """
+    Gera a resposta do modelo em streaming
+
+    Args:
+        llm: Modelo de chat do LangChain
+        messages: Mensagens enviadas
+        on_token: Chamado com cada trecho de texto assim que ele chega
+        label: Identificação da chamada nos logs
+        operation: Nome da operação na telemetria (padrão: `label`)
+
+    Returns:
+        Dict com 'content' (texto completo), 'ttft' (segundos até o primeiro token,
+        None se a resposta veio vazia), 'elapsed' (segundos totais) e 'usage'
+        (contagem de tokens informada pelo provider, se houver)
+    """
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    usage = None
+
+    for chunk in llm.stream(messages, config={"metadata": {"llm_operation": operation or label}}):
+        if getattr(chunk, "usage_metadata", None):
+            usage = dict(chunk.usage_metadata)
+        text = _chunk_text(chunk)
+        if not text:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start
+            logger.info("%s: primeiro token em %.2fs", label, ttft)
+        parts.append(text)
+        if on_token is not None:
+            on_token(text)
+
+    elapsed = time.perf_counter() - start
+    logger.info("%s: resposta completa em %.2fs (%d trechos)", label, elapsed, len(parts))
+    return {"content": "".join(parts), "ttft": ttft, "elapsed": elapsed, "usage": usage}
+
+
+def emit_text(text: str):
+    """Publica texto no stream do grafo (stream_mode="custom"); fora do grafo não faz nada"""
+    # Se o LangGraph nem foi importado (Streamlit, scripts), não há grafo em execução
+    config = sys.modules.get("langgraph.config")
+    if config is None:
+        return
+    try:
+        writer = config.get_stream_writer()
+    except RuntimeError:
+        return
+    writer(text)
+
+
+def iter_graph_text(graph, inputs: Dict, config: Optional[Dict] = None) -> Iterator[Tuple[str, object]]:
+    """
+    Executa o grafo e entrega o texto publicado pelos nós conforme é gerado
+
+    Yields:
+        ("text", trecho) para cada trecho publicado com `emit_text` e, ao final,
+        ("state", estado_final)
+    """
+    final_state = None
+    for mode, payload in graph.stream(inputs, config, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield "text", payload
+        else:
+            final_state = payload
+    yield "state", final_state
@@ -0,0 +1,329 @@
+"""
+Servidor HTTP local que imita a API de chat completions (OpenAI/Groq)
+
+Serve para exercitar o agente sem chaves de API nem rede: responde a qualquer
+rota terminada em /chat/completions com um texto configurável, após uma latência
+configurável (em streaming SSE quando o cliente pede "stream": true), e conta
+requisições e conexões TCP (para verificar reaproveitamento de conexões).
+Latência, texto e ritmo dos tokens podem ser definidos por modelo (`profiles`),
+com latências sorteadas de uma distribuição (`latency_distribution`), para
+simular provedores diferentes num mesmo servidor. Falhas também podem ser
+injetadas (`faults`, ver `fault_injector` e `fault_sequence`): respostas 429/5xx,
+conexões derrubadas, respostas que nunca chegam e streams interrompidos.
+Aponte os clientes com OPENAI_BASE_URL=<url> ou GROQ_BASE_URL=<root_url>.
+"""
+import json
+import math
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Union
+
+
+def latency_distribution(kind: str, seed: Optional[int] = None, **params) -> Callable[[List[Dict]], float]:
+    """
+    Latência sorteada a cada requisição, para usar como `latency` do stub
+
+    Args:
+        kind: "fixed" (value), "uniform" (low, high), "lognormal" (median, sigma) ou
+            "spiky" (base, spike, probability: a latência base e, com a probabilidade
+            dada, um pico)
+        seed: Semente do sorteio (None sorteia diferente a cada execução)
+        **params: Parâmetros da distribuição, em segundos
+
+    Returns:
+        Função das mensagens recebidas que devolve os segundos de espera
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    samplers = {
+        "fixed": lambda: params["value"],
+        "uniform": lambda: rng.uniform(params["low"], params["high"]),
+        "lognormal": lambda: rng.lognormvariate(math.log(params["median"]), params.get("sigma", 0.5)),
+        "spiky": lambda: params["base"] + (params["spike"] if rng.random() < params["probability"] else 0.0),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Distribuição desconhecida: {kind}. Use uma de: {', '.join(samplers)}")
+    sampler = samplers[kind]
+
+    def latency(messages: List[Dict]) -> float:
+        with lock:
+            return sampler()
+
+    return latency
+
+
+# Falhas que o stub sabe simular: códigos HTTP de erro e os tipos abaixo
+FAULT_KINDS = ("stall", "disconnect", "truncate")
+
+
+def fault_injector(rates: Dict[str, float], seed: Optional[int] = None) -> Callable[[List[Dict]], Optional[str]]:
+    """
+    Falha sorteada a cada requisição, para usar como `faults` do stub
+
+    Args:
+        rates: {falha: probabilidade}. A falha é um código HTTP ("429", "500", "503"...),
+            "stall" (não responde por `stall_seconds`), "disconnect" (fecha a conexão sem
+            resposta) ou "truncate" (interrompe o stream no meio)
+        seed: Semente do sorteio
+
+    Returns:
+        Função das mensagens recebidas que devolve a falha ou None
+    """
+    for fault in rates:
+        if fault not in FAULT_KINDS and not fault.isdigit():
+            raise ValueError(f"Falha desconhecida: {fault}. Use um código HTTP ou um de: {', '.join(FAULT_KINDS)}")
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def fault(messages: List[Dict]) -> Optional[str]:
+        with lock:
+            draw = rng.random()
+        for kind, probability in rates.items():
+            if draw < probability:
+                return kind
+            draw -= probability
+        return None
+
+    return fault
+
+
+def fault_sequence(faults: List[Optional[str]]) -> Callable[[List[Dict]], Optional[str]]:
+    """Falhas em ordem fixa, uma por requisição (None = resposta normal); depois, sem falhas"""
+    pending = list(faults)
+    lock = threading.Lock()
+
+    def fault(messages: List[Dict]) -> Optional[str]:
+        with lock:
+            return pending.pop(0) if pending else None
+
+    return fault
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 mantém a conexão aberta entre requisições (keep-alive)
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.stub._count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Rota não suportada: {self.path}"}})
+            return
+
+        stub._count("requests")
+        messages = request.get("messages", [])
+        profile = stub.profile(request.get("model"))
+        fault = profile["faults"](messages) if profile["faults"] else None
+        if fault is not None:
+            stub._count("faults")
+        if fault and fault.isdigit():
+            self._send_error(int(fault), profile["retry_after"])
+            return
+        if fault == "disconnect":
+            self._disconnect()
+            return
+        if fault == "stall":
+            # Espera interrompida quando o servidor é parado
+            stub._stopping.wait(profile["stall_seconds"])
+            self._disconnect()
+            return
+
+        latency, responder = profile["latency"], profile["responder"]
+        time.sleep(latency(messages) if callable(latency) else latency)
+        content = responder(messages) if callable(responder) else responder
+
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        completion_tokens = len(content.split())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if request.get("stream"):
+            self._send_stream(request, content, usage, profile["token_interval"], truncate=fault == "truncate")
+            return
+        if fault == "truncate":
+            self._disconnect()
+            return
+
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _send_error(self, status: int, retry_after: Optional[float]):
+        """Erro no formato da API da OpenAI, com Retry-After nas respostas 429/503"""
+        body = json.dumps({"error": {"message": f"Falha injetada pelo stub ({status})",
+                                     "type": "stub_fault", "code": status}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status in (429, 503) and retry_after is not None:
+            self.send_header("Retry-After", f"{retry_after:g}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _disconnect(self):
+        """Fecha a conexão sem resposta (o cliente vê a conexão cair)"""
+        self.close_connection = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _send_stream(self, request: Dict, content: str, usage: Dict, token_interval: float,
+                     truncate: bool = False):
+        """Resposta em Server-Sent Events, uma palavra por evento (chunked encoding)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+        def event(delta: Dict, finish_reason=None, extra: Optional[Dict] = None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            payload.update(extra or {})
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n")
+
+        event({"role": "assistant", "content": ""})
+        words = content.split(" ")
+        if truncate:
+            # Metade das palavras e a conexão cai, sem o evento final
+            for i, word in enumerate(words[:max(1, len(words) // 2)]):
+                event({"content": word if i == 0 else " " + word})
+            self._disconnect()
+            return
+        for i, word in enumerate(words):
+            if i and token_interval:
+                time.sleep(token_interval)
+            event({"content": word if i == 0 else " " + word})
+        include_usage = (request.get("stream_options") or {}).get("include_usage")
+        event({}, "stop", {"usage": usage} if include_usage else None)
+        self._write_chunk("data: [DONE]\n\n")
+        self._write_chunk("")
+
+    def _write_chunk(self, data: str):
+        body = data.encode("utf-8")
+        self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+        self.wfile.flush()
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clientes que desistem da resposta (timeout, hedge cancelado) não são erro do stub
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubLLMServer:
+    """Servidor de chat completions falso, executado em uma thread em segundo plano"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency: Union[float, Callable[[List[Dict]], float]] = 0.0,
+                 responder: Union[str, Callable[[List[Dict]], str]] = "Resposta do servidor stub.",
+                 token_interval: float = 0.0, profiles: Optional[Dict[str, Dict]] = None,
+                 faults: Optional[Callable[[List[Dict]], Optional[str]]] = None,
+                 retry_after: Optional[float] = 0.5, stall_seconds: float = 30.0):
+        """
+        Args:
+            host: Endereço de escuta
+            port: Porta (0 escolhe uma livre)
+            latency: Segundos de espera por requisição, ou função das mensagens recebidas
+            responder: Texto da resposta, ou função das mensagens recebidas
+            token_interval: Segundos entre palavras nas respostas em streaming
+            profiles: {modelo: {"latency", "responder", "token_interval", "faults",
+                "retry_after", "stall_seconds"}} para o campo "model" da requisição; o
+                que faltar usa os valores do servidor
+            faults: Função das mensagens que devolve a falha a simular, ou None (ver
+                `fault_injector` e `fault_sequence`)
+            retry_after: Segundos do cabeçalho Retry-After nas respostas 429/503 (None omite)
+            stall_seconds: Quanto uma requisição com a falha "stall" fica sem resposta
+        """
+        self.latency = latency
+        self.responder = responder
+        self.token_interval = token_interval
+        self.profiles = profiles or {}
+        self.faults = faults
+        self.retry_after = retry_after
+        self.stall_seconds = stall_seconds
+        self.counters = {"connections": 0, "requests": 0, "faults": 0}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._server = _StubHTTPServer((host, port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    def profile(self, model: Optional[str]) -> Dict:
+        """Latência, resposta, intervalo entre tokens e falhas usados para o modelo pedido"""
+        defaults = {"latency": self.latency, "responder": self.responder, "token_interval": self.token_interval,
+                    "faults": self.faults, "retry_after": self.retry_after, "stall_seconds": self.stall_seconds}
+        return {**defaults, **self.profiles.get(model, {})}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        """URL base no formato da OpenAI (termina em /v1)"""
+        return f"{self.root_url}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
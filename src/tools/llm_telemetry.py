@@ -0,0 +1,437 @@
+"""
+Telemetria das chamadas ao LLM
+
+Todo modelo criado por `llm_registry.get_chat_model` recebe o callback
+`LLMTelemetryHandler`, então as chamadas do analisador de CSV, do analisador de
+resultados e do roteamento do supervisor são medidas no mesmo lugar. Para cada
+chamada são registrados:
+
+- provider, modelo, nó do grafo (metadado "langgraph_node") e operação
+  ("llm_operation", ex.: "resumo/map", "roteamento")
+- latência total e tempo até o primeiro token (chamadas em streaming)
+- tokens de prompt e de resposta (os informados pelo provider ou, na falta
+  deles, estimados pelo tokenizador) e o custo estimado (MODEL_PRICES)
+- tentativas além da primeira: as repetidas pelo cliente OpenAI/Groq e as da
+  camada de resiliência (`llm_resilience`, que marca a tentativa em `llm_attempt`)
+
+Os dados saem de três formas:
+
+- métricas no formato de texto do Prometheus, em `render_metrics()`, num endpoint
+  HTTP /metrics (LLM_METRICS_PORT) e/ou num arquivo regravado a cada chamada
+  (LLM_METRICS_FILE, para o textfile collector do node_exporter)
+- um log JSON por chamada, no logger deste módulo e, com LLM_TELEMETRY_LOG, num
+  arquivo JSON Lines
+- `summary()`, com chamadas, tempo e custo agregados por nó
+
+As requisições duplicadas do hedging (ver `llm_hedging`) também entram aqui: as
+chamadas canceladas aparecem com status "cancelled" e `record_hedge` alimenta a
+taxa de hedge e o tempo economizado.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Preço estimado em USD por 1 milhão de tokens (entrada, saída). Modelos fora da
+# tabela têm custo 0; LLM_PRICES_FILE aponta um JSON {modelo: [entrada, saída]}
+# com preços adicionais ou atualizados.
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "gemma2-9b-it": (0.20, 0.20),
+    "mixtral-8x7b-32768": (0.24, 0.24),
+}
+
+# Limites (segundos) dos histogramas de latência e de tempo até o primeiro token
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LABELS = ("provider", "model", "node", "operation")
+
+# Rótulos das métricas de hedging: provider e modelo da chamada principal
+HEDGE_LABELS = ("provider", "model", "operation")
+
+# Chamada ao LLM em andamento no contexto atual (para atribuir as tentativas HTTP)
+_current_run: contextvars.ContextVar[Optional[UUID]] = contextvars.ContextVar("llm_telemetry_run", default=None)
+
+# Número da tentativa em andamento, definido por quem repete a chamada (a partir da 2ª, conta como retry)
+llm_attempt: contextvars.ContextVar[int] = contextvars.ContextVar("llm_attempt", default=1)
+
+
+def load_prices() -> Dict[str, Tuple[float, float]]:
+    """MODEL_PRICES com os preços de LLM_PRICES_FILE, se houver"""
+    prices = dict(MODEL_PRICES)
+    path = os.getenv("LLM_PRICES_FILE")
+    if path:
+        try:
+            prices.update({model: tuple(price) for model, price in json.loads(Path(path).read_text()).items()})
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning("Não foi possível ler LLM_PRICES_FILE (%s): %s", path, e)
+    return prices
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class LLMMetrics:
+    """Contadores e histogramas das chamadas, no formato de texto do Prometheus"""
+
+    COUNTERS = {
+        "llm_requests_total": "Chamadas ao LLM, por resultado (ok/error)",
+        "llm_prompt_tokens_total": "Tokens de prompt enviados",
+        "llm_completion_tokens_total": "Tokens de resposta recebidos",
+        "llm_cost_usd_total": "Custo estimado em USD (MODEL_PRICES)",
+        "llm_retries_total": "Tentativas além da primeira (cliente HTTP e camada de resiliência)",
+        "llm_hedge_calls_total": "Chamadas com hedging ativo",
+        "llm_hedges_total": "Requisições duplicadas (hedge) disparadas, por resultado (won/lost/failed)",
+        "llm_hedge_skipped_total": "Hedges não disparados por limite de custo ou de taxa",
+        "llm_hedge_saved_seconds_total": "Segundos economizados pelos hedges vencedores (medidos no primeiro token da chamada principal)",
+    }
+    # Rótulos de cada contador (o padrão é LABELS)
+    COUNTER_LABELS = {
+        "llm_requests_total": LABELS + ("status",),
+        "llm_hedge_calls_total": HEDGE_LABELS,
+        "llm_hedges_total": HEDGE_LABELS + ("outcome",),
+        "llm_hedge_skipped_total": HEDGE_LABELS + ("reason",),
+        "llm_hedge_saved_seconds_total": HEDGE_LABELS,
+    }
+    HISTOGRAMS = {
+        "llm_request_duration_seconds": "Latência total da chamada",
+        "llm_time_to_first_token_seconds": "Tempo até o primeiro token (chamadas em streaming)",
+    }
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {name: {} for name in self.COUNTERS}
+        # {nome: {rótulos: [contagem por faixa..., soma, total]}}
+        self._histograms: Dict[str, Dict[Tuple, List[float]]] = {name: {} for name in self.HISTOGRAMS}
+
+    def _inc(self, name: str, labels: Tuple, value: float):
+        self._counters[name][labels] = self._counters[name].get(labels, 0.0) + value
+
+    def _observe(self, name: str, labels: Tuple, value: float):
+        series = self._histograms[name].setdefault(labels, [0.0] * (len(self.buckets) + 2))
+        for i, limit in enumerate(self.buckets):
+            if value <= limit:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def record(self, call: Dict):
+        """Acrescenta uma chamada (registro de `LLMTelemetryHandler`)"""
+        labels = tuple(call[label] for label in LABELS)
+        with self._lock:
+            self._inc("llm_requests_total", labels + (call["status"],), 1)
+            self._inc("llm_prompt_tokens_total", labels, call["prompt_tokens"])
+            self._inc("llm_completion_tokens_total", labels, call["completion_tokens"])
+            self._inc("llm_cost_usd_total", labels, call["cost_usd"])
+            self._inc("llm_retries_total", labels, call["retries"])
+            self._observe("llm_request_duration_seconds", labels, call["duration"])
+            if call["ttft"] is not None:
+                self._observe("llm_time_to_first_token_seconds", labels, call["ttft"])
+
+    def record_hedge(self, provider: str, model: str, operation: str, event: str, value: float = 1.0,
+                     detail: Optional[str] = None):
+        """
+        Acrescenta um evento de hedging
+
+        Args:
+            event: "call" (chamada com hedging), "fired" (hedge disparado; `detail` é o
+                resultado: won/lost/failed), "skipped" (`detail` é o motivo) ou "saved"
+                (`value` em segundos)
+        """
+        labels = (provider, model, operation)
+        names = {"call": "llm_hedge_calls_total", "fired": "llm_hedges_total",
+                 "skipped": "llm_hedge_skipped_total", "saved": "llm_hedge_saved_seconds_total"}
+        with self._lock:
+            self._inc(names[event], labels + ((detail,) if detail is not None else ()), value)
+
+    def hedge_summary(self) -> Dict:
+        """Chamadas com hedging, hedges disparados, vencedores e evitados, taxa de hedge e segundos economizados"""
+        with self._lock:
+            calls = sum(self._counters["llm_hedge_calls_total"].values())
+            skipped = sum(self._counters["llm_hedge_skipped_total"].values())
+            fired = sum(self._counters["llm_hedges_total"].values())
+            won = sum(value for labels, value in self._counters["llm_hedges_total"].items() if labels[-1] == "won")
+            saved = sum(self._counters["llm_hedge_saved_seconds_total"].values())
+        return {
+            "calls": int(calls),
+            "hedges": int(fired),
+            "won": int(won),
+            "skipped": int(skipped),
+            "hedge_rate": round(fired / calls, 4) if calls else 0.0,
+            "saved_seconds": round(saved, 3),
+        }
+
+    def render(self) -> str:
+        """Métricas no formato de exposição de texto do Prometheus"""
+        lines = []
+        with self._lock:
+            for name, help_text in self.COUNTERS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                label_names = self.COUNTER_LABELS.get(name, LABELS)
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(dict(zip(label_names, labels)))} {value:g}")
+            for name, help_text in self.HISTOGRAMS.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, series in sorted(self._histograms[name].items()):
+                    base = dict(zip(LABELS, labels))
+                    for limit, count in zip(self.buckets, series):
+                        lines.append(f"{name}_bucket{_format_labels({**base, 'le': f'{limit:g}'})} {count:g}")
+                    lines.append(f"{name}_bucket{_format_labels({**base, 'le': '+Inf'})} {series[-1]:g}")
+                    lines.append(f"{name}_sum{_format_labels(base)} {series[-2]:.6f}")
+                    lines.append(f"{name}_count{_format_labels(base)} {series[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path: str):
+        """Grava as métricas de forma atômica (o coletor nunca lê um arquivo pela metade)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(path.suffix + ".tmp")
+        temporary.write_text(self.render(), encoding="utf-8")
+        os.replace(temporary, path)
+
+    def summary(self) -> List[Dict]:
+        """Chamadas, segundos, tokens e custo por nó, do nó mais lento (no total) para o mais rápido"""
+        nodes: Dict[str, Dict] = {}
+        with self._lock:
+            for labels, value in self._counters["llm_requests_total"].items():
+                node = nodes.setdefault(labels[2], {"node": labels[2], "calls": 0, "errors": 0, "seconds": 0.0,
+                                                    "tokens": 0, "cost_usd": 0.0})
+                node["calls"] += int(value)
+                node["errors"] += int(value) if labels[-1] == "error" else 0
+            for labels, series in self._histograms["llm_request_duration_seconds"].items():
+                nodes[labels[2]]["seconds"] += series[-2]
+            for name in ("llm_prompt_tokens_total", "llm_completion_tokens_total"):
+                for labels, value in self._counters[name].items():
+                    nodes[labels[2]]["tokens"] += int(value)
+            for labels, value in self._counters["llm_cost_usd_total"].items():
+                nodes[labels[2]]["cost_usd"] += value
+        for node in nodes.values():
+            node["seconds"] = round(node["seconds"], 3)
+            node["cost_usd"] = round(node["cost_usd"], 6)
+        return sorted(nodes.values(), key=lambda node: -node["seconds"])
+
+
+def _message_text(message) -> str:
+    content = getattr(message, "content", message)
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+class LLMTelemetryHandler(BaseCallbackHandler):
+    """
+    Callback do LangChain que mede cada chamada ao modelo de chat
+
+    Roda no mesmo contexto da chamada (run_inline), o que permite associar a ela as
+    requisições HTTP feitas pelo cliente (`on_http_request`), inclusive as repetidas.
+    """
+
+    run_inline = True
+    raise_error = False
+
+    def __init__(self, metrics: Optional[LLMMetrics] = None, metrics_file: Optional[str] = None,
+                 log_path: Optional[str] = None):
+        """
+        Args:
+            metrics: Onde acumular as métricas (padrão: um LLMMetrics novo)
+            metrics_file: Arquivo regravado com as métricas a cada chamada
+            log_path: Arquivo JSON Lines com um registro por chamada
+        """
+        self.metrics = metrics or LLMMetrics()
+        self.metrics_file = metrics_file
+        self.prices = load_prices()
+        self._calls: Dict[UUID, Dict] = {}
+        self._lock = threading.Lock()
+        self._log_file = None
+        if log_path:
+            Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+            self._log_file = open(log_path, "a", encoding="utf-8")
+
+    # --- Callbacks do LangChain ---
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, parent_run_id=None,
+                            tags=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        invocation = kwargs.get("invocation_params") or {}
+        call = {
+            "start": time.perf_counter(),
+            "provider": metadata.get("ls_provider") or invocation.get("_type", "unknown"),
+            "model": metadata.get("ls_model_name") or invocation.get("model") or invocation.get("model_name") or "unknown",
+            "node": metadata.get("langgraph_node") or "-",
+            "operation": metadata.get("llm_operation") or "-",
+            "prompt": [_message_text(message) for batch in messages for message in batch],
+            "attempts": 0,
+            "attempt": llm_attempt.get(),
+            "ttft": None,
+            "output": [],
+        }
+        with self._lock:
+            self._calls[run_id] = call
+        _current_run.set(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        call = self._calls.get(run_id)
+        if call is None:
+            return
+        if call["ttft"] is None and token:
+            call["ttft"] = time.perf_counter() - call["start"]
+        call["output"].append(token)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        self._finish(run_id, response=response)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish(run_id, error=error)
+
+    # --- Cliente HTTP ---
+
+    def on_http_request(self, request=None):
+        """Hook de requisição do httpx: conta as tentativas da chamada em andamento"""
+        run_id = _current_run.get()
+        call = self._calls.get(run_id) if run_id is not None else None
+        if call is not None:
+            call["attempts"] += 1
+
+    async def aon_http_request(self, request=None):
+        self.on_http_request(request)
+
+    # --- Registro ---
+
+    def _usage(self, response, call: Dict) -> Tuple[int, int, bool]:
+        """(tokens de prompt, tokens de resposta, estimado?)"""
+        if response is not None:
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if usage:
+                        return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0)), False
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            if token_usage:
+                return int(token_usage.get("prompt_tokens", 0)), int(token_usage.get("completion_tokens", 0)), False
+
+        try:
+            from .map_reduce_summary import get_token_counter
+        except ImportError:
+            from map_reduce_summary import get_token_counter
+        counter = get_token_counter(call["model"])
+        output = "".join(call["output"])
+        if not output and response is not None:
+            output = "".join(_message_text(getattr(g, "message", None) or g.text)
+                             for generations in response.generations for g in generations)
+        return sum(counter.count(text) for text in call["prompt"]), counter.count(output), True
+
+    def _finish(self, run_id: UUID, response=None, error: Optional[BaseException] = None):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        prompt_tokens, completion_tokens, estimated = self._usage(response, call)
+        price_in, price_out = self.prices.get(call["model"], (0.0, 0.0))
+        record = {
+            "event": "llm_call",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "provider": call["provider"],
+            "model": call["model"],
+            "node": call["node"],
+            "operation": call["operation"],
+            "status": "ok" if error is None else "cancelled" if getattr(error, "cancelled", False) else "error",
+            "duration": round(time.perf_counter() - call["start"], 4),
+            "ttft": round(call["ttft"], 4) if call["ttft"] is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_estimated": estimated,
+            "cost_usd": round((prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000, 8),
+            "retries": max(0, call["attempts"] - 1) + (1 if call["attempt"] > 1 else 0),
+            "attempt": call["attempt"],
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"[:300]
+
+        self.metrics.record(record)
+        line = json.dumps(record, ensure_ascii=False)
+        logger.info(line)
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.write(line + "\n")
+                self._log_file.flush()
+            if self.metrics_file:
+                try:
+                    self.metrics.write_file(self.metrics_file)
+                except OSError as e:
+                    logger.warning("Não foi possível gravar LLM_METRICS_FILE (%s): %s", self.metrics_file, e)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(metrics: LLMMetrics, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve as métricas em http://host:port/metrics, numa thread em segundo plano"""
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Métricas do LLM em http://%s:%d/metrics", host, server.server_address[1])
+    return server
+
+
+_telemetry: Optional[LLMTelemetryHandler] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_llm_telemetry() -> LLMTelemetryHandler:
+    """
+    Telemetria compartilhada pelo processo, configurada pelas variáveis de ambiente
+
+    - LLM_METRICS_PORT: sobe o endpoint /metrics nessa porta
+    - LLM_METRICS_FILE: arquivo de métricas regravado a cada chamada
+    - LLM_TELEMETRY_LOG: arquivo JSON Lines com um registro por chamada
+    """
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = LLMTelemetryHandler(metrics_file=os.getenv("LLM_METRICS_FILE"),
+                                             log_path=os.getenv("LLM_TELEMETRY_LOG"))
+            port = os.getenv("LLM_METRICS_PORT")
+            if port:
+                try:
+                    start_metrics_server(_telemetry.metrics, int(port))
+                except OSError as e:
+                    logger.warning("Não foi possível abrir o endpoint de métricas na porta %s: %s", port, e)
+        return _telemetry
+
+
+def render_metrics() -> str:
+    """Métricas do processo no formato de texto do Prometheus"""
+    return get_llm_telemetry().metrics.render()
@@ -0,0 +1,503 @@
+"""
+Resumo executivo em map-reduce para relatórios que não cabem no contexto do modelo
+
+Quando o prompt do resumo em uma chamada (os SUMMARY_MAX_GROUPS grupos de achados
+mais graves detalhados e os demais só pelo nome, ver `finding_groups`) passa do
+orçamento de tokens, os grupos são particionados por faixa de severidade ou por
+sub-rede, cada partição é dividida em partes que cabem no orçamento e resumida
+em paralelo (map), e os resumos parciais são combinados no formato do relatório
+executivo (reduce). O tamanho de cada prompt é contado com o tokenizador antes
+do envio e o tempo e os tokens de cada etapa são registrados.
+
+Configuração:
+- SUMMARY_MODE: "auto" (padrão), "single" ou "map_reduce"
+- SUMMARY_MAX_PROMPT_TOKENS: orçamento de tokens por prompt (padrão: a janela de
+  contexto do modelo menos SUMMARY_OUTPUT_RESERVE_TOKENS; 6000 para modelos fora
+  de MODEL_CONTEXT_TOKENS). Defina-o para contas com limite de tokens por minuto
+  menor que a janela
+- SUMMARY_OUTPUT_RESERVE_TOKENS: tokens reservados para a resposta (padrão: 4096)
+- SUMMARY_MAP_CONCURRENCY: resumos parciais simultâneos (padrão: 4)
+- SUMMARY_PARTITION: "severity" (padrão) ou "subnet"
+"""
+import asyncio
+import contextvars
+import functools
+import ipaddress
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    from .csv_analyzer import SUMMARY_SYSTEM_PROMPT
+    from .finding_groups import format_groups_for_prompt
+except ImportError:
+    # Execução direta (python src/tools/map_reduce_summary.py)
+    from csv_analyzer import SUMMARY_SYSTEM_PROMPT
+    from finding_groups import format_groups_for_prompt
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "auto")
+SUMMARY_MAX_PROMPT_TOKENS = int(os.getenv("SUMMARY_MAX_PROMPT_TOKENS", "0")) or None
+SUMMARY_OUTPUT_RESERVE_TOKENS = int(os.getenv("SUMMARY_OUTPUT_RESERVE_TOKENS", "4096"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+SUMMARY_PARTITION = os.getenv("SUMMARY_PARTITION", "severity")
+
+# Orçamento para modelos sem janela de contexto conhecida
+FALLBACK_PROMPT_TOKENS = 6000
+
+# Janela de contexto (tokens) por modelo; versões datadas ("gpt-4o-2024-08-06") usam o prefixo mais longo
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "llama3-70b-8192": 8192,
+    "llama3-8b-8192": 8192,
+    "openai/gpt-oss-120b": 131072,
+    "openai/gpt-oss-20b": 131072,
+    "mixtral-8x7b-32768": 32768,
+    "gemma2-9b-it": 8192,
+}
+
+# Ordem das partições por severidade (as demais vêm no final)
+SEVERITY_TIERS = ["Critical", "High", "Medium", "Low", "Log"]
+
+# Sobrecarga aproximada de cada mensagem no formato de chat (papel, separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+MAP_SYSTEM_PROMPT = """Você é um especialista em segurança cibernética analisando parte de um relatório de vulnerabilidades do OpenVAS.
+Resuma as vulnerabilidades abaixo em notas objetivas em português brasileiro, que serão combinadas com as de outras partes do relatório:
+- riscos mais graves e o que um atacante conseguiria explorar
+- hosts e serviços mais expostos
+- correções prioritárias
+
+No máximo 10 tópicos curtos, sem introdução nem conclusão."""
+
+
+class TokenCounter:
+    """
+    Conta tokens com o tokenizador do modelo (tiktoken)
+
+    Modelos sem tokenizador conhecido (ex.: Llama no Groq) usam o o200k_base como
+    aproximação. Se o tiktoken não estiver disponível (ou não conseguir carregar a
+    codificação, por exemplo sem acesso à rede), a contagem é estimada em 1 token
+    a cada 4 caracteres.
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.encoding = None
+        if tiktoken is None:
+            logger.warning("tiktoken não está instalado; tokens estimados pelo número de caracteres")
+            return
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model_name or "")
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning("Tokenizador indisponível (%s); tokens estimados pelo número de caracteres", type(e).__name__)
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def count_messages(self, messages: Sequence[BaseMessage]) -> int:
+        return sum(self.count(message.content) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_counter(model_name: Optional[str] = None) -> TokenCounter:
+    """Contador de tokens compartilhado por modelo"""
+    return TokenCounter(model_name)
+
+
+def context_window(model_name: Optional[str]) -> Optional[int]:
+    """Janela de contexto do modelo em tokens, ou None se ele não estiver em MODEL_CONTEXT_TOKENS"""
+    name = (model_name or "").lower()
+    if name in MODEL_CONTEXT_TOKENS:
+        return MODEL_CONTEXT_TOKENS[name]
+    prefixes = [prefix for prefix in MODEL_CONTEXT_TOKENS if name.startswith(prefix + "-")]
+    return MODEL_CONTEXT_TOKENS[max(prefixes, key=len)] if prefixes else None
+
+
+def prompt_token_budget(model_name: Optional[str]) -> int:
+    """
+    Orçamento de tokens de cada prompt do resumo
+
+    SUMMARY_MAX_PROMPT_TOKENS, se definido; senão a janela de contexto do modelo
+    menos a reserva para a resposta; senão FALLBACK_PROMPT_TOKENS.
+    """
+    if SUMMARY_MAX_PROMPT_TOKENS:
+        return SUMMARY_MAX_PROMPT_TOKENS
+    window = context_window(model_name)
+    if window is None:
+        return FALLBACK_PROMPT_TOKENS
+    # Janelas pequenas ficam com pelo menos metade para o prompt
+    return max(window // 2, window - SUMMARY_OUTPUT_RESERVE_TOKENS)
+
+
+def _subnet(host: str) -> str:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return "outros"
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+def partition_groups(groups: List[Dict], by: str = SUMMARY_PARTITION) -> Dict[str, List[Dict]]:
+    """
+    Divide os grupos de achados em partições
+
+    Args:
+        groups: Grupos de `compute_file_groups`, já ordenados por gravidade
+        by: "severity" (um grupo por faixa de severidade) ou "subnet" (/24 no IPv4,
+            /64 no IPv6). Por sub-rede, cada grupo entra em todas as sub-redes em que
+            aparece, só com os hosts daquela sub-rede e sem a contagem de ocorrências
+
+    Returns:
+        Dict partição -> grupos, na ordem em que devem ser resumidas
+    """
+    partitions: Dict[str, List[Dict]] = {}
+    if by == "severity":
+        for group in groups:
+            partitions.setdefault(group.get("severity") or "Sem severidade", []).append(group)
+        order = {tier: position for position, tier in enumerate(SEVERITY_TIERS)}
+        return dict(sorted(partitions.items(), key=lambda item: order.get(item[0], len(order))))
+
+    if by == "subnet":
+        for group in groups:
+            hosts_by_subnet: Dict[str, List[str]] = {}
+            for host in group["hosts"]:
+                hosts_by_subnet.setdefault(_subnet(host), []).append(host)
+            for subnet, hosts in hosts_by_subnet.items():
+                partitions.setdefault(subnet, []).append(
+                    dict(group, hosts=hosts, host_count=len(hosts), occurrences=None))
+        # Sub-redes com mais achados primeiro
+        return dict(sorted(partitions.items(), key=lambda item: -len(item[1])))
+
+    raise ValueError(f"Particionamento não suportado: {by}. Use 'severity' ou 'subnet'")
+
+
+def _pack(items: List[str], budget: int, counter: TokenCounter) -> List[List[str]]:
+    """Junta itens de texto em lotes de até `budget` tokens (um item maior que o orçamento fica sozinho)"""
+    batches, batch, used = [], [], 0
+    for item in items:
+        tokens = counter.count(item) + 1
+        if batch and used + tokens > budget:
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(item)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class _StageMeter:
+    """Acumula chamadas, tokens e tempo de uma etapa"""
+
+    def __init__(self, name: str, counter: TokenCounter):
+        self.name = name
+        self.counter = counter
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.start = time.perf_counter()
+
+    def record(self, messages: List[BaseMessage], content: str):
+        self.calls += 1
+        self.prompt_tokens += self.counter.count_messages(messages)
+        self.completion_tokens += self.counter.count(content)
+
+    def result(self) -> Dict:
+        stage = {
+            "stage": self.name,
+            "calls": self.calls,
+            "wall_time": round(time.perf_counter() - self.start, 3),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+        logger.info("resumo/%s: %d chamada(s) em %.2fs, %d tokens de prompt, %d de resposta",
+                    self.name, self.calls, stage["wall_time"], self.prompt_tokens, self.completion_tokens)
+        return stage
+
+
+def _overview(stats: Dict) -> str:
+    return (f"Total de Vulnerabilidades: {stats['total_vulnerabilities']}\n"
+            f"Hosts Únicos Afetados: {stats['unique_hosts']}\n"
+            f"Distribuição por Severidade: {stats.get('by_severity', {})}\n"
+            f"Hosts Mais Afetados: {stats.get('most_affected_hosts', {})}")
+
+
+# Limite de chamadas simultâneas ao LLM compartilhado por vários resumos (ver `llm_call_limit`)
+_call_limit: contextvars.ContextVar[Optional[threading.Semaphore]] = \
+    contextvars.ContextVar("summary_call_limit", default=None)
+
+
+@contextmanager
+def llm_call_limit(semaphore: Optional[threading.Semaphore]) -> Iterator[None]:
+    """
+    Limita as chamadas síncronas ao LLM dos resumos feitos dentro do bloco
+
+    Cada chamada (single, map, collapse ou reduce) ocupa uma vaga do semáforo
+    enquanto roda. Resumos em threads diferentes que recebem o mesmo semáforo
+    dividem o limite, então o paralelismo do map não se multiplica pelo número
+    de resumos simultâneos.
+
+    Args:
+        semaphore: Semáforo compartilhado; None remove o limite
+    """
+    token = _call_limit.set(semaphore)
+    try:
+        yield
+    finally:
+        _call_limit.reset(token)
+
+
+def _complete(analyzer, messages: List[BaseMessage], on_token: Optional[Callable[[str], None]], label: str) -> str:
+    limit = _call_limit.get()
+    if limit is None:
+        return analyzer._complete(messages, on_token, label)
+    with limit:
+        return analyzer._complete(messages, on_token, label)
+
+
+def _run_concurrently(analyzer, requests: List[List[BaseMessage]], label: str, meter: _StageMeter,
+                      concurrency: int) -> List[str]:
+    def complete(messages):
+        content = _complete(analyzer, messages, None, label)
+        return messages, content
+
+    # Cada tarefa roda numa cópia do contexto de quem chamou (nó do grafo, para a telemetria)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, complete, messages) for messages in requests]
+        results = [future.result() for future in futures]
+    for messages, content in results:
+        meter.record(messages, content)
+    return [content for _, content in results]
+
+
+async def _arun_concurrently(analyzer, requests: List[List[BaseMessage]], label: str, meter: _StageMeter,
+                             concurrency: int) -> List[str]:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def complete(messages):
+        async with semaphore:
+            return await analyzer._acomplete(messages, None, label)
+
+    contents = await asyncio.gather(*(complete(messages) for messages in requests))
+    for messages, content in zip(requests, contents):
+        meter.record(messages, content)
+    return list(contents)
+
+
+# As etapas do resumo são geradores: cada `yield` entrega (etapa, prompts, rótulo, final)
+# e recebe as respostas, na mesma ordem. Assim `summarize_report` e `asummarize_report`
+# montam exatamente os mesmos prompts e só diferem em como chamam o LLM. Na etapa
+# final (um único prompt), a resposta é entregue em trechos a `on_token`.
+
+def _map_reduce_plan(stats: Dict, groups: List[Dict], partition_by: str, max_prompt_tokens: int,
+                     counter: TokenCounter):
+    partitions = partition_groups(groups, partition_by)
+
+    # Map: cada partição em partes que cabem no orçamento, todas em paralelo
+    requests, labels = [], []
+    system_tokens = counter.count(MAP_SYSTEM_PROMPT) + 2 * MESSAGE_OVERHEAD_TOKENS
+    for name, partition in partitions.items():
+        lines = [format_groups_for_prompt([group], max_groups=1) for group in partition]
+        header = f"Partição: {name} ({len(partition)} vulnerabilidade(s) distinta(s))\n"
+        budget = max_prompt_tokens - system_tokens - counter.count(header) - 16
+        batches = _pack(lines, budget, counter)
+        for index, batch in enumerate(batches, 1):
+            part = f" - parte {index}/{len(batches)}" if len(batches) > 1 else ""
+            requests.append([SystemMessage(content=MAP_SYSTEM_PROMPT),
+                             HumanMessage(content=header.rstrip("\n") + part + "\n" + "\n".join(batch))])
+            labels.append(f"{name}{part}")
+    notes = yield "map", requests, "resumo/map", False
+    partials = [f"### {label}\n{note}" for label, note in zip(labels, notes)]
+
+    # Reduce: se as notas não cabem num prompt, são condensadas em rodadas intermediárias
+    overview = _overview(stats)
+    final_budget = (max_prompt_tokens - counter.count(SUMMARY_SYSTEM_PROMPT) - counter.count(overview)
+                    - 2 * MESSAGE_OVERHEAD_TOKENS - 32)
+    round_number = 0
+    while len(partials) > 1 and counter.count("\n\n".join(partials)) > final_budget:
+        round_number += 1
+        batches = _pack(partials, max_prompt_tokens - system_tokens - 32, counter)
+        if len(batches) == len(partials):
+            # Cada nota já ocupa um prompt inteiro: condensar não reduziria o número de notas
+            break
+        requests = [[SystemMessage(content=MAP_SYSTEM_PROMPT),
+                     HumanMessage(content="Notas parciais a consolidar:\n\n" + "\n\n".join(batch))]
+                    for batch in batches]
+        notes = yield f"collapse-{round_number}", requests, "resumo/collapse", False
+        partials = [f"### Consolidado {index}\n{note}" for index, note in enumerate(notes, 1)]
+
+    messages = [
+        SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+        HumanMessage(content=f"""
+Estatísticas do Relatório OpenVAS:
+
+{overview}
+
+Resumos parciais das vulnerabilidades ({len(groups)} distintas, particionadas por {partition_by}):
+
+{chr(10).join(partials)}
+"""),
+    ]
+    summary, = yield "reduce", [messages], "resumo/reduce", True
+
+    return {
+        "summary": summary,
+        "mode": "map_reduce",
+        "partitions": {name: len(partition) for name, partition in partitions.items()},
+    }
+
+
+def _summary_plan(analyzer, stats: Dict, groups: Optional[List[Dict]], mode: str, partition_by: str,
+                  max_prompt_tokens: int, counter: TokenCounter):
+    if not groups or mode == "single":
+        messages = analyzer.build_summary_messages(stats, groups)
+    elif mode == "auto":
+        # O prompt limitado a SUMMARY_MAX_GROUPS é o padrão; map-reduce só quando nem ele cabe
+        messages = analyzer.build_summary_messages(stats, groups)
+        if counter.count_messages(messages) > max_prompt_tokens:
+            messages = None
+    else:
+        messages = None
+
+    if messages is None:
+        return (yield from _map_reduce_plan(stats, groups, partition_by, max_prompt_tokens, counter))
+
+    summary, = yield "single", [messages], "resumo", True
+    return {"summary": summary, "mode": "single"}
+
+
+def _execute(plan, analyzer, counter: TokenCounter, on_token: Optional[Callable[[str], None]],
+             concurrency: int) -> Dict:
+    """Executa as etapas de `plan` com as chamadas síncronas do analisador"""
+    stages, contents = [], None
+    try:
+        while True:
+            name, requests, label, final = plan.send(contents)
+            meter = _StageMeter(name, counter)
+            if final:
+                contents = [_complete(analyzer, requests[0], on_token, label)]
+                meter.record(requests[0], contents[0])
+            else:
+                contents = _run_concurrently(analyzer, requests, label, meter, concurrency)
+            stages.append(meter.result())
+    except StopIteration as stop:
+        return {**stop.value, "stages": stages}
+
+
+async def _aexecute(plan, analyzer, counter: TokenCounter, on_token: Optional[Callable[[str], None]],
+                    concurrency: int) -> Dict:
+    """Executa as etapas de `plan` com as chamadas assíncronas do analisador"""
+    stages, contents = [], None
+    try:
+        while True:
+            name, requests, label, final = plan.send(contents)
+            meter = _StageMeter(name, counter)
+            if final:
+                contents = [await analyzer._acomplete(requests[0], on_token, label)]
+                meter.record(requests[0], contents[0])
+            else:
+                contents = await _arun_concurrently(analyzer, requests, label, meter, concurrency)
+            stages.append(meter.result())
+    except StopIteration as stop:
+        return {**stop.value, "stages": stages}
+
+
+def map_reduce_summary(analyzer, stats: Dict, groups: List[Dict],
+                       on_token: Optional[Callable[[str], None]] = None,
+                       partition_by: str = SUMMARY_PARTITION,
+                       max_prompt_tokens: Optional[int] = None,
+                       concurrency: int = SUMMARY_MAP_CONCURRENCY) -> Dict:
+    """
+    Resume os grupos de achados em map-reduce
+
+    Args:
+        analyzer: `OpenVASCSVAnalyzer` usado nas chamadas (com cache de respostas)
+        stats: Estatísticas do relatório
+        groups: Todos os grupos do relatório
+        on_token: Recebe o texto do relatório final em trechos
+        partition_by: Ver `partition_groups`
+        max_prompt_tokens: Orçamento de tokens de cada prompt (None: `prompt_token_budget` do modelo)
+        concurrency: Resumos parciais simultâneos
+
+    Returns:
+        Dict com 'summary', 'mode' ("map_reduce"), 'partitions' (grupos por partição)
+        e 'stages' (chamadas, tempo e tokens de cada etapa)
+    """
+    counter = get_token_counter(analyzer.model_name)
+    max_prompt_tokens = max_prompt_tokens or prompt_token_budget(analyzer.model_name)
+    plan = _map_reduce_plan(stats, groups, partition_by, max_prompt_tokens, counter)
+    return _execute(plan, analyzer, counter, on_token, concurrency)
+
+
+def summarize_report(analyzer, stats: Dict, groups: Optional[List[Dict]] = None,
+                     on_token: Optional[Callable[[str], None]] = None, mode: Optional[str] = None,
+                     partition_by: str = SUMMARY_PARTITION,
+                     max_prompt_tokens: Optional[int] = None,
+                     concurrency: int = SUMMARY_MAP_CONCURRENCY) -> Dict:
+    """
+    Resumo executivo em uma chamada ou em map-reduce, conforme o tamanho do relatório
+
+    Args:
+        mode: "single" (um prompt, com os grupos mais graves), "map_reduce" ou
+            "auto": o prompt de "single" se couber em `max_prompt_tokens`, senão
+            map-reduce. None usa SUMMARY_MODE
+        demais: ver `map_reduce_summary`
+
+    Returns:
+        Dict com 'summary', 'mode' e 'stages' (ver `map_reduce_summary`)
+    """
+    mode = mode or SUMMARY_MODE
+    if mode not in ("auto", "single", "map_reduce"):
+        raise ValueError(f"Modo de resumo não suportado: {mode}. Use 'auto', 'single' ou 'map_reduce'")
+    counter = get_token_counter(analyzer.model_name)
+    max_prompt_tokens = max_prompt_tokens or prompt_token_budget(analyzer.model_name)
+    plan = _summary_plan(analyzer, stats, groups, mode, partition_by, max_prompt_tokens, counter)
+    return _execute(plan, analyzer, counter, on_token, concurrency)
+
+
+async def asummarize_report(analyzer, stats: Dict, groups: Optional[List[Dict]] = None,
+                            on_token: Optional[Callable[[str], None]] = None, mode: Optional[str] = None,
+                            partition_by: str = SUMMARY_PARTITION,
+                            max_prompt_tokens: Optional[int] = None,
+                            concurrency: int = SUMMARY_MAP_CONCURRENCY) -> Dict:
+    """
+    Versão assíncrona de `summarize_report`
+
+    Mesmos prompts, orçamento e etapas; as chamadas usam `analyzer._acomplete` e
+    os resumos parciais rodam como tarefas no event loop (até `concurrency` ao mesmo tempo).
+    """
+    mode = mode or SUMMARY_MODE
+    if mode not in ("auto", "single", "map_reduce"):
+        raise ValueError(f"Modo de resumo não suportado: {mode}. Use 'auto', 'single' ou 'map_reduce'")
+    counter = get_token_counter(analyzer.model_name)
+    max_prompt_tokens = max_prompt_tokens or prompt_token_budget(analyzer.model_name)
+    plan = _summary_plan(analyzer, stats, groups, mode, partition_by, max_prompt_tokens, counter)
+    return await _aexecute(plan, analyzer, counter, on_token, concurrency)
@@ -0,0 +1,188 @@
+"""
+Comparação de desempenho entre modelos LLM, com várias amostras por modelo
+
+O relatório é lido e agrupado uma vez (o tempo de parse é medido à parte) e o
+mesmo prompt de resumo é enviado N vezes a cada modelo, com no máximo
+`concurrency` chamadas simultâneas. As tentativas dos modelos são intercaladas,
+para que todos enfrentem as mesmas condições de rede e de carga. Cada chamada é
+feita em streaming, sem o cache de respostas, e mede:
+
+- latência total (do envio ao último token)
+- tempo até o primeiro token (TTFT)
+- tokens de saída por segundo, contados depois do primeiro token
+
+Por modelo são informados p50/p95/p99 de cada medida e a taxa de erros.
+Com o `StubLLMServer` e perfis de latência por modelo (ver `latency_distribution`),
+tudo roda sem rede, o que também permite medir o próprio harness.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from .csv_analyzer import compute_vulnerability_statistics, get_csv_analyzer, load_openvas_csv
+    from .finding_groups import compute_finding_groups
+    from .llm_registry import get_chat_model
+    from .llm_streaming import stream_chat
+    from .map_reduce_summary import get_token_counter
+except ImportError:
+    # Execução direta (python src/tools/model_benchmark.py)
+    from csv_analyzer import compute_vulnerability_statistics, get_csv_analyzer, load_openvas_csv
+    from finding_groups import compute_finding_groups
+    from llm_registry import get_chat_model
+    from llm_streaming import stream_chat
+    from map_reduce_summary import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRIALS = int(os.getenv("MODEL_BENCH_TRIALS", "20"))
+DEFAULT_CONCURRENCY = int(os.getenv("MODEL_BENCH_CONCURRENCY", "4"))
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(values: List[float], points=PERCENTILES) -> Dict[str, Optional[float]]:
+    """{"p50", "p95", "p99", "mean"} dos valores (None quando não há amostras)"""
+    if not values:
+        return {**{f"p{p}": None for p in points}, "mean": None}
+    array = np.asarray(values, dtype="float64")
+    result = {f"p{p}": round(float(np.percentile(array, p)), 4) for p in points}
+    result["mean"] = round(float(array.mean()), 4)
+    return result
+
+
+def measure_parse(csv_path: str, trials: int = 3) -> Dict:
+    """
+    Lê o relatório `trials` vezes (sem cache), calculando estatísticas e grupos
+
+    Returns:
+        Dict com 'statistics', 'groups' (da última leitura) e 'seconds' (percentis)
+    """
+    timings = []
+    for _ in range(max(1, trials)):
+        start = time.perf_counter()
+        df = load_openvas_csv(csv_path, profile="analysis")
+        statistics = compute_vulnerability_statistics(df)
+        groups = compute_finding_groups(df)
+        timings.append(time.perf_counter() - start)
+    return {"statistics": statistics, "groups": groups, "seconds": percentiles(timings)}
+
+
+def run_trial(provider: str, model: str, messages: List) -> Dict:
+    """Uma chamada em streaming ao modelo, com latência, TTFT e tokens de saída"""
+    start = time.perf_counter()
+    try:
+        response = stream_chat(get_chat_model(provider, model), messages, label=f"benchmark {provider}/{model}",
+                               operation="benchmark")
+    except Exception as e:
+        return {"ok": False, "latency": time.perf_counter() - start, "error": f"{type(e).__name__}: {e}"}
+
+    usage = response["usage"] or {}
+    tokens = usage.get("output_tokens") or get_token_counter().count(response["content"])
+    ttft = response["ttft"]
+    generation = response["elapsed"] - (ttft or 0.0)
+    return {
+        "ok": True,
+        "latency": response["elapsed"],
+        "ttft": ttft,
+        "output_tokens": tokens,
+        "tokens_per_second": tokens / generation if generation > 0 else None,
+    }
+
+
+def summarize_trials(trials: List[Dict]) -> Dict:
+    """Percentis de latência, TTFT e tokens/s e taxa de erros de um modelo"""
+    ok = [trial for trial in trials if trial["ok"]]
+    errors = [trial["error"] for trial in trials if not trial["ok"]]
+    return {
+        "trials": len(trials),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(trials), 4) if trials else 0.0,
+        "latency": percentiles([trial["latency"] for trial in ok]),
+        "ttft": percentiles([trial["ttft"] for trial in ok if trial["ttft"] is not None]),
+        "tokens_per_second": percentiles([trial["tokens_per_second"] for trial in ok
+                                          if trial["tokens_per_second"] is not None]),
+        "output_tokens": percentiles([trial["output_tokens"] for trial in ok]),
+        "sample_errors": sorted(set(errors))[:3],
+    }
+
+
+def compare_models(models: Dict[str, Dict], messages: List, trials: int = DEFAULT_TRIALS,
+                   concurrency: int = DEFAULT_CONCURRENCY) -> Dict:
+    """
+    Envia `messages` `trials` vezes a cada modelo, com no máximo `concurrency` chamadas simultâneas
+
+    Args:
+        models: {nome exibido: {"provider", "model"}}
+        messages: Mensagens enviadas em todas as tentativas
+
+    Returns:
+        Dict com 'models' ({nome: resumo de `summarize_trials`}), 'wall_time' e
+        'throughput' (chamadas concluídas por segundo)
+    """
+    # Tentativas intercaladas: modelo A, modelo B, ..., modelo A, modelo B, ...
+    jobs = [(name, config) for _ in range(trials) for name, config in models.items()]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [(name, executor.submit(run_trial, config["provider"], config["model"], messages))
+                   for name, config in jobs]
+        results: Dict[str, List[Dict]] = {name: [] for name in models}
+        for name, future in futures:
+            results[name].append(future.result())
+    wall_time = time.perf_counter() - start
+
+    logger.info("%d chamadas em %.2fs (concorrência %d)", len(jobs), wall_time, concurrency)
+    return {
+        "models": {name: summarize_trials(trials) for name, trials in results.items()},
+        "wall_time": round(wall_time, 3),
+        "throughput": round(len(jobs) / wall_time, 2) if wall_time > 0 else None,
+    }
+
+
+def run_model_benchmark(csv_path: str, models: Dict[str, Dict], trials: int = DEFAULT_TRIALS,
+                        concurrency: int = DEFAULT_CONCURRENCY, parse_trials: int = 3) -> Dict:
+    """
+    Mede o parse do relatório e compara os modelos com o prompt de resumo dele
+
+    Returns:
+        Dict com 'csv', 'parse_seconds', 'prompt_tokens', 'trials', 'concurrency'
+        e os campos de `compare_models`
+    """
+    parsed = measure_parse(csv_path, parse_trials)
+    first = next(iter(models.values()))
+    analyzer = get_csv_analyzer(first["provider"], first["model"])
+    messages = analyzer.build_summary_messages(parsed["statistics"], parsed["groups"])
+    prompt_tokens = sum(get_token_counter().count(str(message.content)) for message in messages)
+
+    comparison = compare_models(models, messages, trials, concurrency)
+    return {
+        "csv": csv_path,
+        "parse_seconds": parsed["seconds"],
+        "prompt_tokens": prompt_tokens,
+        "trials": trials,
+        "concurrency": concurrency,
+        **comparison,
+    }
+
+
+def format_benchmark_table(result: Dict) -> str:
+    """Tabela em markdown com os percentis de cada modelo"""
+    def fmt(value, digits=2):
+        return "-" if value is None else f"{value:.{digits}f}"
+
+    lines = [
+        "| Modelo | Latência p50 / p95 / p99 (s) | TTFT p50 / p95 / p99 (s) | Tokens/s p50 | Erros |",
+        "|--------|------------------------------|--------------------------|--------------|-------|",
+    ]
+    for name, summary in result["models"].items():
+        latency, ttft = summary["latency"], summary["ttft"]
+        lines.append(
+            f"| {name} | {fmt(latency['p50'])} / {fmt(latency['p95'])} / {fmt(latency['p99'])} "
+            f"| {fmt(ttft['p50'])} / {fmt(ttft['p95'])} / {fmt(ttft['p99'])} "
+            f"| {fmt(summary['tokens_per_second']['p50'], 1)} "
+            f"| {summary['errors']}/{summary['trials']} ({summary['error_rate']:.0%}) |"
+        )
+    return "\n".join(lines)
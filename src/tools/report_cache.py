@@ -0,0 +1,256 @@
+"""
+Cache em disco de relatórios CSV já processados
+
+Cada entrada é identificada pelo hash do conteúdo do CSV mais um namespace
+(versão do parser + perfil de carga). O DataFrame é salvo em Parquet e ao lado
+dele fica um sidecar JSON pequeno com estatísticas pré-calculadas, que permite
+mostrar contagens sem abrir o relatório.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+# Trava do índice entre processos (POSIX); sem fcntl, só a trava entre threads vale
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Parquet é opcional: sem pyarrow o cache guarda apenas os sidecars de estatísticas
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+DEFAULT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", ".cache/reports")
+DEFAULT_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ReportCache:
+    """Cache de relatórios processados, endereçado por conteúdo, com despejo LRU por tamanho"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir: Pasta onde as entradas são gravadas
+            max_bytes: Tamanho máximo do cache; as entradas menos usadas são removidas ao exceder
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._index_path = self.cache_dir / "index.json"
+        self._index_lock_path = self.cache_dir / "index.lock"
+        self._lock = threading.Lock()
+        self._index: Optional[Dict] = None
+
+    # --- Identificação por conteúdo ---
+
+    def _read_index(self) -> Dict:
+        try:
+            return json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _load_index(self) -> Dict:
+        if self._index is None:
+            self._index = self._read_index()
+        return self._index
+
+    def _save_index(self, path: str, entry: Dict):
+        """
+        Grava a entrada `path` no índice em disco
+
+        Vários processos (workers da API, pool de leitura) compartilham o índice: sob
+        a trava de arquivo, o índice em disco é relido e recebe só esta entrada, em
+        vez de ser sobrescrito pela cópia do processo. Caminhos que não existem mais
+        são removidos na mesma gravação.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self._index_lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            index = self._read_index()
+            index[path] = entry
+            index = {key: value for key, value in index.items() if os.path.exists(key)}
+            tmp_path = self._index_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(index), encoding="utf-8")
+            os.replace(tmp_path, self._index_path)
+        self._index = index
+
+    def content_hash(self, file_path: str, compute: bool = True) -> Optional[str]:
+        """
+        Retorna o SHA-256 do conteúdo do arquivo
+
+        O hash é memorizado por (caminho, tamanho, mtime): só é recalculado quando o
+        arquivo muda. Com compute=False, retorna None em vez de ler um arquivo alterado.
+        """
+        path = Path(file_path).resolve()
+        stat = path.stat()
+        signature = [stat.st_size, stat.st_mtime_ns]
+
+        with self._lock:
+            known = self._load_index().get(str(path))
+        if known and known["signature"] == signature:
+            return known["sha256"]
+        if not compute:
+            return None
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        with self._lock:
+            self._save_index(str(path), {"signature": signature, "sha256": sha256})
+        return sha256
+
+    def _entry_paths(self, sha256: str, namespace: str):
+        stem = self.cache_dir / f"{sha256}-{namespace}"
+        return stem.with_suffix(".parquet"), stem.with_suffix(".json")
+
+    # --- DataFrames ---
+
+    def load(self, file_path: str, namespace: str, loader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Retorna o DataFrame do cache ou o gera com `loader` e o armazena
+
+        Args:
+            file_path: Caminho do CSV
+            namespace: Identifica como o CSV foi processado (ex.: versão do parser + perfil)
+            loader: Função que processa o CSV quando não há entrada válida
+        """
+        if not PARQUET_AVAILABLE:
+            return loader(file_path)
+
+        parquet_path, _ = self._entry_paths(self.content_hash(file_path), namespace)
+        if parquet_path.exists():
+            try:
+                df = pd.read_parquet(parquet_path)
+                os.utime(parquet_path)
+                return df
+            except Exception:
+                # Entrada corrompida ou gravada por outra versão do pyarrow: reprocessa
+                parquet_path.unlink(missing_ok=True)
+
+        df = loader(file_path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = parquet_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, parquet_path)
+        except Exception:
+            # Tipos que o Parquet não representa não impedem a análise
+            tmp_path.unlink(missing_ok=True)
+        self.evict()
+        return df
+
+    # --- Sidecar de estatísticas ---
+
+    def get_stats(self, file_path: str, namespace: str, variant: str = "default") -> Optional[Dict]:
+        """Retorna as estatísticas pré-calculadas do arquivo, se existirem"""
+        _, sidecar_path = self._entry_paths(self.content_hash(file_path), namespace)
+        sidecar = self._read_sidecar(sidecar_path)
+        if sidecar is None or variant not in sidecar["statistics"]:
+            return None
+        os.utime(sidecar_path)
+        return sidecar["statistics"][variant]
+
+    def put_stats(self, file_path: str, namespace: str, stats: Dict, variant: str = "default"):
+        """Grava as estatísticas do arquivo no sidecar da entrada"""
+        _, sidecar_path = self._entry_paths(self.content_hash(file_path), namespace)
+        sidecar = self._read_sidecar(sidecar_path) or {"source": Path(file_path).name, "statistics": {}}
+        sidecar["statistics"][variant] = stats
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = sidecar_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(sidecar, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, sidecar_path)
+        self.evict()
+
+    def peek_stats(self, file_path: str) -> Optional[Dict]:
+        """
+        Retorna as contagens já calculadas para o arquivo (total, hosts...) sem processá-lo
+
+        Não lê o CSV: se o arquivo mudou desde o último hash, retorna None.
+        """
+        sha256 = self.content_hash(file_path, compute=False)
+        if sha256 is None or not self.cache_dir.exists():
+            return None
+        for sidecar_path in sorted(self.cache_dir.glob(f"{sha256}-*.json")):
+            sidecar = self._read_sidecar(sidecar_path)
+            # Sidecars de outros namespaces (ex.: grupos de achados) não têm as contagens
+            for stats in (sidecar or {}).get("statistics", {}).values():
+                if isinstance(stats, dict) and "total_vulnerabilities" in stats:
+                    return stats
+        return None
+
+    @staticmethod
+    def _read_sidecar(sidecar_path: Path) -> Optional[Dict]:
+        try:
+            return json.loads(sidecar_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    # --- Manutenção ---
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return [p for p in self.cache_dir.iterdir() if p.suffix in (".parquet", ".json") and p != self._index_path]
+
+    def size_bytes(self) -> int:
+        """Tamanho total ocupado pelas entradas"""
+        total = 0
+        for path in self._entries():
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def evict(self):
+        """Remove as entradas usadas há mais tempo até o cache caber em max_bytes"""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        """Remove todas as entradas e o índice de hashes"""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        with self._lock:
+            self._index = {}
+            self._index_path.unlink(missing_ok=True)
+
+
+_default_cache: Optional[ReportCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_report_cache() -> ReportCache:
+    """Retorna o cache compartilhado do processo (configurado por REPORT_CACHE_DIR/REPORT_CACHE_MAX_MB)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ReportCache()
+        return _default_cache
@@ -0,0 +1,245 @@
+"""
+Comparação entre dois scans do OpenVAS (delta)
+
+Os achados dos dois relatórios são casados por uma chave estável
+(NVT OID + IP + Port + Port Protocol) e classificados como novos, corrigidos
+ou persistentes com severidade alterada. As chaves dos dois scans são fatoradas
+em conjunto (tabela hash) num identificador inteiro por achado e a junção é
+feita por esse identificador (isin / reindex), então o custo cresce linearmente
+com o tamanho dos relatórios. Só o delta é enviado ao LLM.
+"""
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .csv_analyzer import PARSER_VERSION, _value_counts
+    from .report_cache import ReportCache
+except ImportError:
+    # Execução direta (python src/tools/scan_diff.py)
+    from csv_analyzer import PARSER_VERSION, _value_counts
+    from report_cache import ReportCache
+
+
+# Chave que identifica o mesmo achado em scans diferentes
+DIFF_KEY_COLUMNS = ["NVT OID", "IP", "Port", "Port Protocol"]
+
+# Colunas comparadas/relatadas para cada achado
+DIFF_VALUE_COLUMNS = ["NVT Name", "Severity", "CVSS"]
+
+# Colunas equivalentes em exportações mais simples (ex.: exemplo_scan.csv)
+COLUMN_FALLBACKS = {"NVT OID": "NVT Name", "IP": "Host", "Port Protocol": "Protocol"}
+
+FindingsSource = Union[str, pd.DataFrame]
+
+
+def _as_key(series: pd.Series) -> pd.Series:
+    """Converte uma coluna de chave em texto (portas lidas como float viram '443', não '443.0')"""
+    if pd.api.types.is_float_dtype(series.dtype):
+        try:
+            series = series.astype("Int64")
+        except (TypeError, ValueError):
+            pass
+    return series.astype("str").fillna("")
+
+
+def normalize_findings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reduz um relatório às colunas usadas na comparação
+
+    As colunas de chave viram texto (ausentes ficam vazias), CVSS vira número e
+    Severity texto. Requer NVT OID (ou NVT Name) e IP (ou Host).
+    """
+    columns = {}
+    for column in DIFF_KEY_COLUMNS + DIFF_VALUE_COLUMNS:
+        source = column if column in df.columns else COLUMN_FALLBACKS.get(column)
+        if source in df.columns:
+            columns[column] = df[source]
+
+    missing = [column for column in ("NVT OID", "IP") if column not in columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes para a comparação: {', '.join(missing)}")
+
+    findings = pd.DataFrame({
+        column: _as_key(columns[column]) if column in columns else ""
+        for column in DIFF_KEY_COLUMNS
+    }, index=df.index)
+    findings["NVT Name"] = columns["NVT Name"].astype("str").fillna("") if "NVT Name" in columns else findings["NVT OID"]
+    findings["Severity"] = columns["Severity"].astype("str").fillna("") if "Severity" in columns else ""
+    findings["CVSS"] = pd.to_numeric(columns["CVSS"], errors="coerce") if "CVSS" in columns else np.nan
+    return findings.reset_index(drop=True)
+
+
+def load_findings(source: FindingsSource, cache: Optional[ReportCache] = None) -> pd.DataFrame:
+    """
+    Carrega os achados de um CSV do OpenVAS (ou de um DataFrame já carregado)
+
+    Lê apenas as colunas da comparação. Com `cache`, o resultado normalizado de
+    cada CSV fica no cache de relatórios, então o scan anterior não é relido
+    na comparação seguinte.
+    """
+    if isinstance(source, pd.DataFrame):
+        return normalize_findings(source)
+
+    wanted = set(DIFF_KEY_COLUMNS + DIFF_VALUE_COLUMNS) | set(COLUMN_FALLBACKS.values())
+    text_columns = {column: "str" for column in DIFF_KEY_COLUMNS + list(COLUMN_FALLBACKS.values())}
+
+    def loader(path: str) -> pd.DataFrame:
+        try:
+            df = pd.read_csv(path, usecols=lambda column: column in wanted, dtype=text_columns)
+        except Exception as e:
+            raise Exception(f"Erro ao carregar CSV: {str(e)}")
+        return normalize_findings(df)
+
+    if cache is None:
+        return loader(source)
+    return cache.load(source, f"v{PARSER_VERSION}-diff", loader)
+
+
+def gmp_results_to_dataframe(results_xml: str) -> pd.DataFrame:
+    """
+    Converte a resposta de get_results do GMP (XML) para as colunas do CSV do OpenVAS
+
+    Permite comparar dois relatórios obtidos do gvmd com `ResultManager.result`.
+    """
+    rows = []
+    for result in ET.fromstring(results_xml).iter("result"):
+        host = result.find("host")
+        nvt = result.find("nvt")
+        port, _, protocol = (result.findtext("port") or "").partition("/")
+        rows.append({
+            "IP": (host.text or "").strip() if host is not None else "",
+            "Hostname": host.findtext("hostname", "") if host is not None else "",
+            "Port": port,
+            "Port Protocol": protocol,
+            "NVT OID": nvt.get("oid", "") if nvt is not None else "",
+            "NVT Name": nvt.findtext("name", "") if nvt is not None else "",
+            "Severity": result.findtext("threat", ""),
+            "CVSS": result.findtext("severity"),
+        })
+    return pd.DataFrame(rows, columns=["IP", "Hostname", "Port", "Port Protocol", "NVT OID",
+                                       "NVT Name", "Severity", "CVSS"])
+
+
+def _finding_ids(previous: pd.DataFrame, current: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Identificador inteiro de cada achado, o mesmo nos dois scans para a mesma chave
+
+    Cada coluna da chave é fatorada sobre os dois scans juntos e os códigos são
+    combinados coluna a coluna (refatorando o par para não estourar o int64).
+    """
+    ids = None
+    for column in DIFF_KEY_COLUMNS:
+        codes, uniques = pd.factorize(pd.concat([previous[column], current[column]], ignore_index=True))
+        codes = codes.astype(np.int64)
+        ids = codes if ids is None else pd.factorize(ids * len(uniques) + codes)[0].astype(np.int64)
+    return ids[:len(previous)], ids[len(previous):]
+
+
+def _index_by_id(findings: pd.DataFrame, ids: np.ndarray) -> pd.DataFrame:
+    """Indexa os achados pelo identificador, mantendo uma linha (a de maior CVSS) por chave"""
+    findings = findings.set_index(pd.Index(ids, name="key"))
+    if findings.index.has_duplicates:
+        rank = pd.Series(findings["CVSS"].fillna(-1).to_numpy())
+        best = rank.groupby(ids, sort=False).idxmax().to_numpy()
+        findings = findings.iloc[best]
+    return findings
+
+
+def diff_findings(previous: pd.DataFrame, current: pd.DataFrame) -> Dict:
+    """
+    Classifica os achados de dois scans (saídas de `load_findings`)
+
+    Achados repetidos com a mesma chave dentro de um scan contam uma vez, com o maior CVSS.
+
+    Returns:
+        Dict com DataFrames 'new' (só no scan atual), 'fixed' (só no anterior) e
+        'changed' (nos dois, com CVSS ou severidade diferente; inclui as colunas
+        'Previous Severity' e 'Previous CVSS'), os totais de achados distintos
+        'total_previous'/'total_current' e o número de achados 'unchanged'
+    """
+    previous_ids, current_ids = _finding_ids(previous, current)
+    previous = _index_by_id(previous, previous_ids)
+    current = _index_by_id(current, current_ids)
+
+    is_new = ~current.index.isin(previous.index)
+    is_fixed = ~previous.index.isin(current.index)
+
+    persisting = current[~is_new]
+    before = previous.reindex(persisting.index)
+    cvss_now = persisting["CVSS"].to_numpy(dtype=float)
+    cvss_before = before["CVSS"].to_numpy(dtype=float)
+    same_cvss = (cvss_now == cvss_before) | (np.isnan(cvss_now) & np.isnan(cvss_before))
+    same_severity = persisting["Severity"].to_numpy() == before["Severity"].to_numpy()
+    is_changed = ~(same_cvss & same_severity)
+
+    changed = persisting[is_changed].assign(**{
+        "Previous Severity": before["Severity"].to_numpy()[is_changed],
+        "Previous CVSS": cvss_before[is_changed],
+    })
+    return {
+        "new": current[is_new],
+        "fixed": previous[is_fixed],
+        "changed": changed,
+        "total_previous": int(len(previous)),
+        "total_current": int(len(current)),
+        "unchanged": int(len(persisting) - is_changed.sum()),
+    }
+
+
+def _counts(series: pd.Series, top_n: Optional[int] = None) -> Dict:
+    counts = _value_counts(series[series != ""])
+    if top_n is not None:
+        counts = counts.head(top_n)
+    return {str(value): int(count) for value, count in counts.items()}
+
+
+def delta_statistics(diff: Dict, top_n: int = 10) -> Dict:
+    """Resumo do delta em tipos simples (JSON), que é o que vai para o LLM e para o relatório"""
+    changed = diff["changed"]
+    cvss_delta = changed["CVSS"] - changed["Previous CVSS"]
+    biggest = changed.assign(delta=cvss_delta.abs().fillna(0)).nlargest(top_n, "delta")
+
+    return {
+        "total_previous": diff["total_previous"],
+        "total_current": diff["total_current"],
+        "new_count": int(len(diff["new"])),
+        "fixed_count": int(len(diff["fixed"])),
+        "changed_count": int(len(changed)),
+        "unchanged_count": diff["unchanged"],
+        "escalated_count": int((cvss_delta > 0).sum()),
+        "deescalated_count": int((cvss_delta < 0).sum()),
+        "new_by_severity": _counts(diff["new"]["Severity"]),
+        "fixed_by_severity": _counts(diff["fixed"]["Severity"]),
+        "top_new_vulnerabilities": _counts(diff["new"]["NVT Name"], top_n),
+        "top_fixed_vulnerabilities": _counts(diff["fixed"]["NVT Name"], top_n),
+        "hosts_with_new_findings": _counts(diff["new"]["IP"], top_n),
+        "hosts_with_fixed_findings": _counts(diff["fixed"]["IP"], top_n),
+        "severity_changes": [
+            {
+                "vulnerability": row["NVT Name"],
+                "host": row["IP"],
+                "port": f"{row['Port']}/{row['Port Protocol']}".strip("/"),
+                "previous": f"{row['Previous Severity']} ({row['Previous CVSS']})",
+                "current": f"{row['Severity']} ({row['CVSS']})",
+            }
+            for _, row in biggest.iterrows()
+        ],
+    }
+
+
+def compare_scans(previous: FindingsSource, current: FindingsSource,
+                  cache: Optional[ReportCache] = None, top_n: int = 10) -> Dict:
+    """
+    Compara dois scans (caminhos de CSV ou DataFrames)
+
+    Returns:
+        Dict com 'statistics' (ver `delta_statistics`) e 'diff' (ver `diff_findings`)
+    """
+    diff = diff_findings(load_findings(previous, cache), load_findings(current, cache))
+    return {
+        "statistics": delta_statistics(diff, top_n),
+        "diff": diff,
+    }
@@ -0,0 +1,141 @@
+"""
+Gerador de relatórios CSV sintéticos do OpenVAS
+
+Produz relatórios de qualquer tamanho (de dezenas de milhares a dezenas de
+milhões de linhas) com o mesmo esquema de um relatório real: as linhas são
+sorteadas de um relatório modelo (por padrão, csv_reports/openvas-speed.csv),
+o que preserva a combinação NVT/porta/CVSS/textos e os campos multilinha entre
+aspas, e recebem hosts, hostnames, IDs e horários novos. A mesma semente gera
+sempre o mesmo arquivo. Usado pelos benchmarks (benchmarks/run_benchmarks.py).
+
+Uso:
+    python src/tools/synthetic_report.py 100000 /tmp/scan_100k.csv [--hosts 5000] [--seed 0]
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_TEMPLATE = Path(__file__).resolve().parents[2] / "csv_reports" / "openvas-speed.csv"
+
+# Linhas geradas e gravadas por vez (limita a memória usada em relatórios grandes)
+GENERATION_CHUNK_ROWS = int(os.getenv("SYNTHETIC_CHUNK_ROWS", "50000"))
+
+# Achados por host, em média, quando o número de hosts não é informado
+FINDINGS_PER_HOST = 12
+
+# Início da janela de horários dos achados
+BASE_TIMESTAMP = pd.Timestamp("2024-08-12T00:00:00Z")
+
+# Colunas geradas para cada achado; as demais vêm da linha sorteada do modelo
+GENERATED_COLUMNS = ("IP", "Hostname", "Task ID", "Task Name", "Timestamp", "Result ID")
+
+
+def _host_addresses(count: int) -> np.ndarray:
+    """IPs 10.x.y.z distintos, um por host"""
+    index = np.arange(count, dtype="int64") + 1
+    octets = [pd.Series((index >> shift) & 255).astype("str") for shift in (16, 8, 0)]
+    return ("10." + octets[0] + "." + octets[1] + "." + octets[2]).to_numpy(dtype=object)
+
+
+def _quote(value: str) -> str:
+    """Campo CSV com aspas apenas quando necessário (como o csv.QUOTE_MINIMAL)"""
+    if any(char in value for char in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _row_formats(template: pd.DataFrame) -> List[str]:
+    """
+    Cada linha do modelo já serializada, com '%s' no lugar das colunas geradas
+
+    Os textos longos (e multilinha) são escapados uma vez por linha do modelo, e
+    não a cada achado gerado.
+    """
+    formats = []
+    for row in template.itertuples(index=False):
+        cells = ["%s" if column in GENERATED_COLUMNS else _quote(value).replace("%", "%%")
+                 for column, value in zip(template.columns, row)]
+        formats.append(",".join(cells) + "\n")
+    return formats
+
+
+def generate_synthetic_report(output_path: str, rows: int, hosts: Optional[int] = None, seed: int = 0,
+                              template_path: str = str(DEFAULT_TEMPLATE),
+                              chunk_rows: int = GENERATION_CHUNK_ROWS) -> Path:
+    """
+    Gera um relatório sintético com o esquema do relatório modelo
+
+    Args:
+        output_path: Arquivo CSV a gerar (sobrescrito se existir)
+        rows: Número de achados
+        hosts: Hosts distintos (padrão: um a cada FINDINGS_PER_HOST achados)
+        seed: Semente do sorteio
+        template_path: Relatório real de onde as linhas são sorteadas
+        chunk_rows: Linhas gravadas por vez
+
+    Returns:
+        Caminho do arquivo gerado
+    """
+    if rows < 1:
+        raise ValueError("O relatório sintético precisa de pelo menos uma linha")
+    if not Path(template_path).exists():
+        raise FileNotFoundError(f"Relatório modelo não encontrado: {template_path}")
+
+    template = pd.read_csv(template_path, dtype="str", keep_default_na=False)
+    missing = [column for column in GENERATED_COLUMNS if column not in template.columns]
+    if missing:
+        raise ValueError(f"O relatório modelo não tem as colunas: {', '.join(missing)}")
+    formats = _row_formats(template)
+    # Ordem em que as colunas geradas aparecem em cada linha
+    generated = [column for column in template.columns if column in GENERATED_COLUMNS]
+
+    rng = np.random.default_rng(seed)
+    hosts = max(1, hosts or rows // FINDINGS_PER_HOST)
+    addresses = _host_addresses(hosts)
+    hostnames = np.array([f"host-{i:08x}" for i in range(hosts)], dtype=object)
+    # Parte dos hosts não tem hostname, como no relatório modelo
+    hostnames[rng.random(hosts) < (template["Hostname"] == "").mean()] = ""
+    timestamps = pd.date_range(BASE_TIMESTAMP, periods=86400, freq="s").strftime("%Y-%m-%dT%H:%M:%SZ")
+    timestamps = timestamps.to_numpy(dtype=object)
+    constants = {"Task ID": f"{seed:08x}-0000-4000-a000-000000000000", "Task Name": _quote(f"Rede sintética {seed}")}
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(_quote(column) for column in template.columns) + "\n")
+        for start in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - start)
+            rows_from = rng.integers(0, len(template), count)
+            host = rng.integers(0, hosts, count)
+            values = {
+                "IP": addresses[host],
+                "Hostname": hostnames[host],
+                "Timestamp": timestamps[rng.integers(0, len(timestamps), count)],
+                "Result ID": [f"{seed:08x}-0000-4000-8000-{i:012x}" for i in range(start, start + count)],
+            }
+            columns = [values[column] if column in values else [constants[column]] * count for column in generated]
+            f.write("".join(formats[t] % fields for t, fields in zip(rows_from, zip(*columns))))
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um relatório CSV sintético do OpenVAS")
+    parser.add_argument("rows", type=int, help="Número de achados")
+    parser.add_argument("output", help="Arquivo CSV a gerar")
+    parser.add_argument("--hosts", type=int, help="Hosts distintos (padrão: linhas / 12)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--template", default=str(DEFAULT_TEMPLATE), help="Relatório real usado como modelo")
+    args = parser.parse_args()
+
+    path = generate_synthetic_report(args.output, args.rows, args.hosts, args.seed, args.template)
+    print(f"✅ {args.rows} achados gravados em {path} ({path.stat().st_size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
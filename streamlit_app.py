@@ -3,40 +3,61 @@ Interface Streamlit para análise de relatórios CSV do OpenVAS
 """
 import streamlit as st
 import pandas as pd
+import hashlib
 import os
 from pathlib import Path
 import sys
+import time
+import json
 from io import StringIO
-import plotly.express as px
 import plotly.graph_objects as go
 
 # Adiciona o diretório raiz ao path
 sys.path.append(str(Path(__file__).parent))
 
-from src.tools.csv_analyzer import OpenVASCSVAnalyzer
+from src.tools.analysis_memory_cache import get_analysis_cache
+from src.tools.csv_analyzer import get_csv_analyzer
+from src.tools.findings_store import get_findings_store
+from src.tools.llm_cache import get_llm_cache
+
+
+@st.cache_resource
+def shared_analyzer(llm_provider, model_name):
+    """Analisador (e cliente LLM) compartilhado por todas as sessões"""
+    return get_csv_analyzer(llm_provider=llm_provider, model_name=model_name)
+
+
+@st.cache_resource
+def shared_analysis_cache():
+    """Análises de relatórios em memória, por hash do conteúdo, compartilhadas pelas sessões"""
+    return get_analysis_cache()
+
+
+# Cores de cada severidade nos gráficos, da mais grave para a menos grave
+SEVERITY_COLORS = {
+    'Critical': '#d32f2f',
+    'High': '#f57c00',
+    'Medium': '#fbc02d',
+    'Low': '#388e3c',
+    'Info': '#1976d2',
+    'Log': '#1976d2',
+    'Unknown': '#757575',
+}
 
 
 def create_severity_chart(stats):
     """Cria gráfico de distribuição de severidade"""
+    import plotly.express as px  # ~70 ms de import, só quando há gráfico para desenhar
+
     if 'by_severity' in stats:
         df = pd.DataFrame(list(stats['by_severity'].items()), 
                          columns=['Severidade', 'Quantidade'])
         
-        # Cores para cada severidade
-        color_map = {
-            'Critical': '#d32f2f',
-            'High': '#f57c00',
-            'Medium': '#fbc02d',
-            'Low': '#388e3c',
-            'Info': '#1976d2',
-            'Unknown': '#757575'
-        }
-        
-        df['Color'] = df['Severidade'].map(color_map)
+        df['Color'] = df['Severidade'].map(SEVERITY_COLORS)
         
         fig = px.bar(df, x='Severidade', y='Quantidade', 
                     color='Severidade',
-                    color_discrete_map=color_map,
+                    color_discrete_map=SEVERITY_COLORS,
                     title='Distribuição de Vulnerabilidades por Severidade')
         return fig
     return None
@@ -44,6 +65,8 @@ def create_severity_chart(stats):
 
 def create_top_vulnerabilities_chart(stats):
     """Cria gráfico de top vulnerabilidades"""
+    import plotly.express as px
+
     if 'top_vulnerabilities' in stats:
         items = list(stats['top_vulnerabilities'].items())[:10]
         df = pd.DataFrame(items, columns=['Vulnerabilidade', 'Ocorrências'])
@@ -63,6 +86,8 @@ def create_top_vulnerabilities_chart(stats):
 
 def create_hosts_chart(stats):
     """Cria gráfico de hosts mais afetados"""
+    import plotly.express as px
+
     if 'most_affected_hosts' in stats:
         items = list(stats['most_affected_hosts'].items())[:10]
         df = pd.DataFrame(items, columns=['Host', 'Vulnerabilidades'])
@@ -74,6 +99,174 @@ def create_hosts_chart(stats):
     return None
 
 
+# Acima desse número de hosts, o gráfico de hosts vira um gráfico de dispersão em
+# WebGL (um ponto por host) em vez de uma barra por host
+HOST_BAR_LIMIT = 30
+
+# Pontos desenhados no gráfico de dispersão (os hosts com mais achados)
+HOST_POINTS_LIMIT = 50_000
+
+# Hosts oferecidos no filtro de hosts (além dos já selecionados)
+HOST_FILTER_OPTIONS = 200
+
+# Dimensão do cubo -> rótulo do filtro
+CUBE_FILTERS = {
+    "severity": "Severidade",
+    "host": "Host",
+    "port": "Porta/Protocolo",
+    "nvt": "NVT",
+    "solution": "Tipo de solução",
+}
+
+
+def _severity_order(value):
+    return list(SEVERITY_COLORS).index(value) if value in SEVERITY_COLORS else len(SEVERITY_COLORS)
+
+
+def create_cube_bar_chart(rollup, column, title, horizontal=False):
+    """Barras de um `FindingsCube.rollup`; o valor vai no customdata para o clique filtrar"""
+    labels = rollup[column].tolist()
+    if column == "Severity":
+        colors = [SEVERITY_COLORS.get(label, '#757575') for label in labels]
+    else:
+        colors = '#1976d2'
+    names = [label[:50] + '...' if len(label) > 50 else label for label in labels]
+    bar = go.Bar(
+        x=rollup["findings"] if horizontal else names,
+        y=names if horizontal else rollup["findings"],
+        orientation='h' if horizontal else 'v',
+        marker_color=colors,
+        customdata=[[label] for label in labels],
+        hovertemplate="%{customdata[0]}<br>%{text} achado(s)<extra></extra>",
+        text=rollup["findings"],
+    )
+    fig = go.Figure(bar)
+    fig.update_layout(title=title, clickmode='event+select', margin=dict(t=50, b=10))
+    if horizontal:
+        fig.update_layout(yaxis={'autorange': 'reversed'})
+    return fig
+
+
+def create_cube_hosts_chart(cube, filters):
+    """
+    Hosts do recorte: barras empilhadas por severidade quando são poucos, ou um
+    gráfico de dispersão em WebGL (achados × maior CVSS, um ponto por host) quando
+    são muitos
+    """
+    hosts = cube.rollup("host", filters)
+    if len(hosts) <= HOST_BAR_LIMIT:
+        matrix = cube.pivot("host", "severity", {k: v for k, v in filters.items() if k != "host"},
+                            row_values=hosts["IP"].tolist())
+        matrix = matrix.reindex(hosts["IP"])
+        fig = go.Figure([
+            go.Bar(x=matrix.index, y=matrix[severity], name=severity,
+                   marker_color=SEVERITY_COLORS.get(severity, '#757575'),
+                   customdata=[[host] for host in matrix.index])
+            for severity in sorted(matrix.columns, key=_severity_order)
+        ])
+        fig.update_layout(barmode='stack', title=f'Hosts Afetados ({len(hosts)})')
+        fig.update_xaxes(tickangle=45)
+    else:
+        shown = hosts.head(HOST_POINTS_LIMIT)
+        fig = go.Figure(go.Scattergl(
+            x=shown["findings"], y=shown["max_cvss"], mode='markers',
+            marker=dict(size=6, color=shown["max_cvss"], colorscale='YlOrRd', showscale=True),
+            customdata=shown[["IP"]].to_numpy(),
+            hovertemplate="%{customdata[0]}<br>%{x} achado(s), CVSS máx. %{y}<extra></extra>",
+        ))
+        title = f'Hosts Afetados ({len(hosts)})'
+        if len(hosts) > len(shown):
+            title += f' — exibindo os {len(shown)} com mais achados'
+        fig.update_layout(title=title, xaxis_title='Achados', yaxis_title='Maior CVSS')
+    fig.update_layout(clickmode='event+select', margin=dict(t=50, b=10))
+    return fig
+
+
+@st.cache_resource(max_entries=64)
+def cube_charts(digest, filters_key, _cube, _filters):
+    """
+    Gráficos de um recorte do cubo, montados uma vez por relatório e filtro
+
+    Cada gráfico ignora o filtro da própria dimensão (filtro cruzado), então
+    continua mostrando as outras opções para o clique.
+    """
+    severities = _cube.rollup("severity", _filters)
+    severities = severities.sort_values("Severity", key=lambda values: values.map(_severity_order))
+    return {
+        "severity": create_cube_bar_chart(severities, "Severity", 'Distribuição de Vulnerabilidades por Severidade'),
+        "host": create_cube_hosts_chart(_cube, _filters),
+        "nvt": create_cube_bar_chart(_cube.rollup("nvt", _filters, top=10), "NVT Name",
+                                     'Top 10 Vulnerabilidades Mais Comuns', horizontal=True),
+        "port": create_cube_bar_chart(_cube.rollup("port", _filters, top=15), "Port", 'Portas Mais Afetadas (Top 15)'),
+        "solution": create_cube_bar_chart(_cube.rollup("solution", _filters), "Solution Type", 'Tipos de Solução'),
+    }
+
+
+def _apply_chart_selection(key, dimension):
+    """Clique em um gráfico: os pontos selecionados viram o filtro da dimensão"""
+    points = st.session_state[f"{key}_{dimension}_chart"]["selection"]["points"]
+    values = list(dict.fromkeys(point["customdata"][0] for point in points if point.get("customdata")))
+    st.session_state[f"{key}_{dimension}_filter"] = values
+
+
+def _clear_cube_filters(key):
+    for dimension in CUBE_FILTERS:
+        st.session_state[f"{key}_{dimension}_filter"] = []
+
+
+def display_cube_charts(report, key):
+    """
+    Gráficos com filtro cruzado sobre o cubo do relatório
+
+    Clicar em uma barra (ou selecionar pontos) filtra os outros gráficos por aquele
+    valor; os filtros também podem ser editados nos campos acima dos gráficos.
+    """
+    cube = report.cube
+    filters = {dimension: st.session_state.get(f"{key}_{dimension}_filter") or []
+               for dimension in CUBE_FILTERS}
+    
+    start = time.perf_counter()
+    columns = st.columns(len(CUBE_FILTERS) + 1)
+    for column, (dimension, label) in zip(columns, CUBE_FILTERS.items()):
+        if dimension == "host":
+            top_hosts = cube.rollup("host", filters, top=HOST_FILTER_OPTIONS)["IP"].tolist()
+            options = list(dict.fromkeys(filters["host"] + top_hosts))
+        elif dimension == "severity":
+            options = sorted(cube.labels["severity"], key=_severity_order)
+        else:
+            options = sorted(cube.labels[dimension])
+        with column:
+            filters[dimension] = st.multiselect(label, options, key=f"{key}_{dimension}_filter")
+    with columns[-1]:
+        st.button("Limpar filtros", key=f"{key}_clear_filters", on_click=_clear_cube_filters, args=(key,))
+    
+    active = {dimension: values for dimension, values in filters.items() if values}
+    totals = cube.totals(active)
+    charts = cube_charts(report.digest, json.dumps(active, sort_keys=True), cube, active)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    max_cvss = f"{totals['max_cvss']:.1f}" if totals['max_cvss'] is not None else "-"
+    st.caption(f"Recorte: {totals['findings']} achado(s) · {totals['hosts']} host(s) · "
+               f"{totals['nvts']} NVT(s) · CVSS máx. {max_cvss} · {elapsed_ms:.0f} ms")
+    
+    def chart(dimension):
+        st.plotly_chart(charts[dimension], use_container_width=True, key=f"{key}_{dimension}_chart",
+                        on_select=lambda: _apply_chart_selection(key, dimension),
+                        selection_mode=("points", "box", "lasso"))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        chart("severity")
+    with col2:
+        chart("host")
+    chart("nvt")
+    col1, col2 = st.columns(2)
+    with col1:
+        chart("port")
+    with col2:
+        chart("solution")
+
+
 def main():
     st.set_page_config(
         page_title="OpenVAS CSV Analyzer",
@@ -133,6 +326,18 @@ def main():
                 st.error("❌ Configure GROQ_API_KEY no .env")
                 st.info("💡 Obtenha gratuitamente em: https://console.groq.com")
         
+        # Respostas reaproveitadas do cache de resumos (compartilhado com a CLI e o agente)
+        cache_stats = get_llm_cache().stats()
+        st.caption(
+            f"💾 Cache de resumos: {cache_stats['total_hits']} acertos / {cache_stats['total_misses']} falhas "
+            f"({cache_stats['saved_seconds']:.0f}s de LLM economizados)"
+        )
+        analysis_stats = shared_analysis_cache().stats()
+        st.caption(
+            f"🧠 Relatórios em memória: {analysis_stats['entries']} "
+            f"({analysis_stats['used_bytes'] / 1024 / 1024:.0f} de {analysis_stats['max_bytes'] / 1024 / 1024:.0f} MB)"
+        )
+        
         st.markdown("---")
         st.markdown("### 📖 Sobre")
         st.markdown("""
@@ -149,7 +354,7 @@ def main():
     st.markdown("---")
     
     # Tabs para diferentes modos de entrada
-    tab1, tab2 = st.tabs(["📤 Upload de Arquivo", "📁 Pasta Local"])
+    tab1, tab2, tab3 = st.tabs(["📤 Upload de Arquivo", "📁 Pasta Local", "🗄️ Base de Achados"])
     
     with tab1:
         st.markdown("### Upload do CSV do OpenVAS")
@@ -172,30 +377,40 @@ def main():
             help="Pasta contendo os arquivos CSV do OpenVAS"
         )
         
+        # A pasta analisada fica na sessão para que os filtros da tabela de achados
+        # (que recarregam a página) não apaguem os resultados
         if st.button("🔍 Analisar Pasta", type="primary"):
-            process_folder(folder_path, llm_provider, model_name)
+            st.session_state["analyzed_folder"] = folder_path
+        if st.session_state.get("analyzed_folder"):
+            process_folder(st.session_state["analyzed_folder"], llm_provider, model_name)
+    
+    with tab3:
+        display_findings_store()
+
+
+def upload_digest(uploaded_file) -> str:
+    """SHA-256 do upload, calculado uma vez por arquivo (id + tamanho) e guardado na sessão"""
+    digests = st.session_state.setdefault("upload_digests", {})
+    key = (uploaded_file.file_id, uploaded_file.size)
+    if key not in digests:
+        digests[key] = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    return digests[key]
 
 
 def process_uploaded_file(uploaded_file, llm_provider, model_name):
-    """Processa arquivo enviado via upload"""
+    """Processa arquivo enviado via upload (lido direto da memória, sem arquivo temporário)"""
     try:
-        # Salva temporariamente
-        temp_path = Path("temp_csv") / uploaded_file.name
-        temp_path.parent.mkdir(exist_ok=True)
-        
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        # Análise
+        # Estatísticas primeiro; o resumo é gerado e exibido em display_results.
+        # Nas reexecuções seguintes a análise vem do cache em memória
         with st.spinner(f"🔄 Analisando com {llm_provider.upper()} ({model_name})..."):
-            analyzer = OpenVASCSVAnalyzer(llm_provider=llm_provider, model_name=model_name)
-            analysis = analyzer.analyze_csv_file(str(temp_path))
+            analyzer = shared_analyzer(llm_provider, model_name)
+            # Sem o digest, cada reexecução calcularia o hash do upload inteiro de novo
+            report = shared_analysis_cache().analyze(uploaded_file.getvalue(), upload_digest(uploaded_file),
+                                                     analyzer.cvss_bands)
         
         # Exibe resultados
-        display_results(analysis, uploaded_file.name)
-        
-        # Limpa arquivo temporário
-        temp_path.unlink()
+        display_results({"statistics": report.statistics, "summary": None, "groups": report.groups},
+                        uploaded_file.name, analyzer, report=report)
         
     except Exception as e:
         st.error(f"❌ Erro ao processar arquivo: {str(e)}")
@@ -224,18 +439,171 @@ def process_folder(folder_path, llm_provider, model_name):
         
         try:
             with st.spinner(f"🔄 Analisando..."):
-                analyzer = OpenVASCSVAnalyzer(llm_provider=llm_provider, model_name=model_name)
-                analysis = analyzer.analyze_csv_file(str(csv_file))
+                analyzer = shared_analyzer(llm_provider, model_name)
+                digest = analyzer.cache.content_hash(str(csv_file)) if analyzer.cache is not None else None
+                report = shared_analysis_cache().analyze(str(csv_file), digest, analyzer.cvss_bands)
             
-            display_results(analysis, csv_file.name)
+            display_results({"statistics": report.statistics, "summary": None, "groups": report.groups},
+                            csv_file.name, analyzer, report=report)
             st.markdown("---")
             
         except Exception as e:
             st.error(f"❌ Erro ao processar {csv_file.name}: {str(e)}")
 
 
-def display_results(analysis, filename):
-    """Exibe os resultados da análise"""
+def stream_summary(analyzer, stats, groups=None):
+    """Gera o resumo exibindo o texto conforme ele chega do LLM (None se o LLM não respondeu no prazo)"""
+    # Importado só aqui: a página abre sem carregar o LangChain e o httpx
+    from src.tools.llm_resilience import DEFAULT_DEADLINE, LLMCallError, llm_deadline
+
+    placeholder = st.empty()
+    parts = []
+    start = time.perf_counter()
+    ttft = None
+    
+    def on_token(text):
+        nonlocal ttft
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        parts.append(text)
+        placeholder.markdown("".join(parts) + "▌")
+    
+    try:
+        with st.spinner("🤖 Gerando resumo..."), llm_deadline(DEFAULT_DEADLINE):
+            summary = analyzer.generate_summary(None, stats, on_token=on_token, groups=groups)
+    except LLMCallError as e:
+        placeholder.empty()
+        st.warning(f"⚠️ O resumo não pôde ser gerado agora: {e}")
+        return None
+    placeholder.markdown(summary)
+    
+    if ttft is not None:
+        st.caption(f"⏱️ Primeiro token em {ttft:.2f}s · total {time.perf_counter() - start:.2f}s")
+    return summary
+
+
+def display_findings_store():
+    """Ingestão e consulta da base local de achados (todos os relatórios ingeridos)"""
+    store = get_findings_store()
+    
+    st.markdown("### Base Local de Achados")
+    st.info("🗄️ Relatórios ingeridos ficam indexados por host, NVT, CVE, severidade, porta e data do scan")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        ingest_path = st.text_input("Pasta para ingerir", value="csv_reports", key="ingest_path")
+    with col2:
+        st.write("")
+        if st.button("📥 Ingerir CSVs"):
+            with st.spinner("📥 Ingerindo relatórios..."):
+                outcomes = store.ingest_folder(ingest_path)
+            for outcome in outcomes:
+                if outcome['error']:
+                    st.error(f"❌ {outcome['file'].name}: {outcome['error']}")
+                elif not outcome['skipped']:
+                    st.success(f"✅ {outcome['file'].name}: {outcome['findings']} achados")
+    
+    totals = store.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Relatórios", totals['reports'])
+    col2.metric("Achados", totals['findings'])
+    col3.metric("Hosts", totals['hosts'])
+    col4.metric("CVEs", totals['cves'])
+    
+    if not totals['reports']:
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        host = st.text_input("Host (IP)", key="store_host")
+    with col2:
+        nvt_oid = st.text_input("NVT OID", key="store_nvt")
+    with col3:
+        cve = st.text_input("CVE (ou prefixo, ex.: CVE-2021-*)", key="store_cve")
+    with col4:
+        port = st.text_input("Porta (ex.: 443/tcp)", key="store_port")
+    
+    severities = st.multiselect("Severidade", ["Critical", "High", "Medium", "Low", "Log"], key="store_severity")
+    latest = st.checkbox("Apenas o relatório mais recente de cada host", value=True, key="store_latest")
+    
+    # CVE incompleto ou com '*' vira busca por prefixo
+    cve_is_prefix = bool(cve) and (cve.strip().endswith("*") or cve.strip().count("-") < 2)
+    
+    start = time.perf_counter()
+    findings = store.query(host=host or None, nvt_oid=nvt_oid or None, port=port or None,
+                           cve=None if cve_is_prefix else cve or None, cve_prefix=cve if cve_is_prefix else None,
+                           severity=severities or None, latest=latest, limit=500)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    st.caption(f"🔎 {len(findings)} achado(s) em {elapsed_ms:.1f} ms (máx. 500)")
+    if findings:
+        st.dataframe(pd.DataFrame(findings).drop(columns=["id", "report_id"]), use_container_width=True)
+
+
+def display_findings_table(explorer, key):
+    """Tabela paginada dos achados do relatório, com filtros, busca e ordenação no servidor"""
+    sort_labels = {
+        "severity": "Severidade", "cvss": "CVSS", "host": "Host", "port": "Porta", "nvt": "NVT",
+    }
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        host = st.text_input("Host (prefixo do IP ou hostname)", key=f"{key}_host")
+    with col2:
+        port = st.text_input("Porta (ex.: 443/tcp, udp)", key=f"{key}_port")
+    with col3:
+        nvt = st.text_input("NVT (nome ou OID)", key=f"{key}_nvt")
+    with col4:
+        search = st.text_input("🔎 Buscar (IP, NVT, CVE)", key=f"{key}_search")
+    
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        severities = st.multiselect("Severidade", ["Critical", "High", "Medium", "Low", "Log"], key=f"{key}_severity")
+    with col2:
+        sort_by = st.selectbox("Ordenar por", list(sort_labels), format_func=sort_labels.get, key=f"{key}_sort")
+    with col3:
+        ascending = st.checkbox("Crescente", key=f"{key}_ascending")
+    with col4:
+        page_size = st.selectbox("Por página", [25, 50, 100, 200], index=1, key=f"{key}_page_size")
+    
+    filters = dict(host=host or None, port=port or None, nvt=nvt or None, search=search or None,
+                   severity=severities or None, sort_by=sort_by, ascending=ascending)
+    
+    # Mudou o filtro ou a ordenação: volta para a primeira página
+    if st.session_state.get(f"{key}_filters") != (filters, page_size):
+        st.session_state[f"{key}_filters"] = (filters, page_size)
+        st.session_state[f"{key}_page"] = 1
+    
+    page = explorer.page(st.session_state[f"{key}_page"], page_size, **filters)
+    
+    if page['rows']:
+        st.dataframe(pd.DataFrame(page['rows']), use_container_width=True, hide_index=True)
+    else:
+        st.info("Nenhum achado com esses filtros")
+    
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if st.button("⬅️ Anterior", key=f"{key}_prev", disabled=page['page'] <= 1):
+            st.session_state[f"{key}_page"] = page['page'] - 1
+            st.rerun()
+    with col2:
+        st.caption(f"Página {page['page']} de {page['pages']} · {page['total']} achado(s) · "
+                   f"{page['elapsed_ms']:.1f} ms")
+    with col3:
+        if st.button("Próxima ➡️", key=f"{key}_next", disabled=page['page'] >= page['pages']):
+            st.session_state[f"{key}_page"] = page['page'] + 1
+            st.rerun()
+
+
+def display_results(analysis, filename, analyzer=None, report=None):
+    """
+    Exibe os resultados da análise
+    
+    Se analysis['summary'] for None, o resumo é gerado com `analyzer` e exibido
+    progressivamente, depois das métricas. Com `report` (ver `analysis_memory_cache`),
+    o resumo fica guardado junto da análise, para as próximas reexecuções, e os
+    achados podem ser navegados numa tabela paginada.
+    """
     stats = analysis['statistics']
     
     # Métricas principais
@@ -258,26 +626,41 @@ def display_results(analysis, filename):
     # Resumo da IA
     st.markdown("### 🤖 Análise Inteligente")
     with st.container():
-        st.markdown(analysis['summary'])
+        summary_key = (analyzer.llm_provider, analyzer.model_name) if analyzer is not None else None
+        if analysis.get('summary') is None and report is not None:
+            analysis['summary'] = report.summaries.get(summary_key)
+        if analysis.get('summary') is None:
+            analysis['summary'] = stream_summary(analyzer, stats, analysis.get('groups'))
+            if report is not None and analysis['summary'] is not None:
+                shared_analysis_cache().add_summary(report, summary_key, analysis['summary'])
+        else:
+            st.markdown(analysis['summary'])
     
     # Gráficos
     st.markdown("### 📊 Visualizações")
     
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        fig1 = create_severity_chart(stats)
-        if fig1:
-            st.plotly_chart(fig1, use_container_width=True)
-    
-    with col2:
-        fig2 = create_hosts_chart(stats)
-        if fig2:
-            st.plotly_chart(fig2, use_container_width=True)
+    if report is not None:
+        display_cube_charts(report, key=f"cube_{filename}")
+    else:
+        fig1, fig2, fig3 = create_severity_chart(stats), create_hosts_chart(stats), create_top_vulnerabilities_chart(stats)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            if fig1:
+                st.plotly_chart(fig1, use_container_width=True)
+        
+        with col2:
+            if fig2:
+                st.plotly_chart(fig2, use_container_width=True)
+        
+        if fig3:
+            st.plotly_chart(fig3, use_container_width=True)
     
-    fig3 = create_top_vulnerabilities_chart(stats)
-    if fig3:
-        st.plotly_chart(fig3, use_container_width=True)
+    # Achados, página a página
+    if report is not None:
+        st.markdown("### 🔎 Achados")
+        display_findings_table(report.explorer, key=f"findings_{filename}")
     
     # Botão de download do relatório
     st.markdown("### 💾 Exportar Relatório")